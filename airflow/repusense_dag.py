@@ -1,11 +1,9 @@
 from datetime import datetime, timedelta
 from airflow import DAG
-from airflow.operators.python import PythonOperator
-from airflow.providers.amazon.aws.operators.s3 import S3CreateBucketOperator
+from airflow.decorators import task, task_group
+from airflow.exceptions import AirflowSkipException
 from airflow.providers.amazon.aws.operators.s3 import S3Hook
-import os
 import sys
-import subprocess
 import json
 from pathlib import Path
 
@@ -13,7 +11,8 @@ from pathlib import Path
 sys.path.append('/path/to/RepuSense')  # Replace with actual path in production
 
 # Import the NLP pipeline
-from nlp_pipeline.main import NLPPipeline
+from nlp_pipeline.main import NLPPipeline, ANALYSIS_STAGES
+from nlp_pipeline.s3_storage import S3Storage
 
 # Load configuration from config.json
 def load_config():
@@ -44,96 +43,73 @@ default_args = {
 }
 
 # S3 configuration
-S3_BUCKET = config.get('s3', {}).get('bucket', 'repusense-results')  
+S3_BUCKET = config.get('s3', {}).get('bucket', 'repusense-results')
 S3_REGION = config.get('s3', {}).get('region', 'us-east-1')
 
-# Function to run the pipeline for a company
-def run_repusense_pipeline(company_name, **kwargs):
-    """
-    Run the RepuSense pipeline for a specific company.
-    
-    Args:
-        company_name: Name of the company to analyze
-    """
-    # Calculate date range for last week
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=7)
-    
-    # Format dates for the pipeline
-    start_date_str = start_date.strftime('%Y-%m-%d')
-    end_date_str = end_date.strftime('%Y-%m-%d')
-    
-    # Initialize the pipeline
-    pipeline = NLPPipeline(
+# Concurrency configuration. Pools must exist in Airflow (Admin > Pools) before they are used here.
+AIRFLOW_CONFIG = config.get('airflow', {})
+# Pool of the fetch, preprocess and publish tasks
+TASK_POOL = AIRFLOW_CONFIG.get('pool', 'default_pool')
+# Pool of the model-heavy analysis tasks, and the slots each one takes (to bound memory per worker)
+MODEL_POOL = AIRFLOW_CONFIG.get('model_pool', TASK_POOL)
+MODEL_POOL_SLOTS = AIRFLOW_CONFIG.get('model_pool_slots', 1)
+# Companies running the same stage at once, within a DAG run
+MAX_ACTIVE_COMPANIES = AIRFLOW_CONFIG.get('max_active_companies', 8)
+# Tasks running at once across the whole DAG
+MAX_ACTIVE_TASKS = AIRFLOW_CONFIG.get('max_active_tasks', 16)
+
+def get_pipeline(company_name):
+    """Create the pipeline of a company."""
+    return NLPPipeline(
         company_name=company_name,
         use_s3=True,
         s3_bucket=S3_BUCKET
     )
-    
-    # Run the pipeline
-    results = pipeline.run_pipeline(
-        start_date=start_date_str,
-        end_date=end_date_str
-    )
-    
-    return results
 
-# Function to run pipeline for multiple companies
-def run_all_companies_pipeline(**kwargs):
+def get_s3_storage():
+    """Get the S3 result storage, using the AWS connection of Airflow."""
+    return S3Storage.from_config(config, client=S3Hook().get_conn())
+
+def get_stage_context(pipeline, data_interval_start, data_interval_end):
+    """
+    Build the stage context of a run. The dates come from the DAG run's data interval (the
+    previous week), so a retried task fetches the same week as the first attempt.
     """
-    Run the pipeline for all companies in the system.
-    Gets company names from existing folders in S3 at s3://repusense-results/data/nlp_results/
+    return pipeline.build_context(
+        start_date=data_interval_start.strftime('%Y-%m-%d'),
+        end_date=data_interval_end.strftime('%Y-%m-%d')
+    )
+
+def run_stage(company_name, stage_name, inputs, data_interval_start, data_interval_end):
     """
-    companies = []
+    Run one pipeline stage of a company.
+    Stages exchange file paths through XCom; the files themselves go through the pipeline's
+    storage (S3), so workers don't need a shared data directory.
     
-    # Get companies from S3
-    try:
-        s3_hook = S3Hook()
-        if not s3_hook.check_for_bucket(S3_BUCKET):
-            print(f"S3 bucket {S3_BUCKET} not found")
-            return {}
-            
-        # List companies in the "data/nlp_results/" path within the S3 bucket
-        s3_client = s3_hook.get_conn()
-        response = s3_client.list_objects_v2(
-            Bucket=S3_BUCKET,
-            Prefix='data/nlp_results/',
-            Delimiter='/'
-        )
-        
-        if 'CommonPrefixes' in response:
-            for prefix in response['CommonPrefixes']:
-                # Extract company name from prefix (e.g., "data/nlp_results/companyname/")
-                prefix_path = prefix['Prefix']
-                company_name = prefix_path.split('/')[-2] if prefix_path.endswith('/') else prefix_path.split('/')[-1]
-                
-                if company_name:
-                    companies.append(company_name)
-            
-            print(f"Found {len(companies)} companies in S3: {', '.join(companies)}")
-        else:
-            print("No company directories found in S3")
-    except Exception as e:
-        print(f"Error accessing S3 for company list: {str(e)}")
+    Args:
+        company_name: Name of the company to analyze
+        stage_name: Name of the stage
+        inputs: Outputs of the stage's dependencies, by stage name
     
-    if not companies:
-        print("No companies found in S3")
-        return {}
+    Returns:
+        Dictionary with the stage output and metrics
+    """
+    pipeline = get_pipeline(company_name)
+    graph = pipeline.build_stage_graph()
+    if stage_name not in graph.stages:
+        # e.g. sentiment and keywords are part of preprocessing with the Spark backend
+        raise AirflowSkipException(f"Stage {stage_name} is not part of the {pipeline.backend} pipeline")
     
-    print(f"Processing {len(companies)} companies: {', '.join(companies)}")
+    context = get_stage_context(pipeline, data_interval_start, data_interval_end)
+    pipeline.materialize_inputs(inputs)
+    output, metrics = graph.run_stage(stage_name, context, inputs)
+    pipeline.persist_outputs(output)
+    print(f"Finished stage {stage_name} for {company_name} in {metrics.get('wall_time_seconds')}s (cache: {metrics.get('cache')})")
     
-    all_results = {}
-    for company in companies:
-        try:
-            results = run_repusense_pipeline(company)
-            all_results[company] = results
-        except Exception as e:
-            print(f"Error processing company {company}: {str(e)}")
-    
-    return all_results
+    return {'output': output, 'metrics': metrics}
 
-# Function to verify S3 bucket exists
-def ensure_s3_bucket_exists(**kwargs):
+@task
+def ensure_s3_bucket_exists():
     """
     Verify the S3 bucket exists, create it if not.
     """
@@ -146,30 +122,79 @@ def ensure_s3_bucket_exists(**kwargs):
     
     return S3_BUCKET
 
+@task
+def list_companies():
+    """
+    Get the companies to analyze from the existing folders in S3 at s3://repusense-results/data/nlp_results/
+    """
+    # Paginated, so buckets with more than 1,000 companies are listed in full
+    companies = get_s3_storage().list_companies()
+    
+    if not companies:
+        raise AirflowSkipException("No companies found in S3")
+    
+    print(f"Found {len(companies)} companies in S3: {', '.join(companies)}")
+    return companies
+
+@task(pool=TASK_POOL, max_active_tis_per_dagrun=MAX_ACTIVE_COMPANIES)
+def fetch(company_name, data_interval_start=None, data_interval_end=None):
+    """Fetch the data of a company."""
+    return run_stage(company_name, 'fetch', {}, data_interval_start, data_interval_end)
+
+@task(pool=TASK_POOL, max_active_tis_per_dagrun=MAX_ACTIVE_COMPANIES)
+def preprocess(company_name, fetched, data_interval_start=None, data_interval_end=None):
+    """Preprocess the fetched data of a company."""
+    return run_stage(company_name, 'preprocess', {'fetch': fetched['output']}, data_interval_start, data_interval_end)
+
+@task(pool=MODEL_POOL, pool_slots=MODEL_POOL_SLOTS, max_active_tis_per_dagrun=MAX_ACTIVE_COMPANIES)
+def analyze(company_name, stage_name, preprocessed, data_interval_start=None, data_interval_end=None):
+    """Run an analysis stage (sentiment, keywords, topics or engagement) on the preprocessed data."""
+    return run_stage(company_name, stage_name, {'preprocess': preprocessed['output']}, data_interval_start, data_interval_end)
+
+@task(pool=TASK_POOL, max_active_tis_per_dagrun=MAX_ACTIVE_COMPANIES, trigger_rule='none_failed')
+def publish(company_name, fetched, preprocessed, analyses):
+    """Save the results of a company and publish them to the API."""
+    stage_results = {'fetch': fetched, 'preprocess': preprocessed}
+    # Skipped stages have no result
+    stage_results.update({name: result for name, result in analyses.items() if result})
+    
+    outputs = {name: result['output'] for name, result in stage_results.items()}
+    
+    # Saves the results and uploads them to S3 (files with an unchanged checksum are skipped)
+    pipeline = get_pipeline(company_name)
+    pipeline.materialize_inputs(outputs)
+    results = pipeline.publish(outputs, {name: result['metrics'] for name, result in stage_results.items()})
+    print(f"Published results for {company_name}")
+    
+    return results.get('stage_metrics')
+
+@task_group
+def company_pipeline(company_name):
+    """
+    Run the pipeline of one company, one task per stage, so a retry re-runs only the stage that failed.
+    fetch -> preprocess -> {sentiment, keywords, topics, engagement} -> publish
+    """
+    fetched = fetch(company_name)
+    preprocessed = preprocess(company_name, fetched)
+    analyses = {
+        name: analyze.override(task_id=name)(company_name, name, preprocessed)
+        for name in ANALYSIS_STAGES
+    }
+    publish(company_name, fetched, preprocessed, analyses)
+
 # Define the DAG
-dag = DAG(
+with DAG(
     'repusense_weekly_pipeline',
     default_args=default_args,
     description='Weekly RepuSense NLP analysis pipeline',
     schedule_interval='0 0 * * 0',  # Run at midnight every Sunday
     start_date=datetime(2024, 1, 1),
     catchup=False,
+    max_active_tasks=MAX_ACTIVE_TASKS,
     tags=['repusense', 'nlp', 'reddit'],
-)
-
-# Task to ensure S3 bucket exists
-ensure_bucket_task = PythonOperator(
-    task_id='ensure_s3_bucket_exists',
-    python_callable=ensure_s3_bucket_exists,
-    dag=dag,
-)
-
-# Task to run the pipeline for all companies
-run_pipeline_task = PythonOperator(
-    task_id='run_all_companies_pipeline',
-    python_callable=run_all_companies_pipeline,
-    dag=dag,
-)
-
-# Define task dependencies
-ensure_bucket_task >> run_pipeline_task 
\ No newline at end of file
+) as dag:
+    companies = list_companies()
+    
+    # One mapped task group (and so one set of stage tasks) per company
+    ensure_s3_bucket_exists() >> companies
+    company_pipeline.expand(company_name=companies)
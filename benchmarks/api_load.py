@@ -0,0 +1,178 @@
+"""
+Load test of the dashboard's read path: throughput and latency as concurrent users grow.
+
+Each simulated user loops over the requests of a dashboard view (result JSON, a page of
+documents, an HTML visualization and the word cloud image). While the users run, a probe
+requests the root route, which needs a thread from Starlette's shared threadpool, to show
+whether unrelated requests queue behind file reads.
+
+By default the API runs in process and is compared with the previous handlers (sync routes
+reading whole files in Starlette's threadpool). With --url, a running server is tested instead.
+
+Usage:
+    python benchmarks/api_load.py --company inwi --users 1 8 32 64 --duration 10 --output api_load.json
+    python benchmarks/api_load.py --url http://localhost:8000 --company inwi
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+from pathlib import Path
+
+import httpx
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import HTMLResponse, FileResponse
+
+from nlp_pipeline.api.main import app, NLP_RESULTS_DIR, RESULT_FILES, read_root
+
+# Requests of one dashboard view
+DASHBOARD_REQUESTS = [
+    "/api/company/{company}/sentiment",
+    "/api/company/{company}/topics/info",
+    "/api/company/{company}/documents/sentiment?limit=100",
+    "/api/company/{company}/topics/visualization-html",
+    "/api/company/{company}/wordcloud-image"
+]
+
+PROBE_PATH = "/"
+
+def build_legacy_app():
+    """
+    Recreate the previous sync routes, which read and parse every file in Starlette's threadpool
+    and return whole documents lists.
+    """
+    legacy_app = FastAPI()
+
+    def load_json(file_path):
+        if not file_path.exists():
+            raise HTTPException(status_code=404, detail="Not found")
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    @legacy_app.get("/")
+    def legacy_root():
+        return read_root()
+
+    @legacy_app.get("/api/company/{company_name}/sentiment")
+    def legacy_sentiment(company_name: str):
+        return load_json(NLP_RESULTS_DIR / company_name / RESULT_FILES["sentiment.json"])
+
+    @legacy_app.get("/api/company/{company_name}/topics/info")
+    def legacy_topic_info(company_name: str):
+        return load_json(NLP_RESULTS_DIR / company_name / "topics" / "topic_info.json")
+
+    @legacy_app.get("/api/company/{company_name}/documents/sentiment")
+    def legacy_documents(company_name: str):
+        # The previous route ignored paging and returned every document
+        return load_json(NLP_RESULTS_DIR / company_name / "sentiment" / "documents_with_sentiment.json")
+
+    @legacy_app.get("/api/company/{company_name}/topics/visualization-html")
+    def legacy_visualization(company_name: str):
+        with open(NLP_RESULTS_DIR / company_name / "topics" / "topic_visualization.html", 'r', encoding='utf-8') as f:
+            return HTMLResponse(content=f.read(), status_code=200)
+
+    @legacy_app.get("/api/company/{company_name}/wordcloud-image")
+    def legacy_wordcloud_image(company_name: str):
+        return FileResponse(NLP_RESULTS_DIR / company_name / "keywords" / "wordcloud.png", media_type="image/png")
+
+    return legacy_app
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+async def run_level(client, company, users, duration):
+    """Run the given number of concurrent users for a fixed duration."""
+    paths = [path.format(company=company) for path in DASHBOARD_REQUESTS]
+    latencies = []
+    probe_latencies = []
+    errors = 0
+    transferred = 0
+    deadline = time.perf_counter() + duration
+
+    async def user(offset):
+        nonlocal errors, transferred
+        i = offset
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await client.get(paths[i % len(paths)], headers={'Accept-Encoding': 'gzip'})
+            latencies.append((time.perf_counter() - start) * 1000)
+            transferred += len(response.content)
+            if response.status_code != 200:
+                errors += 1
+            i += 1
+
+    async def probe():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await client.get(PROBE_PATH)
+            probe_latencies.append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(0.05)
+
+    start = time.perf_counter()
+    await asyncio.gather(probe(), *[user(offset) for offset in range(users)])
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    probe_latencies.sort()
+    return {
+        'users': users,
+        'requests': len(latencies),
+        'errors': errors,
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'mb_per_second': round(transferred / elapsed / (1024 * 1024), 1),
+        'p50_ms': round(statistics.median(latencies), 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99), 2) if latencies else None,
+        'probe_p50_ms': round(statistics.median(probe_latencies), 2) if probe_latencies else None,
+        'probe_p99_ms': round(percentile(probe_latencies, 0.99), 2) if probe_latencies else None
+    }
+
+async def run_load_test(company, user_levels, duration, url=None):
+    if url:
+        targets = {'server': httpx.AsyncClient(base_url=url, timeout=60)}
+    else:
+        targets = {
+            'before': httpx.AsyncClient(transport=httpx.ASGITransport(app=build_legacy_app()), base_url="http://test", timeout=60),
+            'after': httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", timeout=60)
+        }
+
+    results = {}
+    for label, client in targets.items():
+        async with client:
+            # Warm the result caches so every level measures the steady state
+            for path in DASHBOARD_REQUESTS:
+                await client.get(path.format(company=company))
+            results[label] = [await run_level(client, company, users, duration) for users in user_levels]
+
+    return results
+
+def print_table(results):
+    print(f"{'variant':<10}{'users':>6}{'req/s':>10}{'MB/s':>8}{'p50 ms':>10}{'p99 ms':>10}{'probe p50':>11}{'probe p99':>11}{'errors':>8}")
+    for label, levels in results.items():
+        for row in levels:
+            print(f"{label:<10}{row['users']:>6}{row['requests_per_second']:>10}{row['mb_per_second']:>8}{row['p50_ms']:>10}"
+                  f"{row['p99_ms']:>10}{row['probe_p50_ms']:>11}{row['probe_p99_ms']:>11}{row['errors']:>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the dashboard read path of the API')
+    parser.add_argument('--company', type=str, default='inwi', help='Company whose results are served')
+    parser.add_argument('--users', type=int, nargs='+', default=[1, 8, 32, 64], help='Concurrent users to test')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds to run each level')
+    parser.add_argument('--url', type=str, help='Base URL of a running API server (tests it instead of the in-process apps)')
+    parser.add_argument('--output', type=str, help='Path to save the results as JSON')
+    args = parser.parse_args()
+
+    results = asyncio.run(run_load_test(args.company, args.users, args.duration, args.url))
+    print_table(results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'company': args.company, 'duration': args.duration, 'results': results}, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Benchmark of the API's largest JSON endpoints: latency (p50/p99) and bytes on the wire.
+
+Compares the previous handlers (json.load + FastAPI's default JSON encoding, uncompressed)
+with the current ones (cached serialized bytes, orjson, negotiated compression).
+Requests are sent to the ASGI apps in process, so the numbers exclude network time.
+
+Usage:
+    python benchmarks/api_payloads.py --company inwi --iterations 200 --output api_payloads.json
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from fastapi import FastAPI
+
+from nlp_pipeline.api.main import app, NLP_RESULTS_DIR
+
+# (label, current route, query string, result file served whole by the previous handler)
+ENDPOINTS = [
+    ("documents/sentiment", "/api/company/{company}/documents/sentiment", "limit=1000", "sentiment/documents_with_sentiment.json"),
+    ("documents/topics", "/api/company/{company}/documents/topics", "limit=1000", "topics/documents_with_topics.json"),
+    ("sentiment", "/api/company/{company}/sentiment", "", "sentiment/sentiment_results.json"),
+    ("engagement/analysis", "/api/company/{company}/engagement/analysis", "", "engagement/engagement_analysis.json"),
+    ("topics/info", "/api/company/{company}/topics/info", "", "topics/topic_info.json")
+]
+
+def build_legacy_app(company):
+    """Recreate the previous handlers: read and parse the file on every request, return the parsed data."""
+    legacy_app = FastAPI()
+
+    def make_handler(file_path):
+        def handler():
+            with open(file_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return handler
+
+    for label, _, _, relative_path in ENDPOINTS:
+        legacy_app.get(f"/legacy/{label}")(make_handler(NLP_RESULTS_DIR / company / relative_path))
+
+    return legacy_app
+
+async def call(asgi_app, path, query="", headers=None):
+    """Send one GET request to an ASGI app and return (status, response headers, body)."""
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'root_path': '',
+        'query_string': query.encode(),
+        'headers': [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+        'client': ('127.0.0.1', 50000),
+        'server': ('127.0.0.1', 8000)
+    }
+    response = {'status': None, 'headers': {}, 'body': b''}
+    request_sent = False
+    response_done = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # Like a client, stay connected until the response is complete (HTTP middleware waits on this)
+        await response_done.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+            response['headers'] = {name.decode(): value.decode() for name, value in message['headers']}
+        elif message['type'] == 'http.response.body':
+            response['body'] += message.get('body', b'')
+            if not message.get('more_body', False):
+                response_done.set()
+
+    await asgi_app(scope, receive, send)
+    return response['status'], response['headers'], response['body']
+
+async def measure(asgi_app, path, query, headers, iterations):
+    """Time repeated requests; the first one (cold cache) is reported separately."""
+    timings = []
+    status, response_headers, body = None, {}, b''
+
+    for _ in range(iterations + 1):
+        start = time.perf_counter()
+        status, response_headers, body = await call(asgi_app, path, query, headers)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    if status != 200:
+        raise RuntimeError(f"{path}?{query} returned {status}")
+
+    warm = sorted(timings[1:])
+    return {
+        'cold_ms': round(timings[0], 3),
+        'p50_ms': round(statistics.median(warm), 3),
+        'p99_ms': round(warm[min(len(warm) - 1, int(len(warm) * 0.99))], 3),
+        'bytes': len(body),
+        'content_encoding': response_headers.get('content-encoding', 'identity')
+    }
+
+async def run_benchmark(company, iterations):
+    legacy_app = build_legacy_app(company)
+    results = []
+
+    for label, route, query, _ in ENDPOINTS:
+        path = route.format(company=company)
+        results.append({
+            'endpoint': label,
+            'before': await measure(legacy_app, f"/legacy/{label}", "", None, iterations),
+            'after_identity': await measure(app, path, query, None, iterations),
+            'after_gzip': await measure(app, path, query, {'Accept-Encoding': 'gzip'}, iterations),
+            'after_br': await measure(app, path, query, {'Accept-Encoding': 'br, gzip'}, iterations)
+        })
+
+    return results
+
+def print_table(results):
+    print(f"{'endpoint':<22}{'variant':<16}{'cold ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'bytes':>12}  encoding")
+    for result in results:
+        for variant in ['before', 'after_identity', 'after_gzip', 'after_br']:
+            row = result[variant]
+            print(f"{result['endpoint']:<22}{variant:<16}{row['cold_ms']:>10}{row['p50_ms']:>10}{row['p99_ms']:>10}"
+                  f"{row['bytes']:>12}  {row['content_encoding']}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark latency and payload size of the largest API endpoints')
+    parser.add_argument('--company', type=str, default='inwi', help='Company whose results are served')
+    parser.add_argument('--iterations', type=int, default=200, help='Requests per endpoint and variant')
+    parser.add_argument('--output', type=str, help='Path to save the results as JSON')
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmark(args.company, args.iterations))
+    print_table(results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'company': args.company, 'iterations': args.iterations, 'results': results}, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Import-time check of the API, worker and pipeline entry points.
+
+Each module is imported in a fresh interpreter with `python -X importtime`, which reports the time
+spent importing every module. The check fails when an entry point imports one of the heavy
+libraries it must only load on first use (models, plotting, Spark, cloud SDKs), or when it takes
+longer than --max-ms to import.
+
+Usage:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --repeat 5 --top 15 --max-ms 800 --output import_time.json
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+
+# Libraries that take seconds or hundreds of MB to import
+HEAVY_MODULES = [
+    'torch', 'transformers', 'bertopic', 'keybert', 'sentence_transformers', 'sklearn',
+    'matplotlib', 'plotly', 'wordcloud', 'azure', 'pyspark', 'boto3'
+]
+
+# Entry points, with the top-level modules they must not import
+ENTRY_POINTS = {
+    # API process: serves files and queues jobs, never runs the pipeline itself
+    'nlp_pipeline.api.main': HEAVY_MODULES + ['pandas', 'numpy'],
+    # Standalone job workers, before they pick up a job
+    'nlp_pipeline.api.job_queue': HEAVY_MODULES + ['pandas', 'numpy'],
+    # Pipeline driver (CLI, job workers and Airflow tasks); stages load their own dependencies
+    'nlp_pipeline.main': HEAVY_MODULES + ['pandas', 'numpy'],
+    # Analyzers load their models and plotting libraries when first used
+    'nlp_pipeline.spark_nlp.sentiment_analysis': HEAVY_MODULES,
+    'nlp_pipeline.spark_nlp.keyword_extraction': HEAVY_MODULES,
+    'nlp_pipeline.spark_nlp.topic_modeling': HEAVY_MODULES,
+    'nlp_pipeline.spark_nlp.engagement_analysis': HEAVY_MODULES
+}
+
+def measure_import(module):
+    """
+    Import a module in a fresh interpreter with -X importtime.
+
+    Returns:
+        List of (module name, self microseconds, cumulative microseconds), in import order
+    """
+    env = dict(os.environ, PYTHONPATH=str(ROOT_DIR))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        imports.append((name.strip(), int(self_us), int(cumulative_us)))
+    return imports
+
+def check_entry_point(module, forbidden, repeat):
+    """Measure an entry point several times and list the forbidden modules it imported."""
+    totals = []
+    for _ in range(repeat):
+        imports = measure_import(module)
+        totals.append(next(cumulative for name, _, cumulative in imports if name == module) / 1000)
+
+    imported = {name.split('.')[0] for name, _, _ in imports}
+    slowest = sorted(imports, key=lambda item: item[2], reverse=True)
+    return {
+        'module': module,
+        'median_ms': round(statistics.median(totals), 1),
+        'min_ms': round(min(totals), 1),
+        'modules_imported': len(imports),
+        'heavy_imports': sorted(imported & set(forbidden)),
+        'slowest': [
+            {'module': name, 'self_ms': round(self_us / 1000, 1), 'cumulative_ms': round(cumulative_us / 1000, 1)}
+            for name, self_us, cumulative_us in slowest if name != module
+        ]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the import time of the entry points')
+    parser.add_argument('--module', type=str, action='append', help='Entry point to measure (repeatable, default all)')
+    parser.add_argument('--repeat', type=int, default=3, help='Imports per entry point (the median is reported)')
+    parser.add_argument('--top', type=int, default=10, help='Slowest imports listed per entry point')
+    parser.add_argument('--max-ms', type=float, help='Fail if an entry point takes longer to import')
+    parser.add_argument('--output', type=str, help='Path to save the results as JSON')
+    args = parser.parse_args()
+
+    modules = args.module or list(ENTRY_POINTS)
+    results = []
+    failed = False
+
+    for module in modules:
+        result = check_entry_point(module, ENTRY_POINTS.get(module, HEAVY_MODULES), args.repeat)
+        results.append(result)
+
+        print(f"\n{module}: {result['median_ms']} ms (min {result['min_ms']} ms, {result['modules_imported']} modules)")
+        for item in result['slowest'][:args.top]:
+            print(f"  {item['cumulative_ms']:>9.1f} ms  {item['module']}")
+
+        if result['heavy_imports']:
+            failed = True
+            print(f"  FAIL: imports {', '.join(result['heavy_imports'])} at startup")
+        if args.max_ms is not None and result['median_ms'] > args.max_ms:
+            failed = True
+            print(f"  FAIL: slower than {args.max_ms} ms")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'python': sys.version.split()[0], 'repeat': args.repeat, 'results': results}, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+End-to-end benchmark of the pipeline and the API on synthetic Reddit corpora.
+
+For each corpus size, a synthetic scrape (see synthetic_corpus.py) takes the place of the fetched
+data and goes through every stage (preprocess, sentiment, keywords, topics, engagement) with the
+stage cache off. Each stage runs in a fresh process, so the peak RSS reported is the stage's own.
+The results are then published and the API's read routes are timed in process. Throughput, latency percentiles and peak RSS are saved
+as JSON together with the commit they were measured on; --baseline compares them with an earlier
+results file, so regressions show up between commits.
+
+Benchmark companies are named benchmark_<posts>. Their corpus, data and results are deleted
+afterwards unless --keep-data is given (rows published to data/results.db stay, under the
+benchmark company name).
+
+Usage:
+    python benchmarks/pipeline_benchmark.py --sizes 100 1000 --output pipeline_benchmark.json
+    python benchmarks/pipeline_benchmark.py --sizes 1000 --stages preprocess engagement --repeat 3
+    python benchmarks/pipeline_benchmark.py --sizes 1000 --baseline before.json --max-regression 10
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+import multiprocessing
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.append(str(ROOT_DIR))
+
+from synthetic_corpus import write_corpus
+
+DATA_DIR = ROOT_DIR / "data"
+CORPUS_DIR = DATA_DIR / "benchmark_corpus"
+
+ANALYSIS_STAGES = ['sentiment', 'keywords', 'topics', 'engagement']
+STAGES = ['preprocess'] + ANALYSIS_STAGES
+
+# What each stage's throughput is counted in
+STAGE_UNITS = {'preprocess': 'documents', 'sentiment': 'documents', 'keywords': 'documents',
+               'topics': 'documents', 'engagement': 'posts'}
+
+# (label, route, query string) of the read routes behind the dashboard
+API_ROUTES = [
+    ("companies", "/api/companies", ""),
+    ("sentiment", "/api/company/{company}/sentiment", ""),
+    ("keywords", "/api/company/{company}/keywords", ""),
+    ("topics/info", "/api/company/{company}/topics/info", ""),
+    ("engagement/analysis", "/api/company/{company}/engagement/analysis", ""),
+    ("data-sources", "/api/company/{company}/data-sources", ""),
+    ("content-stats", "/api/company/{company}/content-stats", ""),
+    ("documents/sentiment", "/api/company/{company}/documents/sentiment", "limit=100"),
+    ("documents/topics", "/api/company/{company}/documents/topics", "limit=100&sentiment=negative")
+]
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+def run_stage_in_process(company, stage_name, context_args, inputs):
+    """Run one stage with the stage cache off (called in a fresh process)."""
+    from nlp_pipeline.main import NLPPipeline
+
+    pipeline = NLPPipeline(company_name=company, use_cache=False)
+    graph = pipeline.build_stage_graph()
+    return graph.run_stage(stage_name, pipeline.build_context(**context_args), inputs)
+
+def run_isolated(company, stage_name, context_args, inputs):
+    """Run a stage in a new process, so its peak RSS doesn't include earlier stages."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(run_stage_in_process, company, stage_name, context_args, inputs).result()
+
+def benchmark_stage(company, stage_name, context_args, inputs, repeat, items):
+    """
+    Run a stage `repeat` times.
+
+    Returns:
+        (output of the last run, stage results), or (None, results with the error) if the stage failed
+    """
+    wall_times = []
+    peak_rss = []
+    output = None
+
+    for _ in range(repeat):
+        try:
+            output, metrics = run_isolated(company, stage_name, context_args, inputs)
+        except Exception as e:
+            print(f"  {stage_name}: failed ({type(e).__name__}: {str(e)})")
+            return None, {'error': f"{type(e).__name__}: {str(e)}"}
+
+        wall_times.append(metrics['wall_time_seconds'])
+        if metrics.get('peak_rss_mb') is not None:
+            peak_rss.append(metrics['peak_rss_mb'])
+
+    median = statistics.median(wall_times)
+    result = {
+        'runs': len(wall_times),
+        'wall_time_seconds': {'min': min(wall_times), 'median': round(median, 3), 'max': max(wall_times)},
+        'unit': STAGE_UNITS[stage_name],
+        'items': items,
+        'throughput_per_second': round(items / median, 1) if median > 0 else None,
+        'peak_rss_mb': max(peak_rss) if peak_rss else None
+    }
+    print(f"  {stage_name}: {result['wall_time_seconds']['median']}s, "
+          f"{result['throughput_per_second']} {result['unit']}/s, peak RSS {result['peak_rss_mb']} MB")
+    return output, result
+
+async def benchmark_routes(company, iterations):
+    """Time the read routes in process: the first request (cold caches) separately, then the rest."""
+    from api_payloads import call
+    from nlp_pipeline.api.main import app
+
+    results = {}
+    for label, route, query in API_ROUTES:
+        path = route.format(company=company)
+        timings = []
+        status = None
+
+        started = time.perf_counter()
+        for _ in range(iterations + 1):
+            start = time.perf_counter()
+            status, _, body = await call(app, path, query)
+            timings.append((time.perf_counter() - start) * 1000)
+        elapsed = time.perf_counter() - started
+
+        if status != 200:
+            results[label] = {'status': status}
+            print(f"  {label}: HTTP {status}")
+            continue
+
+        warm = sorted(timings[1:])
+        results[label] = {
+            'status': status,
+            'cold_ms': round(timings[0], 3),
+            'p50_ms': round(statistics.median(warm), 3),
+            'p95_ms': round(percentile(warm, 0.95), 3),
+            'p99_ms': round(percentile(warm, 0.99), 3),
+            'requests_per_second': round((iterations + 1) / elapsed, 1),
+            'bytes': len(body)
+        }
+        print(f"  {label}: p50 {results[label]['p50_ms']} ms, p99 {results[label]['p99_ms']} ms")
+
+    return results
+
+def remove_company_data(company):
+    for directory in [DATA_DIR / "processed_data" / company, DATA_DIR / "nlp_results" / company]:
+        shutil.rmtree(directory, ignore_errors=True)
+
+def remove_corpus(corpus_path):
+    Path(corpus_path).unlink(missing_ok=True)
+    try:
+        CORPUS_DIR.rmdir()
+    except OSError:
+        # Other corpora are kept
+        pass
+
+def benchmark_size(posts, stages, repeat, api_iterations, seed, keep_data):
+    """Generate a corpus of `posts` posts and benchmark the selected stages and the API on it."""
+    company = f"benchmark_{posts}"
+    corpus = write_corpus(CORPUS_DIR / f"reddit_{posts}_{seed}.json", posts, seed=seed)
+    documents = corpus['posts'] + corpus['comments']
+    print(f"\n{posts} posts, {corpus['comments']} comments ({corpus['bytes'] / 1024 / 1024:.1f} MB)")
+
+    context_args = {'start_date': '2024-01-01', 'end_date': '2024-12-31'}
+    items = {'documents': documents, 'posts': corpus['posts']}
+    result = {'posts': corpus['posts'], 'comments': corpus['comments'], 'corpus_bytes': corpus['bytes'],
+              'stages': {}, 'api': {}}
+
+    remove_company_data(company)
+    try:
+        # The corpus stands in for the fetch stage's output
+        outputs = {'fetch': {'source_files': [corpus['path']]}}
+        metrics = {}
+
+        # Preprocessing always runs, since the analysis stages read its output
+        output, stage_result = benchmark_stage(company, 'preprocess', context_args, {'fetch': outputs['fetch']},
+                                               repeat if 'preprocess' in stages else 1, items['documents'])
+        if output is None:
+            result['stages']['preprocess'] = stage_result
+            return result
+        outputs['preprocess'] = output
+        if 'preprocess' in stages:
+            result['stages']['preprocess'] = stage_result
+
+        for stage_name in ANALYSIS_STAGES:
+            if stage_name not in stages:
+                continue
+            output, stage_result = benchmark_stage(
+                company, stage_name, context_args, {'preprocess': outputs['preprocess']},
+                repeat, items[STAGE_UNITS[stage_name]]
+            )
+            result['stages'][stage_name] = stage_result
+            if output is not None:
+                outputs[stage_name] = output
+                metrics[stage_name] = {'wall_time_seconds': stage_result['wall_time_seconds']['median']}
+
+        # Publishing builds the indexes, rollups and results store the API reads
+        from nlp_pipeline.main import NLPPipeline
+        start = time.perf_counter()
+        NLPPipeline(company_name=company, use_cache=False).publish(outputs, metrics)
+        result['stages']['publish'] = {'wall_time_seconds': {'median': round(time.perf_counter() - start, 3)}}
+
+        if api_iterations:
+            result['api'] = asyncio.run(benchmark_routes(company, api_iterations))
+    finally:
+        if not keep_data:
+            remove_company_data(company)
+            remove_corpus(corpus['path'])
+
+    return result
+
+def environment():
+    """Commit, interpreter and machine the results were measured on."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT_DIR, capture_output=True, text=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT_DIR,
+                                    capture_output=True, text=True).stdout.strip())
+    except OSError:
+        commit, dirty = None, None
+
+    return {
+        'commit': commit or None,
+        'dirty': dirty,
+        'timestamp': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+
+def compare(results, baseline, max_regression=None):
+    """
+    Print the change of every stage time and route latency against a baseline results file.
+
+    Returns:
+        True if something got slower by more than max_regression percent
+    """
+    regressed = False
+    baseline_sizes = {entry['posts']: entry for entry in baseline['results']}
+    print(f"\nCompared with {(baseline['environment'].get('commit') or 'unknown')[:12]}:")
+
+    for entry in results:
+        previous = baseline_sizes.get(entry['posts'])
+        if previous is None:
+            continue
+
+        pairs = [
+            (f"stage {name}", stage['wall_time_seconds']['median'],
+             previous['stages'].get(name, {}).get('wall_time_seconds', {}).get('median'))
+            for name, stage in entry['stages'].items() if 'wall_time_seconds' in stage
+        ] + [
+            (f"route {label}", route['p50_ms'], previous['api'].get(label, {}).get('p50_ms'))
+            for label, route in entry['api'].items() if 'p50_ms' in route
+        ]
+
+        for label, current, before in pairs:
+            if not before:
+                continue
+            change = (current - before) / before * 100
+            flag = ""
+            if max_regression is not None and change > max_regression:
+                regressed = True
+                flag = "  REGRESSION"
+            print(f"  {entry['posts']:>7} posts  {label:<28}{before:>10.3f} -> {current:<10.3f}{change:+7.1f}%{flag}")
+
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the pipeline stages and the API on synthetic corpora')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000], help='Corpus sizes, in posts')
+    parser.add_argument('--stages', type=str, nargs='+', choices=STAGES, default=STAGES, help='Stages to measure')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per stage (the median is reported)')
+    parser.add_argument('--api-iterations', type=int, default=100, help='Requests per API route (0 to skip the API)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of the corpora')
+    parser.add_argument('--keep-data', action='store_true', help='Keep the benchmark companies\' data and results')
+    parser.add_argument('--baseline', type=str, help='Results file of an earlier run to compare with')
+    parser.add_argument('--max-regression', type=float, help='Fail if a time grows by more than this percentage over the baseline')
+    parser.add_argument('--output', type=str, help='Path to save the results as JSON')
+    args = parser.parse_args()
+
+    results = [
+        benchmark_size(posts, args.stages, args.repeat, args.api_iterations, args.seed, args.keep_data)
+        for posts in args.sizes
+    ]
+
+    report = {
+        'environment': environment(),
+        'settings': {'stages': args.stages, 'repeat': args.repeat, 'api_iterations': args.api_iterations, 'seed': args.seed},
+        'results': results
+    }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.max_regression):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Synthetic Reddit corpus in the format written by scrape_reddit_for_nlp
+(a list of {post_text, created_utc, comments}), for benchmarking the pipeline at any size.
+
+Lengths follow the shape of real scrapes (calibrated on the inwi sample in data/data_storage):
+half the posts have no comments and a few have hundreds, comment lengths are log-normal
+(median 14 words, p90 around 50, rare comments of several hundred words), and most posts are
+a short title with an occasional long body. Texts mix English and French, with the links,
+markdown, emojis and deleted comments the preprocessor has to clean. The same seed always
+gives the same corpus.
+
+Usage:
+    python benchmarks/synthetic_corpus.py --posts 1000 --output data/benchmark_corpus/reddit_1000.json
+"""
+import math
+import json
+import random
+import argparse
+from pathlib import Path
+from datetime import datetime, timedelta
+
+COMPANY = "inwi"
+
+# Vocabulary of the generated texts, by role
+VOCABULARY = {
+    'en': {
+        'subjects': ["the network", "the 4G", "fiber", "the app", "customer service", "my bill", "the new offer",
+                     "the internet box", "roaming", "the signal", "the data plan", "the shop", "the hotline"],
+        'positive': ["is great", "works perfectly", "is really fast", "is worth it", "got much better",
+                     "is the best in town", "never drops", "is cheap for what you get"],
+        'negative': ["is terrible", "keeps dropping", "is way too slow", "is a scam", "got worse",
+                     "never answers", "overcharged me again", "has been down all week"],
+        'neutral': ["changed last month", "is available in Casablanca", "costs 99 dh", "needs an ID card",
+                    "is the same as Orange", "was mentioned on the news"],
+        'fillers': ["honestly", "I think", "for me", "to be fair", "in my area", "since yesterday",
+                    "like everyone else", "as usual", "compared to last year", "if you ask me"],
+        'questions': ["Anyone else having issues with", "Is it worth switching to", "What do you think about",
+                      "How do I cancel", "Best plan for students with"]
+    },
+    'fr': {
+        'subjects': ["le réseau", "la 4G", "la fibre", "l'application", "le service client", "ma facture",
+                     "la nouvelle offre", "la box internet", "le roaming", "le débit"],
+        'positive': ["est top", "marche très bien", "est vraiment rapide", "vaut le coup", "s'est amélioré"],
+        'negative': ["est nul", "coupe tout le temps", "est trop lent", "c'est de l'arnaque", "ne répond jamais"],
+        'neutral': ["a changé le mois dernier", "coûte 99 dh", "est dispo à Rabat", "est comme chez Orange"],
+        'fillers': ["franchement", "à mon avis", "chez moi", "depuis hier", "comme d'habitude", "pour être honnête"],
+        'questions': ["Quelqu'un a des problèmes avec", "Ça vaut le coup de passer à", "Vous pensez quoi de"]
+    }
+}
+
+EXTRAS = ["https://www.inwi.ma/offres", "**edit:** fixed now", "&gt; quoted text", "😡", "👍", "🔥", "lol", "/u/someone"]
+
+def lognormal_int(rng, median, sigma, minimum=1, maximum=None):
+    """Draw a log-normal integer with the given median (the mean is median * exp(sigma^2 / 2))."""
+    value = max(minimum, int(round(rng.lognormvariate(math.log(median), sigma))))
+    return min(value, maximum) if maximum is not None else value
+
+def make_sentence(rng, language):
+    words = VOCABULARY[language]
+    subject = rng.choice(words['subjects'])
+    predicate = rng.choice(words[rng.choices(['positive', 'negative', 'neutral'], weights=[3, 5, 2])[0]])
+    sentence = f"{subject} of {COMPANY} {predicate}" if language == 'en' else f"{subject} de {COMPANY} {predicate}"
+    if rng.random() < 0.5:
+        sentence = f"{rng.choice(words['fillers'])} {sentence}"
+    return sentence[0].upper() + sentence[1:] + rng.choice([".", ".", "!", "..."])
+
+def make_text(rng, word_count, language):
+    """Build a text of word_count words from random sentences (the last one may be cut short)."""
+    words = []
+    while len(words) < word_count:
+        sentence = make_sentence(rng, language)
+        if rng.random() < 0.08:
+            sentence += f" {rng.choice(EXTRAS)}"
+        words.extend(sentence.split())
+    return " ".join(words[:word_count])
+
+def make_post(rng, language):
+    words = VOCABULARY[language]
+    title = f"{rng.choice(words['questions'])} {COMPANY} {rng.choice(words['subjects'])}?"
+    # Most posts are a title only; some have a body, occasionally a long one
+    if rng.random() < 0.4:
+        title += "\n\n" + make_text(rng, lognormal_int(rng, 40, 1.1, maximum=1500), language)
+    return title
+
+def generate_corpus(posts, seed=0, start_date="2024-01-01", days=365, mean_comments=12.0,
+                    zero_comment_share=0.5, comment_words_median=14, french_share=0.3):
+    """
+    Generate a synthetic scrape.
+
+    Args:
+        posts: Number of posts
+        seed: Random seed
+        start_date: Date of the oldest post (YYYY-MM-DD)
+        days: Number of days the posts are spread over
+        mean_comments: Mean number of comments per post
+        zero_comment_share: Share of posts without comments
+        comment_words_median: Median number of words per comment
+        french_share: Share of French posts and comments
+
+    Returns:
+        List of posts in the scrape_reddit_for_nlp format
+    """
+    rng = random.Random(seed)
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+
+    # Comment counts are log-normal among posts with comments, sigma chosen for a long tail
+    comments_sigma = 1.3
+    commented_mean = mean_comments / max(1e-9, 1 - zero_comment_share)
+    comments_median = max(1.0, commented_mean / math.exp(comments_sigma ** 2 / 2))
+
+    corpus = []
+    for _ in range(posts):
+        language = 'fr' if rng.random() < french_share else 'en'
+        created = start + timedelta(seconds=rng.randrange(days * 24 * 3600))
+
+        comment_count = 0
+        if rng.random() >= zero_comment_share:
+            comment_count = lognormal_int(rng, comments_median, comments_sigma, maximum=2000)
+
+        comments = []
+        for _ in range(comment_count):
+            if rng.random() < 0.02:
+                comments.append(rng.choice(["[deleted]", "[removed]"]))
+                continue
+            comment_language = language if rng.random() < 0.9 else rng.choice(['en', 'fr'])
+            comments.append(make_text(rng, lognormal_int(rng, comment_words_median, 1.05, maximum=600), comment_language))
+
+        corpus.append({
+            "post_text": make_post(rng, language),
+            "created_utc": created.strftime("%Y-%m-%d %H:%M:%S"),
+            "comments": comments
+        })
+
+    return corpus
+
+def write_corpus(output_path, posts, **kwargs):
+    """
+    Generate a synthetic scrape and save it as JSON.
+
+    Returns:
+        Dictionary with the path, number of posts and comments, and size in bytes of the file
+    """
+    corpus = generate_corpus(posts, **kwargs)
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(corpus, f, indent=2, ensure_ascii=False)
+
+    return {
+        'path': str(output_path),
+        'posts': len(corpus),
+        'comments': sum(len(post['comments']) for post in corpus),
+        'bytes': output_path.stat().st_size
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic Reddit scrape for benchmarks')
+    parser.add_argument('--posts', type=int, default=1000, help='Number of posts')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--mean-comments', type=float, default=12.0, help='Mean number of comments per post')
+    parser.add_argument('--comment-words', type=int, default=14, help='Median number of words per comment')
+    parser.add_argument('--output', type=str, required=True, help='Path of the JSON file to write')
+    args = parser.parse_args()
+
+    summary = write_corpus(
+        args.output, args.posts, seed=args.seed, mean_comments=args.mean_comments,
+        comment_words_median=args.comment_words
+    )
+    print(f"Wrote {summary['posts']} posts and {summary['comments']} comments ({summary['bytes'] / 1024 / 1024:.1f} MB) to {summary['path']}")
+
+if __name__ == "__main__":
+    main()
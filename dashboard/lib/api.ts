@@ -28,6 +28,7 @@ interface AnalysisResponse {
   status: string;
   company: string;
   timestamp: string;
+  deduplicated?: boolean;
 }
 
 const API_ENDPOINT = config.apiEndpoint;
@@ -195,6 +196,24 @@ export const apiService = {
     }
   },
 
+  /**
+   * Follow the status of an analysis request (stages, documents processed, ETA) as it changes.
+   * Returns a function that closes the stream.
+   */
+  subscribeToAnalysis(requestId: string, onStatus: (status: any) => void): () => void {
+    const source = new EventSource(`${API_ENDPOINT}/api/analyze/${requestId}/events`);
+
+    source.addEventListener('status', (event) => {
+      const status = JSON.parse((event as MessageEvent).data);
+      onStatus(status);
+      if (['completed', 'error', 'unknown'].includes(status.status)) {
+        source.close();
+      }
+    });
+
+    return () => source.close();
+  },
+
   /**
    * Get topic visualization HTML for a specific company
    */
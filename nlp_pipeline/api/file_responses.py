@@ -0,0 +1,156 @@
+import os
+import logging
+from typing import Optional, Tuple
+
+import anyio
+from starlette.responses import Response
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Size of the reads used to stream a file
+CHUNK_SIZE = 64 * 1024
+
+def parse_range(range_header: Optional[str], file_size) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single byte range of a Range header (RFC 9110, section 14).
+
+    Args:
+        range_header: Value of the Range header
+        file_size: Size of the file in bytes
+
+    Returns:
+        Tuple of (first byte, last byte) inclusive, or None to send the whole file
+        (no header, another unit, several ranges or a malformed value)
+
+    Raises:
+        ValueError: If the range is well formed but can't be satisfied (it starts beyond the end of the file)
+    """
+    if not range_header:
+        return None
+
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+
+    first, _, last = ranges.partition("-")
+    first, last = first.strip(), last.strip()
+
+    if not first:
+        # Suffix range: the last N bytes
+        if not last.isdigit():
+            return None
+        if int(last) == 0 or file_size == 0:
+            raise ValueError("Empty suffix range")
+        return max(0, file_size - int(last)), file_size - 1
+
+    if not first.isdigit() or (last and not last.isdigit()):
+        return None
+
+    start = int(first)
+    end = int(last) if last else file_size - 1
+    if last and end < start:
+        return None
+    if start >= file_size:
+        raise ValueError(f"Range starts at {start} but the file has {file_size} bytes")
+
+    return start, min(end, file_size - 1)
+
+class RangeFileResponse(Response):
+    """
+    Stream a file from disk with async reads, answering Range requests with 206 Partial Content.
+    Like Starlette's FileResponse, the file is only stat'ed when the response is sent.
+    """
+
+    def __init__(self, path, media_type, range_header: Optional[str] = None, headers=None):
+        """
+        Initialize the response.
+
+        Args:
+            path: Path to the file
+            media_type: Content type of the file
+            range_header: Range header of the request, if it applies to the current version of the file
+            headers: Additional response headers
+        """
+        self.path = path
+        self.range_header = range_header
+        self.status_code = 200
+        self.media_type = media_type
+        self.background = None
+        self.init_headers(headers)
+        self.headers.setdefault('accept-ranges', 'bytes')
+
+    async def __call__(self, scope, receive, send):
+        stat = await anyio.to_thread.run_sync(os.stat, self.path)
+        file_size = stat.st_size
+
+        try:
+            byte_range = parse_range(self.range_header, file_size)
+        except ValueError:
+            await self._send_unsatisfiable(file_size, send)
+            return
+
+        start, end = byte_range if byte_range is not None else (0, file_size - 1)
+        length = end - start + 1 if file_size else 0
+        if byte_range is not None:
+            self.status_code = 206
+            self.headers['content-range'] = f"bytes {start}-{end}/{file_size}"
+        self.headers['content-length'] = str(length)
+
+        await send({'type': 'http.response.start', 'status': self.status_code, 'headers': self.raw_headers})
+
+        if scope.get('method') == 'HEAD' or length == 0:
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+            return
+
+        async with await anyio.open_file(self.path, mode='rb') as f:
+            await f.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = await f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    # The file shrank while being sent; the client sees a short body
+                    logger.warning(f"{self.path} ended early while being sent")
+                    break
+                remaining -= len(chunk)
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': remaining > 0})
+
+        if remaining > 0:
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+    async def _send_unsatisfiable(self, file_size, send):
+        headers = {'content-range': f"bytes */{file_size}", 'content-length': '0'}
+        for name in ('etag', 'last-modified', 'cache-control', 'accept-ranges'):
+            if name in self.headers:
+                headers[name] = self.headers[name]
+
+        await send({
+            'type': 'http.response.start',
+            'status': 416,
+            'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers.items()]
+        })
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+def applicable_range(request_headers, etag) -> Optional[str]:
+    """
+    Get the Range header of a request if it applies to the current representation.
+    A Range guarded by If-Range is ignored (so the full file is sent) when the client's copy is stale.
+
+    Args:
+        request_headers: Headers of the request
+        etag: Current ETag of the file
+
+    Returns:
+        The Range header value, or None
+    """
+    range_header = request_headers.get('range')
+    if range_header is None:
+        return None
+
+    if_range = request_headers.get('if-range')
+    # Only strong ETags are accepted in If-Range; HTTP dates are too coarse to be safe here
+    if if_range is not None and if_range.strip() != etag:
+        return None
+
+    return range_header
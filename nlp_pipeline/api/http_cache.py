@@ -0,0 +1,115 @@
+import os
+import hashlib
+import logging
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Content digests keyed by (path, mtime, size), so a file is hashed once per change
+_digests: Dict[Tuple[str, int, int], str] = {}
+_digests_lock = threading.Lock()
+
+def _file_digest(file_path, stat):
+    key = (str(file_path), stat.st_mtime_ns, stat.st_size)
+
+    with _digests_lock:
+        digest = _digests.get(key)
+    if digest is not None:
+        return digest
+
+    hasher = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            hasher.update(chunk)
+    digest = hasher.hexdigest()
+
+    with _digests_lock:
+        # Drop digests of earlier versions of the same file
+        for stale_key in [stale for stale in _digests if stale[0] == key[0]]:
+            del _digests[stale_key]
+        _digests[key] = digest
+
+    return digest
+
+def file_digest(file_path) -> Optional[str]:
+    """Get the SHA-256 digest of a file's content, or None if it doesn't exist (hashed once per change)."""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return _file_digest(file_path, stat)
+
+def file_validators(file_path, *variant) -> Optional[Tuple[str, float]]:
+    """
+    Get the validators of a file: a strong ETag derived from its content and its modification time.
+    After the first call for a given version of the file, this only costs a stat.
+
+    Args:
+        file_path: Path to the file
+        *variant: Extra values distinguishing responses built from the same file (e.g. query parameters)
+
+    Returns:
+        Tuple of (ETag, modification timestamp), or None if the file doesn't exist
+    """
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+
+    digest = _file_digest(file_path, stat)
+    if variant:
+        digest = hashlib.sha256("\0".join([digest] + [str(value) for value in variant]).encode('utf-8')).hexdigest()
+
+    return f'"{digest[:32]}"', stat.st_mtime
+
+def cache_headers(etag, last_modified, max_age=0) -> Dict[str, str]:
+    """
+    Get the caching headers of a response.
+
+    Args:
+        etag: Strong ETag of the response
+        last_modified: Modification timestamp of the underlying data
+        max_age: Seconds the client may reuse the response without revalidating
+
+    Returns:
+        Dictionary of headers
+    """
+    return {
+        'ETag': etag,
+        'Last-Modified': formatdate(last_modified, usegmt=True),
+        'Cache-Control': f"public, max-age={max_age}, must-revalidate"
+    }
+
+def is_not_modified(request_headers, etag, last_modified) -> bool:
+    """
+    Check a conditional GET against the current validators.
+    If-None-Match takes precedence over If-Modified-Since (RFC 9110).
+
+    Args:
+        request_headers: Headers of the request
+        etag: Current ETag
+        last_modified: Current modification timestamp
+
+    Returns:
+        True if the client's copy is current and a 304 can be sent
+    """
+    if_none_match = request_headers.get('if-none-match')
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        # Weak comparison: W/"x" matches "x"
+        return '*' in tags or etag in [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+
+    if_modified_since = request_headers.get('if-modified-since')
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have a one second resolution
+        return int(last_modified) <= since
+
+    return False
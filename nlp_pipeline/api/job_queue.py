@@ -0,0 +1,668 @@
+import os
+import sys
+import json
+import time
+import atexit
+import socket
+import sqlite3
+import logging
+import argparse
+import threading
+import multiprocessing
+from pathlib import Path
+from datetime import datetime
+from contextlib import closing
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+from nlp_pipeline.progress import ProgressReporter
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    company TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL,
+    worker TEXT,
+    result TEXT,
+    error TEXT,
+    dedup_key TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS job_progress (
+    job_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    processed INTEGER,
+    total INTEGER,
+    message TEXT,
+    started_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (job_id, stage)
+);
+"""
+
+# Created after adding dedup_key to databases made before it existed
+DEDUP_INDEX = "CREATE INDEX IF NOT EXISTS idx_jobs_dedup ON jobs (dedup_key, status, finished_at)"
+
+class QueueFullError(Exception):
+    """Raised when too many jobs are already queued or running."""
+
+def _timestamp(value):
+    return datetime.fromtimestamp(value).isoformat() if value is not None else None
+
+def _worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class JobQueue:
+    """
+    Durable queue of analysis jobs in SQLite.
+    Jobs survive restarts of the API and of the workers: a job whose worker stopped while running
+    it (no heartbeat, or a dead process on this host) goes back to the queue, up to max_attempts.
+    """
+
+    def __init__(self, db_path, max_attempts=3, stale_after=60):
+        """
+        Initialize the queue, creating the database if needed.
+
+        Args:
+            db_path: Path to the SQLite database file
+            max_attempts: Number of times a job is started before it is marked as failed
+            stale_after: Seconds without a heartbeat after which a running job is considered orphaned
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_attempts = max_attempts
+        self.stale_after = stale_after
+
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            columns = [row['name'] for row in conn.execute("PRAGMA table_info(jobs)")]
+            if 'dedup_key' not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN dedup_key TEXT")
+            conn.execute(DEDUP_INDEX)
+
+    def _connect(self):
+        # Autocommit mode, so claim() can take the write lock up front with BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _to_dict(self, row) -> Dict[str, Any]:
+        return {
+            'job_id': row['job_id'],
+            'company': row['company'],
+            'payload': json.loads(row['payload']),
+            'status': row['status'],
+            'attempts': row['attempts'],
+            'created_at': _timestamp(row['created_at']),
+            'started_at': _timestamp(row['started_at']),
+            'finished_at': _timestamp(row['finished_at']),
+            'worker': row['worker'],
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error']
+        }
+
+    def enqueue(self, job_id, company, payload: Dict[str, Any], dedup_key=None, fresh_for=0,
+                max_pending=None) -> Tuple[Dict[str, Any], bool]:
+        """
+        Add a job to the queue, unless an identical one can be shared (single flight).
+        The lookup and the insert happen in one write transaction, so concurrent identical
+        requests, from any API worker, end up on the same job.
+
+        Args:
+            job_id: Unique identifier of the job (the analysis request id)
+            company: Company name
+            payload: Arguments of the job
+            dedup_key: Identifies identical jobs; None always queues a new job
+            fresh_for: Seconds during which a completed identical job is reused instead of running again
+            max_pending: Maximum number of queued and running jobs (None for no limit)
+
+        Returns:
+            Tuple of (job, whether it is an existing job)
+
+        Raises:
+            QueueFullError: If a new job is needed but max_pending jobs are already pending
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                existing = None
+                if dedup_key is not None:
+                    existing = conn.execute(
+                        "SELECT job_id FROM jobs WHERE dedup_key = ? AND status IN ('queued', 'processing') "
+                        "ORDER BY created_at LIMIT 1",
+                        (dedup_key,)
+                    ).fetchone()
+                    if existing is None and fresh_for > 0:
+                        existing = conn.execute(
+                            "SELECT job_id FROM jobs WHERE dedup_key = ? AND status = 'completed' AND finished_at >= ? "
+                            "ORDER BY finished_at DESC LIMIT 1",
+                            (dedup_key, now - fresh_for)
+                        ).fetchone()
+
+                if existing is None:
+                    if max_pending is not None:
+                        pending = conn.execute(
+                            "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'processing')"
+                        ).fetchone()[0]
+                        if pending >= max_pending:
+                            raise QueueFullError(f"{max_pending} analysis requests are already pending")
+                    conn.execute(
+                        "INSERT INTO jobs (job_id, company, payload, status, created_at, dedup_key) VALUES (?, ?, ?, 'queued', ?, ?)",
+                        (job_id, company, json.dumps(payload), now, dedup_key)
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        if existing is not None:
+            return self.get(existing['job_id']), True
+        return self.get(job_id), False
+
+    def claim(self, worker) -> Optional[Dict[str, Any]]:
+        """
+        Take the oldest queued job and mark it as processing by a worker.
+
+        Args:
+            worker: Identifier of the claiming worker
+
+        Returns:
+            The claimed job, or None if the queue is empty
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT job_id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'processing', attempts = attempts + 1, started_at = ?, "
+                        "heartbeat_at = ?, worker = ? WHERE job_id = ?",
+                        (now, now, worker, row['job_id'])
+                    )
+                    # A retried job reports its progress from scratch
+                    conn.execute("DELETE FROM job_progress WHERE job_id = ?", (row['job_id'],))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        return self.get(row['job_id']) if row is not None else None
+
+    def heartbeat(self, job_id, worker):
+        """Record that a worker is still running a job."""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE job_id = ? AND worker = ? AND status = 'processing'",
+                (time.time(), job_id, worker)
+            )
+
+    def complete(self, job_id, result: Dict[str, Any]):
+        """Mark a job as completed with its result."""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'completed', finished_at = ?, result = ?, error = NULL WHERE job_id = ?",
+                (time.time(), json.dumps(result), job_id)
+            )
+
+    def fail(self, job_id, error):
+        """Mark a job as failed."""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'error', finished_at = ?, error = ? WHERE job_id = ?",
+                (time.time(), str(error), job_id)
+            )
+
+    def requeue_orphaned(self) -> int:
+        """
+        Put back in the queue the running jobs whose worker is gone.
+        Jobs already started max_attempts times are marked as failed instead.
+
+        Returns:
+            Number of orphaned jobs found
+        """
+        now = time.time()
+        hostname = socket.gethostname()
+        orphaned = []
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT job_id, worker, attempts, heartbeat_at FROM jobs WHERE status = 'processing'"
+            ).fetchall()
+
+            for row in rows:
+                host, _, pid = (row['worker'] or '').rpartition(':')
+                dead_locally = host == hostname and pid.isdigit() and not _pid_alive(int(pid))
+                if dead_locally or (row['heartbeat_at'] or 0) < now - self.stale_after:
+                    orphaned.append(row)
+
+            for row in orphaned:
+                if row['attempts'] >= self.max_attempts:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'error', finished_at = ?, error = ? WHERE job_id = ? AND status = 'processing'",
+                        (now, f"Worker stopped while running the job ({row['attempts']} attempts)", row['job_id'])
+                    )
+                    logger.warning(f"Job {row['job_id']} failed after {row['attempts']} attempts")
+                else:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'queued', worker = NULL WHERE job_id = ? AND status = 'processing'",
+                        (row['job_id'],)
+                    )
+                    logger.warning(f"Requeued job {row['job_id']} of stopped worker {row['worker']}")
+
+        return len(orphaned)
+
+    def get(self, job_id) -> Optional[Dict[str, Any]]:
+        """
+        Get a job.
+
+        Args:
+            job_id: Identifier of the job
+
+        Returns:
+            The job, or None if it doesn't exist
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+
+            job = self._to_dict(row)
+            if job['status'] == 'queued':
+                job['queue_position'] = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at < ?", (row['created_at'],)
+                ).fetchone()[0]
+
+        return job
+
+    def purge_finished(self, older_than) -> int:
+        """
+        Delete the completed and failed jobs finished more than older_than seconds ago.
+
+        Args:
+            older_than: Age in seconds
+
+        Returns:
+            Number of jobs deleted
+        """
+        with closing(self._connect()) as conn:
+            cutoff = time.time() - older_than
+            conn.execute(
+                "DELETE FROM job_progress WHERE job_id IN "
+                "(SELECT job_id FROM jobs WHERE status IN ('completed', 'error') AND finished_at < ?)",
+                (cutoff,)
+            )
+            deleted = conn.execute(
+                "DELETE FROM jobs WHERE status IN ('completed', 'error') AND finished_at < ?", (cutoff,)
+            ).rowcount
+
+        if deleted:
+            logger.info(f"Purged {deleted} finished jobs")
+        return deleted
+
+    def get_progress(self, job_id) -> Optional[Dict[str, Any]]:
+        """
+        Get the progress of a job's pipeline run.
+
+        Args:
+            job_id: Identifier of the job
+
+        Returns:
+            Dictionary with the running stages, the progress of every stage reached so far and an
+            estimate of the seconds left (the slowest running stage), or None before any stage starts
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT * FROM job_progress WHERE job_id = ? ORDER BY started_at", (job_id,)
+            ).fetchall()
+
+        if not rows:
+            return None
+
+        now = time.time()
+        stages = {}
+        for row in rows:
+            stage = dict(row)
+            stages[row['stage']] = {
+                'status': row['status'],
+                'processed': row['processed'],
+                'total': row['total'],
+                'percent': round(100 * row['processed'] / row['total'], 1) if row['processed'] is not None and row['total'] else None,
+                'eta_seconds': _stage_eta(stage, now),
+                'updated_at': _timestamp(row['updated_at'])
+            }
+
+        etas = [stage['eta_seconds'] for stage in stages.values() if stage['eta_seconds'] is not None]
+        return {
+            'current_stages': [name for name, stage in stages.items() if stage['status'] == 'running'],
+            'stages': stages,
+            'eta_seconds': max(etas) if etas else None
+        }
+
+    def pending_count(self) -> int:
+        """Get the number of queued and running jobs."""
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'processing')").fetchone()[0]
+
+    def backlog(self) -> Dict[str, Any]:
+        """
+        Get the number of jobs by status and the age of the oldest queued job.
+
+        Returns:
+            Dictionary with the counts by status and the seconds the oldest queued job has waited (None if none)
+        """
+        with closing(self._connect()) as conn:
+            counts = {row['status']: row['jobs'] for row in conn.execute("SELECT status, COUNT(*) AS jobs FROM jobs GROUP BY status")}
+            oldest = conn.execute("SELECT MIN(created_at) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        return {
+            'counts': counts,
+            'oldest_queued_seconds': round(time.time() - oldest, 1) if oldest is not None else None
+        }
+
+class JobProgressReporter(ProgressReporter):
+    """
+    Records the progress of a job's pipeline run in the job_progress table of the queue database,
+    where the API reads it back. Holds only the database path, so it can be sent to stage processes.
+    """
+
+    def __init__(self, db_path, job_id):
+        """
+        Initialize the reporter.
+
+        Args:
+            db_path: Path to the job queue database
+            job_id: Identifier of the job
+        """
+        super().__init__()
+        self.db_path = str(db_path)
+        self.job_id = job_id
+
+    def _write(self, stage, status, processed=None, total=None, message=None):
+        now = time.time()
+        with closing(sqlite3.connect(self.db_path, timeout=30)) as conn:
+            with conn:
+                conn.execute(
+                    "INSERT INTO job_progress (job_id, stage, status, processed, total, message, started_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (job_id, stage) DO UPDATE SET status = excluded.status, "
+                    "processed = COALESCE(excluded.processed, processed), total = COALESCE(excluded.total, total), "
+                    "message = COALESCE(excluded.message, message), updated_at = excluded.updated_at",
+                    (self.job_id, stage, status, processed, total, message, now, now)
+                )
+
+    def stage_started(self, stage):
+        self._write(stage, 'running')
+
+    def stage_finished(self, stage, status='completed'):
+        self._write(stage, status)
+
+    def update(self, stage, processed, total=None, message=None):
+        self._write(stage, 'running', processed, total, message)
+
+def _stage_eta(stage, now):
+    """Estimate the seconds left in a running stage from its document rate so far."""
+    processed, total = stage['processed'], stage['total']
+    if stage['status'] != 'running' or not processed or not total:
+        return None
+    elapsed = now - stage['started_at']
+    return round(elapsed / processed * (total - processed), 1)
+
+def run_worker(db_path, stop_event, poll_interval=1.0, heartbeat_interval=10, stale_after=60, max_attempts=3,
+               processor_factory=None):
+    """
+    Worker process loop: run queued analysis jobs one at a time until stop_event is set.
+
+    Args:
+        db_path: Path to the job queue database
+        stop_event: Event telling the worker to stop once its current job is done
+        poll_interval: Seconds to wait when the queue is empty
+        heartbeat_interval: Seconds between heartbeats while a job runs
+        stale_after: See JobQueue
+        max_attempts: See JobQueue
+        processor_factory: Picklable callable creating the request processor from the queue
+            (defaults to AnalysisRequestProcessor)
+    """
+    # The pipeline is only imported in the workers, so the API process never loads the models
+    from nlp_pipeline.api.process_request import AnalysisRequestProcessor
+    from nlp_pipeline.api import metrics
+
+    queue = JobQueue(db_path, max_attempts=max_attempts, stale_after=stale_after)
+    processor = (processor_factory or AnalysisRequestProcessor)(job_queue=queue)
+    worker = _worker_id()
+    parent = os.getppid()
+    logger.info(f"Worker {worker} started")
+
+    while not stop_event.is_set():
+        if os.getppid() != parent:
+            # The pool's process died without stopping its workers
+            logger.warning(f"Worker {worker} lost its parent process, stopping")
+            break
+
+        job = queue.claim(worker)
+        if job is None:
+            queue.requeue_orphaned()
+            stop_event.wait(poll_interval)
+            continue
+
+        logger.info(f"Worker {worker} running job {job['job_id']} (attempt {job['attempts']})")
+        job_done = threading.Event()
+
+        def send_heartbeats(job_id=job['job_id']):
+            while not job_done.wait(heartbeat_interval):
+                queue.heartbeat(job_id, worker)
+
+        heartbeat_thread = threading.Thread(target=send_heartbeats, daemon=True)
+        heartbeat_thread.start()
+
+        start = time.perf_counter()
+        queue_wait = time.time() - datetime.fromisoformat(job['created_at']).timestamp()
+        status = 'error'
+        try:
+            progress = JobProgressReporter(db_path, job['job_id'])
+            result = processor.run_analysis(job['job_id'], job['payload'], progress=progress)
+            queue.complete(job['job_id'], result)
+            status = 'completed'
+            logger.info(f"Job {job['job_id']} completed")
+        except Exception as e:
+            logger.error(f"Job {job['job_id']} failed: {str(e)}")
+            queue.fail(job['job_id'], e)
+        finally:
+            job_done.set()
+            heartbeat_thread.join()
+            metrics.record_job(status, time.perf_counter() - start, queue_wait=queue_wait if job['attempts'] == 1 else None)
+
+        # Keep the request status store in step with the job
+        processor.status_store.put(processor.get_request_status(job['job_id']))
+
+    logger.info(f"Worker {worker} stopped")
+
+class WorkerPool:
+    """
+    Pool of worker processes running analysis jobs from a JobQueue.
+    The number of workers is the number of pipeline runs allowed at once; workers that die
+    are restarted, and their job goes back to the queue.
+    """
+
+    def __init__(self, db_path, workers=2, poll_interval=1.0, heartbeat_interval=10, stale_after=60, max_attempts=3,
+                 retention=None, processor_factory=None):
+        """
+        Initialize the pool.
+
+        Args:
+            db_path: Path to the job queue database
+            workers: Number of worker processes
+            poll_interval: Seconds a worker waits when the queue is empty
+            heartbeat_interval: Seconds between heartbeats of a running job
+            stale_after: Seconds without a heartbeat after which a running job is requeued
+            max_attempts: Number of times a job is started before it is marked as failed
+            retention: Seconds finished jobs are kept (None keeps them)
+            processor_factory: See run_worker
+        """
+        self.db_path = str(db_path)
+        self.retention = retention
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.worker_args = (poll_interval, heartbeat_interval, stale_after, max_attempts, processor_factory)
+        self.queue = JobQueue(db_path, max_attempts=max_attempts, stale_after=stale_after)
+
+        # Spawned rather than forked: the parent may be a multi-threaded server
+        self._context = multiprocessing.get_context('spawn')
+        self._stop_event = None
+        self._processes = []
+        self._supervisor = None
+
+    def _spawn(self):
+        # Not daemonic: the pipeline run by a job starts its own stage processes
+        process = self._context.Process(
+            target=run_worker, args=(self.db_path, self._stop_event) + self.worker_args, daemon=False
+        )
+        process.start()
+        return process
+
+    def _supervise(self):
+        while not self._stop_event.wait(self.poll_interval * 5):
+            for i, process in enumerate(self._processes):
+                if not process.is_alive():
+                    logger.warning(f"Worker process {process.pid} exited with code {process.exitcode}, restarting it")
+                    self._processes[i] = self._spawn()
+            self.queue.requeue_orphaned()
+            if self.retention is not None:
+                self.queue.purge_finished(self.retention)
+
+    def start(self):
+        """Requeue the jobs interrupted by a previous shutdown and start the workers."""
+        requeued = self.queue.requeue_orphaned()
+        if requeued:
+            logger.info(f"Found {requeued} interrupted jobs")
+
+        self._stop_event = self._context.Event()
+        self._processes = [self._spawn() for _ in range(self.workers)]
+        self._supervisor = threading.Thread(target=self._supervise, daemon=True)
+        self._supervisor.start()
+        # Non-daemonic workers would otherwise keep the interpreter from exiting
+        atexit.register(self.stop)
+        logger.info(f"Started {self.workers} analysis workers")
+
+    def stop(self, timeout=30):
+        """
+        Stop the workers, letting them finish their current job within the timeout.
+        Jobs still running after it are requeued on the next start.
+
+        Args:
+            timeout: Seconds to wait for each worker
+        """
+        if self._stop_event is None:
+            return
+
+        self._stop_event.set()
+        self._supervisor.join()
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                logger.warning(f"Worker process {process.pid} did not stop in time, terminating it")
+                process.terminate()
+                process.join()
+
+        self._processes = []
+        self._stop_event = None
+        atexit.unregister(self.stop)
+        logger.info("Stopped analysis workers")
+
+class PoolLock:
+    """
+    Exclusive lock on a file next to the queue database, held by the one API process that runs the
+    embedded worker pool, so several API workers don't each start their own pool. The lock is
+    released by the system when its process exits, and another API worker can then take it.
+    """
+
+    def __init__(self, db_path):
+        """
+        Initialize the lock.
+
+        Args:
+            db_path: Path to the job queue database
+        """
+        self.path = Path(f"{db_path}.pool.lock")
+        self._file = None
+
+    def acquire(self) -> bool:
+        """
+        Take the lock if no other process holds it.
+
+        Returns:
+            True if this process holds the lock
+        """
+        if self._file is not None:
+            return True
+        if fcntl is None:
+            # Without flock, a single API worker is assumed
+            return True
+
+        lock_file = open(self.path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+
+        self._file = lock_file
+        return True
+
+    def release(self):
+        """Release the lock if this process holds it."""
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+def main():
+    parser = argparse.ArgumentParser(description='Run analysis workers outside the API process')
+    parser.add_argument('--db', type=str, default=str(Path(__file__).parent.parent.parent / "data" / "jobs.db"),
+                        help='Path to the job queue database')
+    parser.add_argument('--workers', type=int, default=2, help='Number of worker processes')
+    parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+    parser.add_argument('--retention-hours', type=float, default=168, help='Hours finished jobs are kept')
+    args = parser.parse_args()
+
+    pool = WorkerPool(args.db, workers=args.workers, poll_interval=args.poll_interval,
+                      retention=args.retention_hours * 3600)
+    pool.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pool.stop()
+
+if __name__ == "__main__":
+    main()
@@ -2,18 +2,36 @@ import os
 import json
 import logging
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Optional
 from datetime import date, datetime
 import sys
+import time
+import asyncio
+import multiprocessing
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
-from fastapi import FastAPI, HTTPException, Query, Depends, BackgroundTasks
+import anyio
+from fastapi import FastAPI, HTTPException, Query, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, HTMLResponse
-from fastapi.responses import FileResponse, Response
+from fastapi.responses import JSONResponse, Response, ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 
 # Import the request processor
 from nlp_pipeline.api.process_request import request_processor
+from nlp_pipeline.api.job_queue import PoolLock, QueueFullError, WorkerPool
+from nlp_pipeline.api import metrics
+from nlp_pipeline.api.result_cache import RESULTS_VERSION_FILE, ResultCache
+from nlp_pipeline.api.http_cache import cache_headers, file_digest, file_validators, is_not_modified
+from nlp_pipeline.api.file_responses import RangeFileResponse, applicable_range
+from nlp_pipeline.api.response_encoding import compress, dumps_json, negotiate_encoding, orjson
+from nlp_pipeline.document_index import DOCUMENT_FILES, DOCUMENT_INDEX_FILE, SCORE_FIELD, DocumentIndex, paginate, project
+from nlp_pipeline.results_store import DOCUMENT_COLUMNS, KIND_COLUMNS, ResultsStore, join_document_results
+from nlp_pipeline.rollups import ROLLUPS_FILE
+from nlp_pipeline.storage import get_storage
+from nlp_pipeline.visualizations import needs_render, render
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -26,6 +44,8 @@ sys.path.append(str(Path(__file__).parent.parent.parent))
 BASE_DIR = Path(__file__).parent.parent.parent
 DATA_DIR = BASE_DIR / "data"
 NLP_RESULTS_DIR = DATA_DIR / "nlp_results"
+PROCESSED_DATA_DIR = DATA_DIR / "processed_data"
+RESULTS_DB_PATH = DATA_DIR / "results.db"
 
 # Load configuration
 def load_config():
@@ -45,13 +65,97 @@ def load_config():
 
 config = load_config()
 
+# Where the pipeline publishes results (storage.backend in config.json); with a remote backend,
+# the results of a company are synced into DATA_DIR before its routes read them
+results_storage = get_storage(config, DATA_DIR)
+
+# Parsed result files and their response bodies, shared by every route
+result_cache = ResultCache(
+    max_bytes=config.get('api', {}).get('result_cache_mb', 256) * 1024 * 1024,
+    storage=results_storage
+)
+
+# Joined per-document results published by the pipeline
+results_store = ResultsStore(RESULTS_DB_PATH)
+
+# Seconds clients may reuse a result response before revalidating it
+CACHE_MAX_AGE = config.get('api', {}).get('cache_max_age', 0)
+
+# Seconds between two reads of a job's status for its event stream, and between keep-alive comments
+EVENTS_POLL_INTERVAL = config.get('jobs', {}).get('events_poll_interval', 1.0)
+EVENTS_KEEPALIVE = 15
+
+# Threads reserved for reading result files, apart from Starlette's shared threadpool
+FILE_IO_THREADS = config.get('api', {}).get('file_io_threads', 16)
+
+# Processes rendering charts on demand, so plotting libraries and topic models stay out of the API process
+RENDER_WORKERS = config.get('api', {}).get('render_workers', 1)
+
 # Create FastAPI app
 app = FastAPI(
     title="RepuSense API",
     description="API for RepuSense NLP Pipeline",
-    version="1.0.0"
+    version="1.0.0",
+    # orjson serializes the remaining dynamic responses several times faster
+    default_response_class=ORJSONResponse if orjson is not None else JSONResponse
 )
 
+# Worker processes running the analysis jobs, unless they are run separately
+# (python -m nlp_pipeline.api.job_queue). With several API workers, only the one holding the
+# pool lock runs them; the others wait to take over if it exits.
+worker_pool = None
+pool_lock = PoolLock(request_processor.job_queue.db_path)
+_pool_stop = threading.Event()
+_pool_guard = threading.Lock()
+
+def _run_worker_pool_when_elected():
+    global worker_pool
+    jobs_config = config.get('jobs', {})
+    while not pool_lock.acquire():
+        if _pool_stop.wait(jobs_config.get('stale_after', 60)):
+            return
+    
+    with _pool_guard:
+        if _pool_stop.is_set():
+            pool_lock.release()
+            return
+        
+        logger.info(f"Process {os.getpid()} runs the analysis workers")
+        worker_pool = WorkerPool(
+            request_processor.job_queue.db_path,
+            workers=jobs_config.get('workers', 2),
+            poll_interval=jobs_config.get('poll_interval', 1.0),
+            stale_after=jobs_config.get('stale_after', 60),
+            max_attempts=jobs_config.get('max_attempts', 3),
+            # Finished jobs are kept as long as request statuses
+            retention=request_processor.status_store.ttl
+        )
+        worker_pool.start()
+
+@app.on_event("startup")
+def clear_stale_metrics():
+    metrics.clear_stale_metrics()
+
+@app.on_event("startup")
+def start_worker_pool():
+    if not config.get('jobs', {}).get('embedded_workers', True):
+        return
+    
+    threading.Thread(target=_run_worker_pool_when_elected, daemon=True).start()
+
+@app.on_event("shutdown")
+def stop_worker_pool():
+    _pool_stop.set()
+    with _pool_guard:
+        if worker_pool is not None:
+            worker_pool.stop()
+            pool_lock.release()
+
+@app.on_event("shutdown")
+def stop_render_workers():
+    if _render_executor is not None:
+        _render_executor.shutdown(wait=False, cancel_futures=True)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -61,6 +165,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def sync_company_results(request: Request, call_next):
+    """Bring a company's local results up to date with remote storage before its routes read them."""
+    if results_storage.is_remote and request.url.path.startswith("/api/company/"):
+        company = request.url.path.split("/")[3]
+        if company:
+            try:
+                await _run_file_io(_sync_company_results, company)
+            except Exception as e:
+                # Serve the local copy, possibly stale, rather than failing
+                logger.error(f"Error syncing results of {company} from storage: {str(e)}")
+    return await call_next(request)
+
+def _sync_company_results(company):
+    # The version file is downloaded last, so caches only switch once every file is current
+    results_storage.download_directory(f"nlp_results/{company}/", last=[RESULTS_VERSION_FILE])
+    try:
+        results_storage.local_path(f"processed_data/{company}/data_sources.json")
+    except FileNotFoundError:
+        pass
+
+# Outermost, so request durations include the other middleware
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Define data models
 class CompanyInfo(BaseModel):
     name: str
@@ -93,13 +221,23 @@ class AnalysisRequest(BaseModel):
     start_date: Optional[date] = None
     end_date: Optional[date] = None
     keyword: Optional[str] = None
-    async_processing: bool = False
+    async_processing: bool = False  # Kept for compatibility: every request is queued
 
 class AnalysisResponse(BaseModel):
     request_id: str
     status: str
     company: str
     timestamp: str
+    deduplicated: bool = False  # True when attached to an identical queued, running or recent job
+
+# Result files of a company, relative to its results directory
+RESULT_FILES = {
+    "topics.json": Path("topics") / "topic_distribution.json",
+    "sentiment.json": Path("sentiment") / "sentiment_results.json",
+    "keywords.json": Path("keywords") / "keyword_results.json",
+    "engagement.json": Path("engagement") / "engagement_results.json",
+    "wordcloud.json": Path("keywords") / "word_cloud_data.json"
+}
 
 # Helper function to load JSON data for a specific company
 def load_json_data(filename, company=None):
@@ -109,22 +247,14 @@ def load_json_data(filename, company=None):
     result = None
     
     if company:
-        file_mapping = {
-            "topics.json": NLP_RESULTS_DIR / company / "topics" / "topic_distribution.json",
-            "sentiment.json": NLP_RESULTS_DIR / company / "sentiment" / "sentiment_results.json",
-            "keywords.json": NLP_RESULTS_DIR / company / "keywords" / "keyword_results.json",
-            "engagement.json": NLP_RESULTS_DIR / company / "engagement" / "engagement_results.json",
-            "wordcloud.json": NLP_RESULTS_DIR / company / "keywords" / "word_cloud_data.json"
-        }
-        
-        if filename in file_mapping:
-            result = _try_load_json(file_mapping[filename])
+        if filename in RESULT_FILES:
+            result = _try_load_json(NLP_RESULTS_DIR / company / RESULT_FILES[filename], company)
         elif filename == "company_info.json":
             # Create company info on the fly
             result = {
                 "name": company,
                 "analysis_timestamp": datetime.now().isoformat(),
-                "data_sources": ["Reddit"]
+                "data_sources": get_company_data_source_names(company)
             }
     else:
         # Try to find the first available company
@@ -137,35 +267,330 @@ def load_json_data(filename, company=None):
     return result
 
 # Helper function to try loading a JSON file locally
-def _try_load_json(file_path):
-    if not file_path.exists():
-        logger.info(f"File not found: {file_path}")
-        return None
+def _try_load_json(file_path, company=None):
+    """Load a JSON file through the result cache. The returned data must not be modified."""
+    version = ResultCache.results_version(NLP_RESULTS_DIR / company) if company else None
     
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        logger.info(f"Successfully loaded data from {file_path}")
-        return data
+        data = result_cache.get_json(file_path, version)
     except Exception as e:
         logger.error(f"Error loading JSON data from {file_path}: {str(e)}")
         return None
+    
+    if data is None:
+        logger.info(f"File not found: {file_path}")
+    return data
+
+# Helper function to answer conditional GETs
+def _conditional_response(request: Request, validators, build, compressible=False):
+    """
+    Answer with 304 Not Modified if the client's copy is current, otherwise build the response.
+    Either way the response carries the ETag, Last-Modified and Cache-Control headers.
+    
+    Args:
+        request: Incoming request
+        validators: Tuple of (ETag, modification timestamp), see http_cache.file_validators
+        build: Function called with the negotiated content coding (or None), returning the full response
+        compressible: Whether to negotiate a compressed response
+    """
+    etag, last_modified = validators
+    encoding = negotiate_encoding(request.headers.get('accept-encoding')) if compressible else None
+    if encoding is not None:
+        # Every content coding is a separate representation with its own strong ETag
+        etag = f'{etag[:-1]}-{encoding}"'
+    
+    headers = cache_headers(etag, last_modified, CACHE_MAX_AGE)
+    if compressible:
+        headers['Vary'] = 'Accept-Encoding'
+    
+    not_modified = is_not_modified(request.headers, etag, last_modified)
+    if 'if-none-match' in request.headers or 'if-modified-since' in request.headers:
+        metrics.record_cache_lookup('http', not_modified)
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    
+    response = build(encoding)
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    response.headers.update(headers)
+    return response
+
+# Helper function to build a JSON response in a negotiated content coding
+def _json_response(data, encoding=None):
+    return Response(content=compress(dumps_json(data), encoding), media_type="application/json")
+
+# Helper function to serve a company's JSON result file
+def _json_file_response(request: Request, file_path, company, not_found_detail, error_detail="Error reading result data"):
+    """
+    Serve a JSON result file from its cached serialized body, without re-encoding it.
+    """
+    def build(encoding):
+        body = result_cache.get_bytes(file_path, ResultCache.results_version(NLP_RESULTS_DIR / company), encoding)
+        if body is None:
+            raise HTTPException(status_code=404, detail=not_found_detail)
+        return Response(content=body, media_type="application/json")
+    
+    try:
+        validators = file_validators(file_path)
+        if validators is None:
+            raise HTTPException(status_code=404, detail=not_found_detail)
+        return _conditional_response(request, validators, build, compressible=True)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error reading {file_path}: {str(e)}")
+        raise HTTPException(status_code=500, detail=error_detail)
+
+# Limits the blocking reads in flight; created on first use, inside the event loop
+_file_io_limiter = None
+
+async def _run_file_io(func, *args):
+    """
+    Run a blocking helper (file reads, parsing, SQLite queries) in a worker thread.
+    The threads are separate from Starlette's threadpool, so slow reads don't hold up other routes.
+    """
+    global _file_io_limiter
+    if _file_io_limiter is None:
+        _file_io_limiter = anyio.CapacityLimiter(FILE_IO_THREADS)
+    return await anyio.to_thread.run_sync(func, *args, limiter=_file_io_limiter)
+
+# Helper function to serve an HTML visualization or an image
+async def _static_file_response(request: Request, file_path, media_type, not_found_detail):
+    """
+    Stream a result file with async reads, answering Range requests with partial content,
+    or 304 if the client already has the current version.
+    """
+    validators = await _run_file_io(file_validators, file_path)
+    if validators is None:
+        raise HTTPException(status_code=404, detail=not_found_detail)
+    
+    range_header = applicable_range(request.headers, validators[0])
+    return _conditional_response(
+        request, validators,
+        lambda encoding: RangeFileResponse(file_path, media_type=media_type, range_header=range_header)
+    )
+
+# Renders charts in separate processes; created on the first chart request
+_render_executor = None
+# One lock per chart, so concurrent requests for a chart wait for a single render. Weakly held:
+# a lock goes away once no request is rendering or waiting on it, so the map doesn't grow per chart
+_render_locks = weakref.WeakValueDictionary()
+
+def _get_render_executor():
+    global _render_executor
+    if _render_executor is None:
+        # Spawned rather than forked: the API process has threads running
+        _render_executor = ProcessPoolExecutor(
+            max_workers=RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _render_executor
+
+async def _render_visualization(company_name, name):
+    """
+    Render a chart from the company's saved results if it is missing or older than them.
+    If rendering fails, the previous chart (if any) is served.
+    """
+    global _render_executor
+    company_dir = NLP_RESULTS_DIR / company_name
+    if not await _run_file_io(needs_render, company_dir, name):
+        metrics.record_cache_lookup('charts', True)
+        return
+    metrics.record_cache_lookup('charts', False)
+    
+    lock = _render_locks.setdefault((company_name, name), asyncio.Lock())
+    async with lock:
+        # Rendered by another request while this one waited
+        if not await _run_file_io(needs_render, company_dir, name):
+            return
+        
+        try:
+            await asyncio.wrap_future(_get_render_executor().submit(render, company_dir, name))
+        except BrokenProcessPool:
+            # A render process died (e.g. out of memory); start a new pool for the next request
+            logger.error(f"Render process died while rendering {name} for {company_name}")
+            _render_executor = None
+        except Exception as e:
+            logger.error(f"Error rendering {name} for {company_name}: {str(e)}")
+
+async def _visualization_response(request: Request, company_name, name, media_type, not_found_detail):
+    """Serve a chart, rendering it first if needed (see nlp_pipeline.visualizations)."""
+    await _render_visualization(company_name, name)
+    return await _static_file_response(request, NLP_RESULTS_DIR / company_name / name, media_type, not_found_detail)
+
+# Query parameters shared by the /documents routes
+class DocumentQuery:
+    def __init__(
+        self,
+        offset: int = Query(0, ge=0, description="Number of matching documents to skip"),
+        limit: int = Query(100, ge=1, le=1000, description="Maximum number of documents to return"),
+        cursor: Optional[int] = Query(None, ge=0, description="next_cursor of the previous page (replaces offset)"),
+        text_type: Optional[str] = Query(None, description="Only documents of this type (post, comment, article)"),
+        source: Optional[str] = Query(None, description="Only documents from this source (reddit, news)"),
+        sentiment: Optional[str] = Query(None, description="Only documents with this sentiment label"),
+        topic: Optional[int] = Query(None, description="Only documents in this topic"),
+        min_score: Optional[float] = Query(None, description="Minimum sentiment score"),
+        max_score: Optional[float] = Query(None, description="Maximum sentiment score"),
+        fields: Optional[str] = Query(None, description="Comma-separated fields to return")
+    ):
+        self.offset = offset
+        self.limit = limit
+        self.cursor = cursor
+        self.filters = {'text_type': text_type, 'source': source, 'sentiment': sentiment, 'topic': topic}
+        self.min_score = min_score
+        self.max_score = max_score
+        self.fields = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+        
+        unknown = [field for field in self.fields or [] if field not in DOCUMENT_COLUMNS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+# Document indexes by documents file, with the parsed documents they were loaded for
+_document_indexes = {}
+
+def _get_document_index(documents_path, documents, company):
+    """Get the index of a per-document result file, loading the one published by the pipeline."""
+    cached = _document_indexes.get(documents_path)
+    if cached is not None and cached[0] is documents:
+        return cached[1]
+    
+    data = _try_load_json(documents_path.parent / DOCUMENT_INDEX_FILE, company)
+    if data is not None and data.get('documents_digest') == file_digest(documents_path):
+        index = DocumentIndex.from_dict(data)
+    else:
+        # Results published before indexing (or an out of date index): index them in memory
+        logger.warning(f"No up to date document index for {documents_path}, building it")
+        index = DocumentIndex.build(documents)
+    
+    _document_indexes[documents_path] = (documents, index)
+    return index
+
+def _query_results_store(company, query: DocumentQuery, columns):
+    """Get one page of documents from the results store, or None if the company was never published there."""
+    try:
+        page = results_store.query_documents(
+            company, filters=query.filters, min_score=query.min_score, max_score=query.max_score,
+            offset=query.offset, limit=query.limit, cursor=query.cursor, fields=query.fields or columns
+        )
+    except Exception as e:
+        logger.error(f"Error querying the results store: {str(e)}")
+        return None
+    
+    if page is None:
+        return None
+    
+    return {
+        "total": page["total"],
+        "offset": query.offset if query.cursor is None else None,
+        "limit": query.limit,
+        "next_cursor": page["next_cursor"],
+        "documents": page["documents"]
+    }
+
+def _document_page(request: Request, company, kind, query: DocumentQuery, label):
+    """
+    Serve one page of a company's per-document results, revalidated against the results version
+    (filters from the results store depend on every stage), or against the result file for
+    companies without one.
+    """
+    documents_path = NLP_RESULTS_DIR / company / DOCUMENT_FILES[kind]
+    validators = file_validators(documents_path, request.url.query)
+    if validators is None:
+        raise HTTPException(status_code=404, detail=f"Documents with {label} data for company {company} not found")
+    validators = file_validators(NLP_RESULTS_DIR / company / RESULTS_VERSION_FILE, kind, request.url.query) or validators
+    
+    return _conditional_response(
+        request, validators,
+        lambda encoding: _json_response(_build_document_page(company, kind, query, label), encoding),
+        compressible=True
+    )
+
+def _build_document_page(company, kind, query: DocumentQuery, label):
+    """
+    Get one page of a company's per-document results.
+    Served from the results store, where every filter applies across stages; companies whose
+    results were not published there are filtered through the document index of the result file.
+    """
+    page = _query_results_store(company, query, KIND_COLUMNS[kind])
+    if page is not None:
+        return page
+    
+    documents_path = NLP_RESULTS_DIR / company / DOCUMENT_FILES[kind]
+    documents = _try_load_json(documents_path, company)
+    if documents is None:
+        raise HTTPException(status_code=404, detail=f"Documents with {label} data for company {company} not found")
+    
+    index = _get_document_index(documents_path, documents, company)
+    return _index_page(documents, index, query, f"documents with {label}")
+
+def _index_page(documents, index: DocumentIndex, query: DocumentQuery, label):
+    """Get one page of documents filtered through their index."""
+    for field, value in query.filters.items():
+        if value is not None and not index.supports(field):
+            raise HTTPException(status_code=400, detail=f"Filter '{field}' is not available for {label}")
+    if (query.min_score is not None or query.max_score is not None) and not index.supports(SCORE_FIELD):
+        raise HTTPException(status_code=400, detail=f"Score filters are not available for {label}")
+    
+    positions = index.query(query.filters, min_score=query.min_score, max_score=query.max_score)
+    page, next_cursor = paginate(positions, offset=query.offset, limit=query.limit, cursor=query.cursor)
+    
+    return {
+        "total": len(positions),
+        "offset": query.offset if query.cursor is None else None,
+        "limit": query.limit,
+        "next_cursor": next_cursor,
+        "documents": [project(documents[position], query.fields) for position in page]
+    }
+
+# Joined per-document results of companies missing from the results store, by company
+_joined_documents = {}
+
+def _get_joined_documents(company):
+    """
+    Join a company's per-document result files into one row per document, as the results store
+    holds them, and index the rows. Rebuilt when one of the files changes.
+    
+    Returns:
+        Tuple of (documents, DocumentIndex), or (None, None) if the company has no result files
+    """
+    company_dir = NLP_RESULTS_DIR / company
+    versions = tuple(file_validators(company_dir / relative_path) for relative_path in DOCUMENT_FILES.values())
+    
+    cached = _joined_documents.get(company)
+    if cached is not None and cached[0] == versions:
+        return cached[1], cached[2]
+    
+    if not any(versions):
+        return None, None
+    
+    documents = join_document_results(company_dir)
+    index = DocumentIndex.build(documents)
+    _joined_documents[company] = (versions, documents, index)
+    return documents, index
+
+# Helper function to get the names of the sources analyzed for a company
+def get_company_data_source_names(company):
+    """Get the display names of the data sources in a company's processed data."""
+    summary = _try_load_json(PROCESSED_DATA_DIR / company / "data_sources.json")
+    if not summary:
+        # Results produced before news ingestion only contain Reddit data
+        return ["Reddit"]
+    return [source["name"] for source in summary]
 
 # Helper function to get available companies
 def get_available_companies():
-    """Get list of available companies from local directory."""
+    """Get list of available companies from the results storage."""
     companies = []
+    source = "s3" if results_storage.is_remote else "local"
     
-    for company_dir in NLP_RESULTS_DIR.iterdir():
-        if company_dir.is_dir():
-            companies.append({
-                "name": company_dir.name,
-                "analysis_timestamp": datetime.now().isoformat(),
-                "data_sources": ["Reddit"],
-                "source": "local"
-            })
+    for company in results_storage.list_dirs("nlp_results/"):
+        companies.append({
+            "name": company,
+            "analysis_timestamp": datetime.now().isoformat(),
+            "data_sources": get_company_data_source_names(company),
+            "source": source
+        })
     
-    logger.info(f"Found {len(companies)} companies in local directory")
+    logger.info(f"Found {len(companies)} companies in {source} storage")
     return companies
 
 # API Routes
@@ -177,155 +602,123 @@ def read_root():
         "version": "1.0.0"
     }
 
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """
+    Get the API and job worker metrics in the Prometheus text format.
+    """
+    if not metrics.enabled():
+        raise HTTPException(status_code=404, detail="Metrics are not available, install prometheus_client")
+    
+    body, content_type = metrics.render(request_processor.job_queue)
+    return Response(content=body, headers={'Content-Type': content_type})
+
 @app.get("/api/companies")
-def get_companies():
+async def get_companies():
     """
     Get the list of available analyzed companies.
     """
-    return get_available_companies()
+    return await _run_file_io(get_available_companies)
 
 @app.get("/api/company/{company_name}")
-def get_company_info(company_name: str):
+async def get_company_info(company_name: str):
     """
     Get information about a specific company.
     """
-    company_info = load_json_data("company_info.json", company_name)
+    company_info = await _run_file_io(load_json_data, "company_info.json", company_name)
     if company_info is None:
         raise HTTPException(status_code=404, detail=f"Company {company_name} not found")
     return company_info
 
 @app.get("/api/company/{company_name}/topics")
-def get_company_topics(company_name: str):
+async def get_company_topics(request: Request, company_name: str):
     """
     Get topic distribution for a specific company.
     """
-    data = load_json_data("topics.json", company_name)
-    if data is None:
-        raise HTTPException(status_code=404, detail=f"Topic data for company {company_name} not found")
-    return data
+    return await _run_file_io(
+        _json_file_response,
+        request, NLP_RESULTS_DIR / company_name / RESULT_FILES["topics.json"], company_name,
+        f"Topic data for company {company_name} not found"
+    )
 
 @app.get("/api/company/{company_name}/sentiment")
-def get_company_sentiment(company_name: str):
+async def get_company_sentiment(request: Request, company_name: str):
     """
     Get sentiment analysis for a specific company.
     """
-    data = load_json_data("sentiment.json", company_name)
-    if data is None:
-        raise HTTPException(status_code=404, detail=f"Sentiment data for company {company_name} not found")
-    return data
+    return await _run_file_io(
+        _json_file_response,
+        request, NLP_RESULTS_DIR / company_name / RESULT_FILES["sentiment.json"], company_name,
+        f"Sentiment data for company {company_name} not found"
+    )
 
 @app.get("/api/company/{company_name}/keywords")
-def get_company_keywords(company_name: str):
+async def get_company_keywords(request: Request, company_name: str):
     """
     Get keywords for a specific company.
     """
-    data = load_json_data("keywords.json", company_name)
-    if data is None:
-        raise HTTPException(status_code=404, detail=f"Keyword data for company {company_name} not found")
-    return data
+    return await _run_file_io(
+        _json_file_response,
+        request, NLP_RESULTS_DIR / company_name / RESULT_FILES["keywords.json"], company_name,
+        f"Keyword data for company {company_name} not found"
+    )
 
 @app.get("/api/company/{company_name}/engagement")
-def get_company_engagement(company_name: str):
+async def get_company_engagement(request: Request, company_name: str):
     """
     Get engagement for a specific company.
     """
-    data = load_json_data("engagement.json", company_name)
-    if data is None:
-        raise HTTPException(status_code=404, detail=f"Engagement data for company {company_name} not found")
-    return data
+    return await _run_file_io(
+        _json_file_response,
+        request, NLP_RESULTS_DIR / company_name / RESULT_FILES["engagement.json"], company_name,
+        f"Engagement data for company {company_name} not found"
+    )
 
 @app.get("/api/company/{company_name}/wordcloud")
-def get_company_wordcloud(company_name: str):
+async def get_company_wordcloud(request: Request, company_name: str):
     """
     Get word cloud for a specific company.
     """
-    data = load_json_data("wordcloud.json", company_name)
-    if data is None:
-        raise HTTPException(status_code=404, detail=f"Word cloud data for company {company_name} not found")
-    return data
+    return await _run_file_io(
+        _json_file_response,
+        request, NLP_RESULTS_DIR / company_name / RESULT_FILES["wordcloud.json"], company_name,
+        f"Word cloud data for company {company_name} not found"
+    )
 
 @app.get("/api/company/{company_name}/wordcloud-image")
-def get_company_wordcloud_image(company_name: str):
+async def get_company_wordcloud_image(request: Request, company_name: str):
     """
     Get word cloud image for a specific company.
     """
-    image_path = NLP_RESULTS_DIR / company_name / "keywords" / "wordcloud.png"
-    if not image_path.exists():
-        raise HTTPException(status_code=404, detail=f"Word cloud image for company {company_name} not found")
-    
-    return FileResponse(image_path, media_type="image/png")
+    return await _visualization_response(request, company_name, "keywords/wordcloud.png", "image/png", f"Word cloud image for company {company_name} not found")
 
 @app.get("/api/company/{company_name}/topics/visualization-html")
-def get_company_topic_visualization_html(company_name: str):
+async def get_company_topic_visualization_html(request: Request, company_name: str):
     """
     Get the HTML visualization file for company topics.
     """
-    visualization_path = NLP_RESULTS_DIR / company_name / "topics" / "topic_visualization.html"
-    
-    if not visualization_path.exists():
-        raise HTTPException(status_code=404, detail=f"Topic visualization for {company_name} not found")
-    
-    try:
-        with open(visualization_path, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-        return HTMLResponse(content=html_content, status_code=200)
-    except Exception as e:
-        logger.error(f"Error reading topic visualization HTML: {str(e)}")
-        raise HTTPException(status_code=500, detail="Error reading visualization file")
+    return await _visualization_response(request, company_name, "topics/topic_visualization.html", "text/html", f"Topic visualization for {company_name} not found")
 
 @app.post("/api/analyze", response_model=AnalysisResponse)
-async def analyze_company(request: AnalysisRequest, background_tasks: BackgroundTasks):
+async def analyze_company(request: AnalysisRequest):
     """
     Trigger analysis for a company.
+    The request is queued and run by a worker process; poll /api/analyze/{request_id} for its status.
     """
     # Convert date objects to strings
     start_date = request.start_date.isoformat() if request.start_date else None
     end_date = request.end_date.isoformat() if request.end_date else None
     
-    if request.async_processing:
-        # Schedule asynchronous processing
-        status = request_processor.process_request_async(
-            company=request.company,
-            start_date=start_date,
-            end_date=end_date,
-            keyword=request.keyword
-        )
-    else:
-        # Create a placeholder request ID for immediate response
-        request_id = f"{request.company}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        
-        # For non-async requests, process in background task
-        background_tasks.add_task(
-            process_analysis_request_task,
-            request
-        )
-        
-        # Return immediate response with processing status
-        status = {
-            'request_id': request_id,
-            'status': 'processing',
-            'company': request.company,
-            'timestamp': datetime.now().isoformat()
-        }
-        
-        # Store in the request processor's memory
-        request_processor.requests[request_id] = status
-    
-    return status
-
-# Background task to process analysis request
-def process_analysis_request_task(request: AnalysisRequest):
-    # Convert date objects to strings
-    start_date = request.start_date.isoformat() if request.start_date else None
-    end_date = request.end_date.isoformat() if request.end_date else None
+    if request.keyword is not None and not request.keyword.strip():
+        raise HTTPException(status_code=400, detail="The keyword must not be blank")
     
-    # Process the request
-    request_processor.process_request_sync(
-        company=request.company,
-        start_date=start_date,
-        end_date=end_date,
-        keyword=request.keyword
-    )
+    # Every request goes through the job queue, so the pipeline never runs in the API process
+    try:
+        return await _run_file_io(
+            request_processor.process_request_async, request.company, start_date, end_date, request.keyword
+        )
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
 @app.get("/api/analyze/{request_id}")
 def get_analysis_status(request_id: str):
@@ -338,6 +731,51 @@ def get_analysis_status(request_id: str):
     
     return status
 
+def _sse_event(event, data):
+    """Format a Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {dumps_json(data).decode('utf-8')}\n\n"
+
+@app.get("/api/analyze/{request_id}/events")
+async def stream_analysis_events(request_id: str):
+    """
+    Stream the status of an analysis request as Server-Sent Events, instead of polling
+    /api/analyze/{request_id}. A 'status' event (same payload as the polling route, with the
+    current stages, documents processed and ETA while processing) is sent whenever it changes,
+    and the stream ends once the request is completed or failed.
+    """
+    status = await _run_file_io(request_processor.get_request_status, request_id)
+    if status['status'] == 'unknown':
+        raise HTTPException(status_code=404, detail=f"Analysis request {request_id} not found")
+    
+    async def events():
+        # Reconnect delay for the browser's EventSource, in milliseconds
+        yield "retry: 3000\n\n"
+        
+        current = status
+        last_sent = None
+        last_write = time.monotonic()
+        while True:
+            if current != last_sent:
+                yield _sse_event('status', current)
+                last_sent = current
+                last_write = time.monotonic()
+            elif time.monotonic() - last_write >= EVENTS_KEEPALIVE:
+                # Comment line, keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                last_write = time.monotonic()
+            
+            # 'unknown' once the request expired from the status store
+            if current['status'] in ('completed', 'error', 'unknown'):
+                return
+            
+            await anyio.sleep(EVENTS_POLL_INTERVAL)
+            current = await _run_file_io(request_processor.get_request_status, request_id)
+    
+    return StreamingResponse(
+        events(), media_type="text/event-stream",
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.get("/api/recommendations")
 def get_recommendations(company: str):
     """
@@ -459,232 +897,169 @@ def get_alerts(company: str):
     
     return {"alerts": alerts}
 
+@app.get("/api/company/{company_name}/rollups")
+async def get_company_rollups(request: Request, company_name: str):
+    """
+    Get the aggregates precomputed by the pipeline for a specific company
+    (totals, counts per sentiment, topic, text type and source, and weekly series).
+    """
+    return await _run_file_io(
+        _json_file_response,
+        request, NLP_RESULTS_DIR / company_name / ROLLUPS_FILE, company_name,
+        f"Rollups for company {company_name} not found"
+    )
+
+def _rollups_response(request: Request, company_name, view, build):
+    """Serve a view of a company's rollups, revalidated against the rollups file."""
+    rollups_path = NLP_RESULTS_DIR / company_name / ROLLUPS_FILE
+    validators = file_validators(rollups_path, view)
+    if validators is None:
+        raise HTTPException(status_code=404, detail=f"Rollups for company {company_name} not found")
+    
+    def build_response(encoding):
+        rollups = _try_load_json(rollups_path, company_name)
+        if rollups is None:
+            raise HTTPException(status_code=404, detail=f"Rollups for company {company_name} not found")
+        return _json_response(build(rollups), encoding)
+    
+    return _conditional_response(request, validators, build_response, compressible=True)
+
 @app.get("/api/company/{company_name}/data-sources")
-def get_company_data_sources(company_name: str):
+async def get_company_data_sources(request: Request, company_name: str):
     """
     Get data sources for a specific company.
     """
-    # Dummy data for data sources
-    data_sources = [
-        {
-            "name": "Reddit",
-            "post_count": 237,
-            "comment_count": 1582,
-            "sentiment_distribution": {
-                "positive": 45,
-                "neutral": 30,
-                "negative": 25
-            },
-            "last_updated": "2023-12-01T12:00:00Z"
-        },
-        {
-            "name": "News Articles",
-            "post_count": 87,
-            "comment_count": 342,
-            "sentiment_distribution": {
-                "positive": 52,
-                "neutral": 33,
-                "negative": 15
-            },
-            "last_updated": "2023-12-03T15:45:00Z"
-        }
-    ]
+    return await _run_file_io(_rollups_response, request, company_name, "data-sources", lambda rollups: rollups["by_source"])
+
+def _content_stats(rollups):
+    totals = rollups["totals"]
     
-    return data_sources
+    return {
+        "total_content": totals["documents"],
+        "posts": totals["posts"],
+        "articles": totals["articles"],
+        "comments": totals["comments"],
+        "by_source": {source["name"]: source["post_count"] + source["comment_count"] for source in rollups["by_source"]}
+    }
 
 @app.get("/api/company/{company_name}/content-stats")
-def get_company_content_stats(company_name: str):
+async def get_company_content_stats(request: Request, company_name: str):
     """
     Get content statistics for a specific company.
     """
-    # Reuse data from data sources to calculate totals (Reddit and News Articles)
-    data_sources = get_company_data_sources(company_name)
-    
-    # Calculate total posts, articles, and comments
-    total_posts = sum(source["post_count"] for source in data_sources if "post_count" in source)
-    total_comments = sum(source["comment_count"] for source in data_sources if "comment_count" in source)
-    
-    # Get articles count (from News Articles source)
-    articles_source = next((source for source in data_sources if source["name"] == "News Articles"), None)
-    total_articles = articles_source["post_count"] if articles_source else 0
-    
-    # Calculate total social media posts (from Reddit)
-    social_posts = total_posts - total_articles
-    
-    return {
-        "total_content": total_posts + total_comments,
-        "posts": social_posts,
-        "articles": total_articles,
-        "comments": total_comments,
-        "by_source": {source["name"]: source["post_count"] + source["comment_count"] for source in data_sources}
-    }
+    return await _run_file_io(_rollups_response, request, company_name, "content-stats", _content_stats)
 
 @app.get("/api/company/{company_name}/topics/barchart")
-def get_company_topic_barchart(company_name: str):
+async def get_company_topic_barchart(request: Request, company_name: str):
     """
     Get the HTML barchart visualization for company topics.
     """
-    visualization_path = NLP_RESULTS_DIR / company_name / "topics" / "topic_barchart.html"
-    
-    if not visualization_path.exists():
-        raise HTTPException(status_code=404, detail=f"Topic barchart for {company_name} not found")
-    
-    try:
-        with open(visualization_path, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-        return HTMLResponse(content=html_content, status_code=200)
-    except Exception as e:
-        logger.error(f"Error reading topic barchart HTML: {str(e)}")
-        raise HTTPException(status_code=500, detail="Error reading visualization file")
+    return await _visualization_response(request, company_name, "topics/topic_barchart.html", "text/html", f"Topic barchart for {company_name} not found")
 
 @app.get("/api/company/{company_name}/topics/keywords")
-def get_company_topic_keywords(company_name: str):
+async def get_company_topic_keywords(company_name: str):
     """
     Get topic keywords data for a specific company.
     """
-    data = load_json_data("topic_keywords.json", company_name)
+    data = await _run_file_io(load_json_data, "topic_keywords.json", company_name)
     if data is None:
         raise HTTPException(status_code=404, detail=f"Topic keywords data for company {company_name} not found")
     return data
 
 @app.get("/api/company/{company_name}/sentiment/distribution")
-def get_company_sentiment_distribution(company_name: str):
+async def get_company_sentiment_distribution(request: Request, company_name: str):
     """
     Get the HTML visualization for sentiment distribution.
     """
-    visualization_path = NLP_RESULTS_DIR / company_name / "sentiment" / "sentiment_distribution.html"
-    
-    if not visualization_path.exists():
-        raise HTTPException(status_code=404, detail=f"Sentiment distribution for {company_name} not found")
-    
-    try:
-        with open(visualization_path, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-        return HTMLResponse(content=html_content, status_code=200)
-    except Exception as e:
-        logger.error(f"Error reading sentiment distribution HTML: {str(e)}")
-        raise HTTPException(status_code=500, detail="Error reading visualization file")
+    return await _visualization_response(request, company_name, "sentiment/sentiment_distribution.html", "text/html", f"Sentiment distribution for {company_name} not found")
 
 @app.get("/api/company/{company_name}/engagement/top-posts")
-def get_company_top_engaged_posts(company_name: str):
+async def get_company_top_engaged_posts(request: Request, company_name: str):
     """
     Get the HTML visualization for top engaged posts.
     """
-    visualization_path = NLP_RESULTS_DIR / company_name / "engagement" / "top_engaged_posts.html"
-    
-    if not visualization_path.exists():
-        raise HTTPException(status_code=404, detail=f"Top engaged posts visualization for {company_name} not found")
-    
-    try:
-        with open(visualization_path, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-        return HTMLResponse(content=html_content, status_code=200)
-    except Exception as e:
-        logger.error(f"Error reading top engaged posts HTML: {str(e)}")
-        raise HTTPException(status_code=500, detail="Error reading visualization file")
+    return await _visualization_response(request, company_name, "engagement/top_engaged_posts.html", "text/html", f"Top engaged posts visualization for {company_name} not found")
 
 @app.get("/api/company/{company_name}/engagement/distribution")
-def get_company_engagement_distribution(company_name: str):
+async def get_company_engagement_distribution(request: Request, company_name: str):
     """
     Get the HTML visualization for engagement distribution.
     """
-    visualization_path = NLP_RESULTS_DIR / company_name / "engagement" / "engagement_distribution.html"
-    
-    if not visualization_path.exists():
-        raise HTTPException(status_code=404, detail=f"Engagement distribution for {company_name} not found")
-    
-    try:
-        with open(visualization_path, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-        return HTMLResponse(content=html_content, status_code=200)
-    except Exception as e:
-        logger.error(f"Error reading engagement distribution HTML: {str(e)}")
-        raise HTTPException(status_code=500, detail="Error reading visualization file")
+    return await _visualization_response(request, company_name, "engagement/engagement_distribution.html", "text/html", f"Engagement distribution for {company_name} not found")
 
 @app.get("/api/company/{company_name}/engagement/analysis")
-def get_company_engagement_analysis(company_name: str):
+async def get_company_engagement_analysis(request: Request, company_name: str):
     """
     Get engagement analysis data for a specific company.
     """
-    file_path = NLP_RESULTS_DIR / company_name / "engagement" / "engagement_analysis.json"
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail=f"Engagement analysis data for company {company_name} not found")
-    
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return data
-    except Exception as e:
-        logger.error(f"Error reading engagement analysis data: {str(e)}")
-        raise HTTPException(status_code=500, detail="Error reading engagement analysis data")
+    return await _run_file_io(
+        _json_file_response,
+        request, NLP_RESULTS_DIR / company_name / "engagement" / "engagement_analysis.json", company_name,
+        f"Engagement analysis data for company {company_name} not found",
+        "Error reading engagement analysis data"
+    )
 
 @app.get("/api/company/{company_name}/topics/info")
-def get_company_topic_info(company_name: str):
+async def get_company_topic_info(request: Request, company_name: str):
     """
     Get detailed topic information for a specific company.
     """
-    file_path = NLP_RESULTS_DIR / company_name / "topics" / "topic_info.json"
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail=f"Topic info data for company {company_name} not found")
+    return await _run_file_io(
+        _json_file_response,
+        request, NLP_RESULTS_DIR / company_name / "topics" / "topic_info.json", company_name,
+        f"Topic info data for company {company_name} not found",
+        "Error reading topic info data"
+    )
+
+@app.get("/api/company/{company_name}/documents")
+async def get_company_documents(request: Request, company_name: str, query: DocumentQuery = Depends()):
+    """
+    Get documents with their sentiment, topic and keywords for a specific company.
+    Every filter can be combined, e.g. negative comments in one topic. Served from the results
+    store, or from the joined result files for companies not published there.
+    """
+    def build(encoding):
+        page = _query_results_store(company_name, query, None)
+        if page is None:
+            # Results not published to the store (e.g. produced by an older pipeline): join the result files
+            documents, index = _get_joined_documents(company_name)
+            if documents is None:
+                raise HTTPException(status_code=404, detail=f"Document results for company {company_name} not found")
+            page = _index_page(documents, index, query, "documents")
+        return _json_response(page, encoding)
     
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return data
-    except Exception as e:
-        logger.error(f"Error reading topic info data: {str(e)}")
-        raise HTTPException(status_code=500, detail="Error reading topic info data")
+    def respond():
+        # Every published run rewrites the results version
+        validators = file_validators(NLP_RESULTS_DIR / company_name / RESULTS_VERSION_FILE, request.url.query)
+        if validators is None:
+            return build(None)
+        return _conditional_response(request, validators, build, compressible=True)
+    
+    return await _run_file_io(respond)
 
 @app.get("/api/company/{company_name}/documents/topics")
-def get_company_documents_with_topics(company_name: str):
+async def get_company_documents_with_topics(request: Request, company_name: str, query: DocumentQuery = Depends()):
     """
     Get documents with their associated topics for a specific company.
+    Paginated (offset or cursor), filterable and with optional field projection.
     """
-    file_path = NLP_RESULTS_DIR / company_name / "topics" / "documents_with_topics.json"
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail=f"Documents with topics data for company {company_name} not found")
-    
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return data
-    except Exception as e:
-        logger.error(f"Error reading documents with topics data: {str(e)}")
-        raise HTTPException(status_code=500, detail="Error reading documents with topics data")
+    return await _run_file_io(_document_page, request, company_name, "topics", query, "topics")
 
 @app.get("/api/company/{company_name}/documents/sentiment")
-def get_company_documents_with_sentiment(company_name: str):
+async def get_company_documents_with_sentiment(request: Request, company_name: str, query: DocumentQuery = Depends()):
     """
     Get documents with their sentiment analysis for a specific company.
+    Paginated (offset or cursor), filterable and with optional field projection.
     """
-    file_path = NLP_RESULTS_DIR / company_name / "sentiment" / "documents_with_sentiment.json"
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail=f"Documents with sentiment data for company {company_name} not found")
-    
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return data
-    except Exception as e:
-        logger.error(f"Error reading documents with sentiment data: {str(e)}")
-        raise HTTPException(status_code=500, detail="Error reading documents with sentiment data")
+    return await _run_file_io(_document_page, request, company_name, "sentiment", query, "sentiment")
 
 @app.get("/api/company/{company_name}/documents/keywords")
-def get_company_documents_with_keywords(company_name: str):
+async def get_company_documents_with_keywords(request: Request, company_name: str, query: DocumentQuery = Depends()):
     """
     Get documents with their keywords for a specific company.
+    Paginated (offset or cursor), filterable and with optional field projection.
     """
-    file_path = NLP_RESULTS_DIR / company_name / "keywords" / "documents_with_keywords.json"
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail=f"Documents with keywords data for company {company_name} not found")
-    
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return data
-    except Exception as e:
-        logger.error(f"Error reading documents with keywords data: {str(e)}")
-        raise HTTPException(status_code=500, detail="Error reading documents with keywords data")
+    return await _run_file_io(_document_page, request, company_name, "keywords", query, "keywords")
 
 if __name__ == "__main__":
     import uvicorn
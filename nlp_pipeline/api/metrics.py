@@ -0,0 +1,232 @@
+import os
+import time
+import logging
+from pathlib import Path
+from typing import Any, Dict
+
+# Metrics are shared by every process that records them (API workers, analysis job workers) through
+# files in a common directory. prometheus_client reads the directory when it is imported, so it is set
+# first; spawned workers inherit it. Deployments setting the directory clear it before starting the API
+# (see the Dockerfile), so metrics of earlier runs are not added to the current ones; the default
+# directory is cleared by the API itself (see clear_stale_metrics).
+DEFAULT_METRICS_DIR = 'PROMETHEUS_MULTIPROC_DIR' not in os.environ
+METRICS_DIR = Path(os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', str(Path(__file__).parent.parent.parent / "data" / "metrics")
+))
+METRICS_DIR.mkdir(parents=True, exist_ok=True)
+
+try:
+    import prometheus_client
+    from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+    from prometheus_client.core import GaugeMetricFamily
+except ImportError:  # The API runs without a /metrics endpoint
+    prometheus_client = None
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Buckets in seconds, from cached API responses to full pipeline runs
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+MODEL_LOAD_BUCKETS = (0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+STAGE_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200)
+
+if prometheus_client is not None:
+    REQUEST_DURATION = Histogram(
+        'repusense_http_request_duration_seconds', 'Time to serve API requests',
+        ['method', 'route', 'status'], buckets=REQUEST_BUCKETS
+    )
+    REQUESTS_IN_PROGRESS = Gauge(
+        'repusense_http_requests_in_progress', 'API requests being served', multiprocess_mode='livesum'
+    )
+    CACHE_LOOKUPS = Counter(
+        'repusense_cache_lookups_total',
+        'Cache lookups of the API: parsed result files (results), client revalidations (http) and charts (charts)',
+        ['cache', 'result']
+    )
+    JOBS_FINISHED = Counter('repusense_jobs_finished_total', 'Analysis jobs run by the workers', ['status'])
+    JOB_DURATION = Histogram(
+        'repusense_job_duration_seconds', 'Time to run an analysis job', ['status'], buckets=STAGE_BUCKETS
+    )
+    JOB_QUEUE_WAIT = Histogram(
+        'repusense_job_queue_wait_seconds', 'Time analysis jobs wait in the queue before a worker starts them',
+        buckets=STAGE_BUCKETS
+    )
+    STAGE_DURATION = Histogram(
+        'repusense_pipeline_stage_duration_seconds', 'Duration of pipeline stages run by analysis jobs',
+        ['stage', 'cache'], buckets=STAGE_BUCKETS
+    )
+    MODEL_LOAD_DURATION = Histogram(
+        'repusense_model_load_duration_seconds', 'Time pipeline stages take to load their model',
+        ['stage'], buckets=MODEL_LOAD_BUCKETS
+    )
+
+def enabled() -> bool:
+    """Whether metrics are collected (prometheus_client is installed)."""
+    return prometheus_client is not None
+
+def record_cache_lookup(cache, hit):
+    """
+    Count a cache lookup.
+
+    Args:
+        cache: Cache name ('results', 'http' or 'charts')
+        hit: Whether the lookup was served from the cache
+    """
+    if prometheus_client is not None:
+        CACHE_LOOKUPS.labels(cache, 'hit' if hit else 'miss').inc()
+
+def record_job(status, duration, queue_wait=None):
+    """
+    Record an analysis job run by a worker.
+
+    Args:
+        status: Final status of the job ('completed' or 'error')
+        duration: Seconds the job ran
+        queue_wait: Seconds the job was queued before it started
+    """
+    if prometheus_client is None:
+        return
+    JOBS_FINISHED.labels(status).inc()
+    JOB_DURATION.labels(status).observe(duration)
+    if queue_wait is not None:
+        JOB_QUEUE_WAIT.observe(max(0.0, queue_wait))
+
+def record_stage_metrics(stage_metrics: Dict[str, Any]):
+    """
+    Record the stage durations and model load times of a pipeline run.
+
+    Args:
+        stage_metrics: Metrics of every stage, by stage name (as returned by StageGraph.run)
+    """
+    if prometheus_client is None:
+        return
+    for stage, metrics in stage_metrics.items():
+        if stage.startswith('_') or metrics.get('wall_time_seconds') is None:
+            continue
+        STAGE_DURATION.labels(stage, metrics.get('cache', 'disabled')).observe(metrics['wall_time_seconds'])
+
+        # Recorded when the stage is instrumented (see nlp_pipeline.instrumentation)
+        load_model = (metrics.get('instrumentation') or {}).get('timers', {}).get('load_model')
+        if load_model is not None:
+            MODEL_LOAD_DURATION.labels(stage).observe(load_model['seconds'])
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _mark_dead_processes():
+    """Drop the live gauges of processes that exited (e.g. a restarted API worker)."""
+    for path in METRICS_DIR.glob('gauge_live*_*.db'):
+        try:
+            pid = int(path.stem.rsplit('_', 1)[1])
+        except ValueError:
+            continue
+        if not _pid_alive(pid):
+            multiprocess.mark_process_dead(pid, str(METRICS_DIR))
+
+def clear_stale_metrics():
+    """
+    Delete the metric files of processes that are no longer running (earlier runs of the API and
+    their job workers) from the default metrics directory. Files of running processes are kept, so
+    uvicorn workers starting one after the other don't delete each other's metrics.
+    """
+    if not DEFAULT_METRICS_DIR:
+        return
+
+    removed = 0
+    for path in METRICS_DIR.glob('*.db'):
+        try:
+            pid = int(path.stem.rsplit('_', 1)[1])
+        except (IndexError, ValueError):
+            continue
+        if not _pid_alive(pid):
+            path.unlink(missing_ok=True)
+            removed += 1
+
+    if removed:
+        logger.info(f"Removed {removed} metric files of earlier runs from {METRICS_DIR}")
+
+class JobQueueCollector:
+    """
+    Reports the state of the job queue when metrics are scraped. Read from the queue database,
+    so every API worker reports the same values.
+    """
+
+    def __init__(self, job_queue):
+        self.job_queue = job_queue
+
+    def collect(self):
+        backlog = self.job_queue.backlog()
+
+        jobs = GaugeMetricFamily('repusense_jobs', 'Analysis jobs in the queue database, by status', labels=['status'])
+        for status in ['queued', 'processing', 'completed', 'error']:
+            jobs.add_metric([status], backlog['counts'].get(status, 0))
+        yield jobs
+
+        yield GaugeMetricFamily(
+            'repusense_job_queue_oldest_seconds', 'Age of the oldest queued analysis job',
+            value=backlog['oldest_queued_seconds'] or 0
+        )
+
+def render(job_queue=None):
+    """
+    Render the metrics of every process in the Prometheus text format.
+
+    Args:
+        job_queue: JobQueue whose backlog is reported
+
+    Returns:
+        Tuple of (body, content type)
+
+    Raises:
+        RuntimeError: If prometheus_client is not installed
+    """
+    if prometheus_client is None:
+        raise RuntimeError("prometheus_client is required for metrics. Install it with 'pip install prometheus_client'.")
+
+    _mark_dead_processes()
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=str(METRICS_DIR))
+    if job_queue is not None:
+        registry.register(JobQueueCollector(job_queue))
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request. Requests are labelled by route template
+    (e.g. /api/company/{company_name}/topics), so the number of series doesn't grow with companies.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or prometheus_client is None:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        start = time.perf_counter()
+        REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+            # The router stores the matched route in the scope
+            route = scope.get('route')
+            REQUEST_DURATION.labels(
+                scope['method'], getattr(route, 'path', 'unmatched'), str(status)
+            ).observe(time.perf_counter() - start)
@@ -4,10 +4,8 @@ import json
 import logging
 from pathlib import Path
 from typing import Dict, Any, Optional
-import subprocess
 from datetime import datetime
 import uuid
-import time
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -16,8 +14,8 @@ logger = logging.getLogger(__name__)
 # Add the parent directory to sys.path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
-# Import the NLP pipeline
-from nlp_pipeline.main import NLPPipeline
+from nlp_pipeline.api.job_queue import JobQueue
+from nlp_pipeline.api.request_status import RequestStatusStore
 
 # Load configuration from config.json
 def load_config():
@@ -43,14 +41,19 @@ class AnalysisRequestProcessor:
     This is used by the API to trigger analysis on demand.
     """
     
-    def __init__(self, s3_bucket=None):
+    def __init__(self, s3_bucket=None, job_queue=None, status_store=None):
         """
         Initialize the request processor.
         
         Args:
-            s3_bucket: S3 bucket name for results storage
+            s3_bucket: S3 bucket name for results storage (defaults to REPUSENSE_S3_BUCKET)
+            job_queue: Queue of the analysis jobs (defaults to data/jobs.db)
+            status_store: Store of the request statuses (defaults to data/requests.db)
         """
         self.base_dir = Path(__file__).parent.parent.parent
+        s3_bucket = s3_bucket or os.environ.get('REPUSENSE_S3_BUCKET')
+        # Results go to S3 when a bucket is given or storage.backend is "s3" in config.json
+        self.use_s3 = bool(s3_bucket) or config.get('storage', {}).get('backend') == 's3'
         self.s3_bucket = s3_bucket or config.get('s3', {}).get('bucket', "repusense-results")
         
         # Create data directory structure
@@ -61,10 +64,24 @@ class AnalysisRequestProcessor:
         os.makedirs(self.data_dir, exist_ok=True)
         os.makedirs(self.nlp_results_dir, exist_ok=True)
         
-        # In-memory request tracking
-        self.requests = {}
+        # Request statuses, persisted and shared by every API worker
+        self.status_store = status_store or RequestStatusStore(
+            self.data_dir / "requests.db",
+            ttl=config.get('requests', {}).get('ttl_hours', 168) * 3600
+        )
+        
+        # Analysis jobs, run by worker processes (see job_queue.WorkerPool)
+        jobs_config = config.get('jobs', {})
+        self.max_pending = jobs_config.get('max_pending', 100)
+        # Seconds during which the result of an identical request is reused (0 always runs again)
+        self.result_freshness = jobs_config.get('result_freshness', 900)
+        self.job_queue = job_queue or JobQueue(
+            self.data_dir / "jobs.db",
+            max_attempts=jobs_config.get('max_attempts', 3),
+            stale_after=jobs_config.get('stale_after', 60)
+        )
         
-        logger.info(f"Analysis request processor initialized. S3 bucket: {self.s3_bucket}")
+        logger.info(f"Analysis request processor initialized. S3 bucket: {self.s3_bucket if self.use_s3 else 'none'}")
     
     def _generate_request_id(self, company: str) -> str:
         """
@@ -79,6 +96,64 @@ class AnalysisRequestProcessor:
         request_id = f"{company}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{str(uuid.uuid4())[:8]}"
         return request_id
     
+    def run_analysis(self, request_id: str, request_data: Dict[str, Any], progress=None) -> Dict[str, Any]:
+        """
+        Run the pipeline for a request. Called in the current process, or by a job queue worker.
+        
+        Args:
+            request_id: Request ID
+            request_data: Company, dates and keyword of the request
+            progress: ProgressReporter receiving the run's progress (optional)
+            
+        Returns:
+            Completed status with the paths to the NLP results
+        """
+        # Imported here: only the job workers run the pipeline, so the API process never loads it
+        from nlp_pipeline.main import NLPPipeline
+        from nlp_pipeline.api import metrics
+        
+        company = request_data['company']
+        
+        # Initialize the pipeline; stages are instrumented when metrics are collected, for model load times
+        pipeline = NLPPipeline(
+            company_name=company,
+            use_s3=self.use_s3,
+            s3_bucket=self.s3_bucket,
+            instrument=metrics.enabled() or None
+        )
+        
+        # Run the pipeline
+        results = pipeline.run_pipeline(
+            start_date=request_data['start_date'],
+            end_date=request_data['end_date'],
+            keyword=request_data.get('keyword'),
+            progress=progress
+        )
+        metrics.record_stage_metrics(results.get('stage_metrics', {}))
+        
+        # Build paths to the NLP results
+        nlp_result_paths = {
+            'topics': str(self.nlp_results_dir / company / "topics" / "topic_distribution.json"),
+            'sentiment': str(self.nlp_results_dir / company / "sentiment" / "sentiment_results.json"),
+            'keywords': str(self.nlp_results_dir / company / "keywords" / "keyword_results.json"),
+            'engagement': str(self.nlp_results_dir / company / "engagement" / "engagement_results.json"),
+            'wordcloud': str(self.nlp_results_dir / company / "keywords" / "word_cloud_data.json"),
+            'wordcloud_image': str(self.nlp_results_dir / company / "keywords" / "wordcloud.png"),
+            'topic_visualization': str(self.nlp_results_dir / company / "topics" / "topic_visualization.html")
+        }
+        
+        # Create status
+        status = {
+            'request_id': request_id,
+            'status': 'completed',
+            'company': company,
+            'timestamp': datetime.now().isoformat(),
+            's3_urls': results.get('s3_urls', {}),
+            'nlp_data': nlp_result_paths
+        }
+        
+        return status
+    
     def process_request_sync(self, company: str, start_date: Optional[str] = None, 
                             end_date: Optional[str] = None, keyword: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -116,52 +191,20 @@ class AnalysisRequestProcessor:
             'timestamp': datetime.now().isoformat()
         }
         
-        # Store initial status in memory
-        self.requests[request_id] = {
+        # Store initial status
+        self.status_store.put({
             'request_id': request_id,
             'status': 'processing',
             'company': company,
             'timestamp': datetime.now().isoformat(),
             'request_data': request_data
-        }
+        })
         
         try:
-            # Initialize the pipeline
-            pipeline = NLPPipeline(
-                company_name=company,
-                use_s3=bool(self.s3_bucket),
-                s3_bucket=self.s3_bucket
-            )
-            
-            # Run the pipeline
-            results = pipeline.run_pipeline(
-                start_date=start_date,
-                end_date=end_date
-            )
+            status = self.run_analysis(request_id, request_data)
             
-            # Build paths to the NLP results
-            nlp_result_paths = {
-                'topics': str(self.nlp_results_dir / company / "topics" / "topic_distribution.json"),
-                'sentiment': str(self.nlp_results_dir / company / "sentiment" / "sentiment_results.json"),
-                'keywords': str(self.nlp_results_dir / company / "keywords" / "keyword_results.json"),
-                'engagement': str(self.nlp_results_dir / company / "engagement" / "engagement_results.json"),
-                'wordcloud': str(self.nlp_results_dir / company / "keywords" / "word_cloud_data.json"),
-                'wordcloud_image': str(self.nlp_results_dir / company / "keywords" / "wordcloud.png"),
-                'topic_visualization': str(self.nlp_results_dir / company / "topics" / "topic_visualization.html")
-            }
-            
-            # Create status
-            status = {
-                'request_id': request_id,
-                'status': 'completed',
-                'company': company,
-                'timestamp': datetime.now().isoformat(),
-                's3_urls': results.get('s3_urls', {}),
-                'nlp_data': nlp_result_paths
-            }
-            
-            # Store the status in memory
-            self.requests[request_id] = status
+            # Store the status
+            self.status_store.put(status)
             
             logger.info(f"Request {request_id} completed successfully")
             return status
@@ -169,7 +212,7 @@ class AnalysisRequestProcessor:
         except Exception as e:
             logger.error(f"Error processing request {request_id}: {str(e)}")
             
-            # Record the error in memory
+            # Record the error
             status = {
                 'request_id': request_id,
                 'status': 'error',
@@ -178,15 +221,17 @@ class AnalysisRequestProcessor:
                 'error': str(e)
             }
             
-            # Store the status in memory
-            self.requests[request_id] = status
+            # Store the status
+            self.status_store.put(status)
             
             return status
     
     def process_request_async(self, company: str, start_date: Optional[str] = None, 
                              end_date: Optional[str] = None, keyword: Optional[str] = None) -> Dict[str, Any]:
         """
-        Process a request asynchronously.
+        Process a request asynchronously, by queueing it for the worker processes.
+        A request identical to one queued, running, or completed within the freshness window
+        (same company, dates and keyword) is attached to that job instead of starting another run.
         
         Args:
             company: Company name
@@ -196,6 +241,9 @@ class AnalysisRequestProcessor:
             
         Returns:
             Request ID and status
+            
+        Raises:
+            QueueFullError: If max_pending jobs are already queued or running
         """
         logger.info(f"Scheduling request for company: {company}")
         
@@ -221,22 +269,44 @@ class AnalysisRequestProcessor:
             'scheduled': True
         }
         
-        # Create a status record for the scheduled request
-        status = {
-            'request_id': request_id,
-            'status': 'scheduled',
-            'company': company,
-            'timestamp': datetime.now().isoformat(),
-            'request_data': request_data
-        }
+        # The job survives restarts; its status is read back from the queue
+        dedup_key = json.dumps([company, start_date, end_date, keyword or None])
+        job, attached = self.job_queue.enqueue(
+            request_id, company, request_data, dedup_key=dedup_key,
+            fresh_for=self.result_freshness, max_pending=self.max_pending
+        )
+        
+        if attached:
+            logger.info(f"Request for {company} attached to job {job['job_id']} ({job['status']})")
+        else:
+            logger.info(f"Request {request_id} queued")
         
-        # Store in memory
-        self.requests[request_id] = status
+        status = dict(self._job_status(job))
+        self.status_store.put(status)
+        
+        # Identical requests share the job, and so its request ID
+        status['deduplicated'] = attached
+        return status
+    
+    def _job_status(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the status of a request from its job."""
+        if job['status'] == 'completed' and job['result']:
+            return job['result']
         
-        # Start async processing in a separate thread or process
-        # This would normally be handled by a task queue like Celery
-        # For simplicity, we're just logging it
-        logger.info(f"Request {request_id} scheduled successfully")
+        status = {
+            'request_id': job['job_id'],
+            'status': job['status'],
+            'company': job['company'],
+            'timestamp': job['finished_at'] or job['started_at'] or job['created_at'],
+            'request_data': job['payload'],
+            'attempts': job['attempts']
+        }
+        if job['status'] == 'queued':
+            status['queue_position'] = job.get('queue_position')
+        if job['status'] == 'processing':
+            status['progress'] = self.job_queue.get_progress(job['job_id'])
+        if job['error']:
+            status['error'] = job['error']
         
         return status
     
@@ -250,9 +320,14 @@ class AnalysisRequestProcessor:
         Returns:
             Request status
         """
-        # Check if request exists in memory
-        if request_id in self.requests:
-            return self.requests[request_id]
+        # Queued requests are updated by the worker processes
+        job = self.job_queue.get(request_id)
+        if job is not None:
+            return self._job_status(job)
+        
+        status = self.status_store.get(request_id)
+        if status is not None:
+            return status
         
         return {
             'request_id': request_id,
@@ -270,21 +345,15 @@ class AnalysisRequestProcessor:
         Returns:
             List of requests
         """
-        # Filter requests by company if specified
-        if company:
-            filtered_requests = [r for r in self.requests.values() if r.get('company') == company]
-        else:
-            filtered_requests = list(self.requests.values())
-        
-        # Sort by timestamp (newest first)
-        sorted_requests = sorted(
-            filtered_requests,
-            key=lambda x: x.get('timestamp', ''),
-            reverse=True
-        )
+        # Read newest first from the (company, creation time) index
+        limited_requests = self.status_store.latest(company, limit)
         
-        # Limit the number of results
-        limited_requests = sorted_requests[:limit]
+        # Statuses of queued requests are updated by the worker processes
+        for i, status in enumerate(limited_requests):
+            if status.get('status') in ('queued', 'processing'):
+                job = self.job_queue.get(status['request_id'])
+                if job is not None:
+                    limited_requests[i] = self._job_status(job)
         
         return {
             'requests': limited_requests,
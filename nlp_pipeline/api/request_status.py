@@ -0,0 +1,150 @@
+import json
+import time
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from contextlib import closing
+from typing import Any, Dict, List, Optional
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS request_status (
+    request_id TEXT PRIMARY KEY,
+    company TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_request_status_company ON request_status (company, created_at);
+CREATE INDEX IF NOT EXISTS idx_request_status_created ON request_status (created_at);
+CREATE INDEX IF NOT EXISTS idx_request_status_updated ON request_status (updated_at);
+"""
+
+class RequestStatusStore:
+    """
+    Persistent store of analysis request statuses in SQLite, shared by every API worker.
+    Statuses are indexed by request ID and by (company, creation time), so the latest requests of a
+    company are read from the index without sorting, and expire ttl seconds after their last update.
+    """
+
+    def __init__(self, db_path, ttl=7 * 24 * 3600, evict_interval=60):
+        """
+        Initialize the store, creating the database if needed.
+
+        Args:
+            db_path: Path to the SQLite database file
+            ttl: Seconds a status is kept after its last update
+            evict_interval: Minimum seconds between two passes removing expired statuses
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.evict_interval = evict_interval
+
+        self._last_eviction = 0.0
+        self._eviction_lock = threading.Lock()
+
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def put(self, status: Dict[str, Any]):
+        """
+        Save the status of a request, keeping its creation time when it already exists.
+
+        Args:
+            status: Status with at least request_id (and usually company)
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute(
+                    "INSERT INTO request_status (request_id, company, created_at, updated_at, data) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (request_id) DO UPDATE SET company = excluded.company, "
+                    "updated_at = excluded.updated_at, data = excluded.data",
+                    (status['request_id'], status.get('company'), now, now, json.dumps(status))
+                )
+
+        self.evict_expired()
+
+    def get(self, request_id) -> Optional[Dict[str, Any]]:
+        """
+        Get the status of a request.
+
+        Args:
+            request_id: Request ID
+
+        Returns:
+            Status, or None if the request is unknown or expired
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT data FROM request_status WHERE request_id = ? AND updated_at >= ?",
+                (request_id, time.time() - self.ttl)
+            ).fetchone()
+        return json.loads(row['data']) if row else None
+
+    def latest(self, company: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Get the most recently created requests.
+
+        Args:
+            company: Only requests for this company (optional)
+            limit: Maximum number of requests
+
+        Returns:
+            Statuses, newest first
+        """
+        cutoff = time.time() - self.ttl
+        with closing(self._connect()) as conn:
+            if company:
+                rows = conn.execute(
+                    "SELECT data FROM request_status WHERE company = ? AND updated_at >= ? "
+                    "ORDER BY created_at DESC LIMIT ?",
+                    (company, cutoff, limit)
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    "SELECT data FROM request_status WHERE updated_at >= ? ORDER BY created_at DESC LIMIT ?",
+                    (cutoff, limit)
+                ).fetchall()
+        return [json.loads(row['data']) for row in rows]
+
+    def evict_expired(self, force=False) -> int:
+        """
+        Delete the statuses not updated within the TTL.
+        Runs at most once per evict_interval in each process, unless forced.
+
+        Args:
+            force: Evict even if the last pass was recent
+
+        Returns:
+            Number of statuses deleted
+        """
+        now = time.time()
+        with self._eviction_lock:
+            if not force and now - self._last_eviction < self.evict_interval:
+                return 0
+            self._last_eviction = now
+
+        with closing(self._connect()) as conn:
+            with conn:
+                deleted = conn.execute("DELETE FROM request_status WHERE updated_at < ?", (now - self.ttl,)).rowcount
+
+        if deleted:
+            logger.info(f"Evicted {deleted} expired request statuses")
+        return deleted
+
+    def count(self) -> int:
+        """Get the number of stored statuses, expired ones included until they are evicted."""
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM request_status").fetchone()[0]
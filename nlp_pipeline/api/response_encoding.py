@@ -0,0 +1,108 @@
+import gzip
+import json
+import logging
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:  # Falls back to the standard library encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # Only gzip is offered without it
+    brotli = None
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Content codings the API can produce, in order of preference
+SUPPORTED_ENCODINGS = ['br', 'gzip'] if brotli is not None else ['gzip']
+
+def dumps_json(data: Any) -> bytes:
+    """
+    Serialize data to compact UTF-8 JSON, with orjson when it is installed.
+
+    Args:
+        data: JSON-compatible data
+
+    Returns:
+        Encoded JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(data)
+    # Same compact encoding as FastAPI's JSONResponse
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode('utf-8')
+
+def loads_json(data) -> Any:
+    """
+    Parse UTF-8 JSON from bytes or a bytes-like object (such as a memory-mapped file).
+
+    Args:
+        data: Encoded JSON
+
+    Returns:
+        Parsed data
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # orjson rejects NaN and Infinity, which pandas writes for missing values
+            pass
+    return json.loads(bytes(data))
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick the content coding for a response from the request's Accept-Encoding header.
+
+    Args:
+        accept_encoding: Value of the Accept-Encoding header
+
+    Returns:
+        'br', 'gzip', or None for an uncompressed response
+    """
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+
+    best = None
+    best_weight = 0.0
+    for coding in SUPPORTED_ENCODINGS:
+        weight = weights.get(coding, weights.get('*', 0.0))
+        # Ties go to the earlier (preferred) coding
+        if weight > best_weight:
+            best, best_weight = coding, weight
+
+    return best
+
+def compress(body: bytes, encoding: Optional[str], cached=False) -> bytes:
+    """
+    Compress a response body.
+
+    Args:
+        body: Uncompressed body
+        encoding: 'br', 'gzip', or None to return the body unchanged
+        cached: Whether the result is kept and reused, which is worth a slower, denser setting
+
+    Returns:
+        Encoded body
+    """
+    if encoding == 'br':
+        return brotli.compress(body, quality=9 if cached else 4)
+    if encoding == 'gzip':
+        # A fixed mtime keeps the output, and so the cached variant, deterministic
+        return gzip.compress(body, compresslevel=9 if cached else 4, mtime=0)
+    return body
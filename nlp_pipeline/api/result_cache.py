@@ -0,0 +1,196 @@
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+from nlp_pipeline.api import metrics
+from nlp_pipeline.api.response_encoding import compress, dumps_json, loads_json
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Name of the file the pipeline rewrites in a company's results directory after each run
+RESULTS_VERSION_FILE = "results_version.json"
+
+# Parsed JSON takes several times the memory of its text; used to estimate entry sizes
+PARSED_SIZE_FACTOR = 4
+
+class _CacheEntry:
+    """A parsed result file, its serialized (and compressed) response bodies and the file state they came from."""
+
+    __slots__ = ('mtime_ns', 'size', 'version', 'data', 'body', 'encoded', 'cost')
+
+    def __init__(self, mtime_ns, size, version, data, body):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.version = version
+        self.data = data
+        self.body = body
+        self.encoded = {}
+        self.cost = size * PARSED_SIZE_FACTOR + len(body)
+
+class ResultCache:
+    """
+    Process-wide cache of parsed NLP result files and their serialized JSON response bodies.
+    Entries are revalidated on every access against the file's mtime and size, and against the
+    results version the pipeline publishes, and the least recently used ones are evicted once
+    the estimated memory use exceeds the budget.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, storage=None):
+        """
+        Initialize the cache.
+
+        Args:
+            max_bytes: Approximate memory budget for cached entries
+            storage: Storage that result files are read through (see nlp_pipeline.storage)
+        """
+        self.max_bytes = max_bytes
+        self.storage = storage
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def results_version(results_dir):
+        """
+        Get the results version the pipeline published in a company's results directory.
+
+        Args:
+            results_dir: Path to data/nlp_results/<company>
+
+        Returns:
+            Version token, or None if the pipeline has not published one
+        """
+        try:
+            stat = os.stat(Path(results_dir) / RESULTS_VERSION_FILE)
+        except OSError:
+            return None
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+    def _load(self, file_path, version):
+        """Get the valid entry for a file, parsing it on a miss. Returns None if the file is missing."""
+        key = str(file_path)
+
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry.mtime_ns, entry.size, entry.version) == (stat.st_mtime_ns, stat.st_size, version):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                metrics.record_cache_lookup('results', True)
+                return entry
+
+        # Parse outside the lock so a large file doesn't block other routes
+        storage_key = self.storage.key_for(file_path) if self.storage is not None else None
+        if storage_key is not None:
+            data = loads_json(self.storage.read_bytes(storage_key))
+        else:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+        body = dumps_json(data)
+        entry = _CacheEntry(stat.st_mtime_ns, stat.st_size, version, data, body)
+
+        metrics.record_cache_lookup('results', False)
+        with self._lock:
+            self.misses += 1
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous.cost
+
+            if entry.cost <= self.max_bytes:
+                self._entries[key] = entry
+                self.total_bytes += entry.cost
+                self._evict()
+            else:
+                logger.info(f"Not caching {file_path}: larger than the cache budget")
+
+        logger.info(f"Loaded result file {file_path}")
+        return entry
+
+    def _evict(self):
+        # Called with the lock held
+        while self.total_bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self.total_bytes -= evicted.cost
+
+    def get_json(self, file_path, version=None) -> Optional[Any]:
+        """
+        Get the parsed content of a JSON result file.
+        The returned object is shared between requests and must not be modified.
+
+        Args:
+            file_path: Path to the JSON file
+            version: Results version the entry must match (see results_version)
+
+        Returns:
+            Parsed JSON, or None if the file doesn't exist
+        """
+        entry = self._load(file_path, version)
+        return entry.data if entry is not None else None
+
+    def get_bytes(self, file_path, version=None, encoding=None) -> Optional[bytes]:
+        """
+        Get the serialized JSON response body of a result file.
+        Compressed variants are built on first request and cached with the entry.
+
+        Args:
+            file_path: Path to the JSON file
+            version: Results version the entry must match (see results_version)
+            encoding: Content coding of the body ('br', 'gzip' or None)
+
+        Returns:
+            Encoded compact JSON, or None if the file doesn't exist
+        """
+        entry = self._load(file_path, version)
+        if entry is None:
+            return None
+        if encoding is None:
+            return entry.body
+
+        with self._lock:
+            encoded = entry.encoded.get(encoding)
+        if encoded is not None:
+            return encoded
+
+        encoded = compress(entry.body, encoding, cached=True)
+
+        with self._lock:
+            if encoding not in entry.encoded:
+                entry.encoded[encoding] = encoded
+                entry.cost += len(encoded)
+                # Only count the variant if the entry is still cached
+                if self._entries.get(str(file_path)) is entry:
+                    self.total_bytes += len(encoded)
+                    self._evict()
+
+        return encoded
+
+    def clear(self):
+        """Drop every cached entry."""
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        """Get the cache counters."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'total_bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
@@ -3,7 +3,6 @@ import sys
 import json
 import datetime
 import logging
-import shutil
 from pathlib import Path
 
 # Set up logging
@@ -19,19 +18,26 @@ except ImportError:
     logger.error("Could not import reddit_nlp_scraper. Make sure it exists in the correct directory.")
     sys.exit(1)
 
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from nlp_pipeline.data_processing.raw_data_store import RawDataStore
+
 class RedditDataFetcher:
     """
     Class to fetch Reddit data using the reddit_nlp_scraper and store it in a designated location.
     This simulates an Airflow task that would fetch data and store it in S3.
+    Files are kept in a content-addressed RawDataStore, so identical data is only stored once.
     """
 
-    def __init__(self, storage_dir=None, company_name=None):
+    def __init__(self, storage_dir=None, company_name=None, keep_runs=None):
         """
         Initialize the data fetcher.
         
         Args:
             storage_dir: Directory to store the data (simulating S3)
             company_name: Name of the company (used for directory structure if storage_dir is None)
+            keep_runs: Number of most recent runs to keep in the store (None keeps every run)
         """
         self.base_dir = Path(__file__).parent.parent.parent
         
@@ -61,7 +67,31 @@ class RedditDataFetcher:
         os.makedirs(self.storage_dir, exist_ok=True)
         os.makedirs(self.company_storage_dir, exist_ok=True)
         
+        # Content-addressed store for the raw files
+        self.store = RawDataStore(self.company_storage_dir)
+        self.keep_runs = keep_runs
+        
         logger.info(f"Data will be stored in: {self.company_storage_dir}")
+    
+    def _store_file(self, file_path, name, **kwargs):
+        """
+        Add a file to the store as a new run and drop runs beyond keep_runs.
+        
+        Args:
+            file_path: Path to the file to store
+            name: Logical name of the file within the run
+            **kwargs: Extra arguments for RawDataStore.put_file
+            
+        Returns:
+            Path to the stored blob
+        """
+        run_id = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        blob_path = self.store.put_file(file_path, run_id, name=name, **kwargs)
+        
+        if self.keep_runs is not None:
+            self.store.collect_garbage(keep_runs=self.keep_runs)
+        
+        return blob_path
 
     def fetch_and_store_data(self, company_name, start_date, end_date, limit=None):
         """
@@ -81,10 +111,9 @@ class RedditDataFetcher:
         # Update company name internally (but don't change the directory)
         self.company_name = company_name
         
-        # Generate a unique filename based on the search parameters
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"reddit_{company_name.replace(' ', '_')}_{start_date}_{end_date}_{timestamp}.json"
-        output_path = self.company_storage_dir / filename
+        # Name the file after the search parameters; the run id keeps runs apart
+        filename = f"reddit_{company_name.replace(' ', '_')}_{start_date}_{end_date}.json"
+        tmp_path = self.store.new_temp_path()
         
         try:
             # Call the scraper function to fetch and save the data
@@ -93,26 +122,32 @@ class RedditDataFetcher:
                 start_date=start_date,
                 end_date=end_date,
                 limit=limit,
-                output_file=str(output_path)
+                output_file=str(tmp_path)
             )
             
+            # Move the scrape into the store (dropped if identical to an earlier one)
+            output_path = self._store_file(tmp_path, filename, move=True)
+            
             logger.info(f"Successfully fetched and stored Reddit data at: {output_path}")
             return output_path
             
         except Exception as e:
             logger.error(f"Error fetching Reddit data: {str(e)}")
+            if tmp_path.exists():
+                tmp_path.unlink()
             raise
 
     def copy_existing_data(self, existing_file, company_name=None):
         """
-        Copy an existing data file to the storage directory.
+        Add an existing data file to the storage directory.
+        The file is hardlinked into the store when possible, and not stored again if unchanged.
         
         Args:
             existing_file: Path to an existing data file
             company_name: Name of the company (optional, uses self.company_name if not provided)
             
         Returns:
-            Path to the copied data file
+            Path to the stored data file
         """
         existing_file_path = Path(existing_file)
         
@@ -124,14 +159,11 @@ class RedditDataFetcher:
         if company_name:
             self.company_name = company_name
         
-        # Generate a new filename in the storage directory
-        filename = f"existing_data_{self.company_name}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        dest_path = self.company_storage_dir / filename
-        
-        # Copy the file
-        shutil.copyfile(existing_file_path, dest_path)
+        # Reference the file from the store instead of making a timestamped copy
+        filename = f"existing_data_{self.company_name}.json"
+        dest_path = self._store_file(existing_file_path, filename, link=True)
         
-        logger.info(f"Copied existing data from {existing_file} to {dest_path}")
+        logger.info(f"Stored existing data from {existing_file} at {dest_path}")
         return dest_path
 
 
@@ -12,10 +12,182 @@ from typing import List, Dict, Any, Union, Optional
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from nlp_pipeline import instrumentation
+from nlp_pipeline.data_processing.raw_data_store import RawDataStore
+from nlp_pipeline.data_processing.deduplication import ArticleDeduplicator
+
+# Columns of the unified document schema shared by every source and every NLP stage
+DOCUMENT_COLUMNS = ['post_id', 'source', 'text_type', 'comment_id', 'text', 'created_at']
+
+# Display names of the supported sources
+SOURCE_LABELS = {
+    'reddit': 'Reddit',
+    'news': 'News Articles'
+}
+
+def detect_source(data):
+    """
+    Detect which source a raw data file comes from.
+    
+    Args:
+        data: Raw data loaded from a fetcher output file
+        
+    Returns:
+        Source name ('reddit' or 'news')
+    """
+    # NewsAPIFetcher writes a dictionary with an "articles" list
+    if isinstance(data, dict) and 'articles' in data:
+        return 'news'
+    
+    # The Reddit scraper writes a list of {post_text, comments} entries
+    if isinstance(data, list):
+        return 'reddit'
+    
+    raise ValueError("Unrecognized data format: expected a Reddit scrape list or a NewsAPI result")
+
+def clean_text(text):
+    """
+    Clean text by removing URLs, special characters, and extra whitespace.
+    Kept at module level so distributed workers can use it without a preprocessor instance.
+    
+    Args:
+        text: Text to clean
+        
+    Returns:
+        Cleaned text
+    """
+    if not text or not isinstance(text, str):
+        return ""
+    
+    # Remove URLs
+    text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
+    
+    # Remove Reddit markdown formatting
+    text = re.sub(r'\[.*?\]\(.*?\)', '', text)  # Remove links [text](url)
+    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)  # Remove bold **text**
+    text = re.sub(r'\*(.*?)\*', r'\1', text)  # Remove italic *text*
+    text = re.sub(r'~~(.*?)~~', r'\1', text)  # Remove strikethrough ~~text~~
+    text = re.sub(r'#+ ', '', text)  # Remove headers # text
+    
+    # Remove special characters and numbers, keep letters, spaces, and punctuation
+    text = re.sub(r'[^a-zA-Z0-9\s.,!?\'"-]', ' ', text)
+    
+    # Remove extra whitespace
+    text = re.sub(r'\s+', ' ', text).strip()
+    
+    return text
+
+def news_article_text(article):
+    """
+    Combine the title, description and content of a NewsAPI article into one text.
+    
+    Args:
+        article: NewsAPI article dictionary
+        
+    Returns:
+        Raw (uncleaned) article text
+    """
+    # NewsAPI truncates content with a "[+123 chars]" marker
+    content = re.sub(r'\[\+\d+ chars\]$', '', article.get('content') or '')
+    parts = [article.get('title'), article.get('description'), content]
+    return ' '.join(part for part in parts if part)
+
+def find_source_files(data_dir, company_name):
+    """
+    Find the raw data files of each source for a company: the latest Reddit scrape, and every
+    news file (each news run only stores the articles earlier runs had not seen).
+    
+    Args:
+        data_dir: Base data directory
+        company_name: Name of the company
+        
+    Returns:
+        List of paths to raw data files (Reddit first, then news from oldest to newest)
+    """
+    data_dir = Path(data_dir)
+    source_files = []
+    
+    # Reddit data lives in the content-addressed store, or as plain files from older runs
+    reddit_dir = data_dir / "data_storage" / company_name
+    if (reddit_dir / "manifest.json").exists():
+        store = RawDataStore(reddit_dir)
+        latest_run = store.latest_run()
+        if latest_run:
+            source_files.extend(store.get_run_files(latest_run).values())
+    elif reddit_dir.exists():
+        legacy_files = sorted(reddit_dir.glob("*.json"), key=lambda path: path.stat().st_mtime)
+        if legacy_files:
+            source_files.append(legacy_files[-1])
+    
+    # News data is written by NewsAPIFetcher as timestamped files, merged by preprocess_sources
+    news_dir = data_dir / "news_data_storage" / company_name
+    if news_dir.exists():
+        source_files.extend(sorted(news_dir.glob("news_*.json"), key=lambda path: path.stat().st_mtime))
+    
+    return source_files
+
+def merge_news_datasets(datasets):
+    """
+    Merge the news files of several runs into one dataset, dropping articles stored more than once
+    (e.g. by runs made without the seen-set).
+    
+    Args:
+        datasets: List of raw data objects, as returned by load_data
+        
+    Returns:
+        The datasets with every news file replaced by a single merged one at the end
+    """
+    news = [data for data in datasets if detect_source(data) == 'news']
+    if len(news) < 2:
+        return datasets
+    
+    deduplicator = ArticleDeduplicator()
+    articles = [
+        article for data in news for article in data.get('articles', [])
+        if not deduplicator.is_duplicate(article)
+    ]
+    merged = {**news[-1], 'articles': articles, 'total_articles': len(articles)}
+    
+    return [data for data in datasets if detect_source(data) != 'news'] + [merged]
+
+def filter_by_keyword(data_df, keyword):
+    """
+    Keep the posts and articles mentioning a keyword, in their text or in one of their comments.
+    
+    Args:
+        data_df: Preprocessed posts, as returned by preprocess_sources
+        keyword: Keyword to look for (case-insensitive), or None to keep every post
+    
+    Returns:
+        The matching posts
+    
+    Raises:
+        ValueError: If the keyword is blank
+    """
+    if keyword is None:
+        return data_df
+    
+    # Not cleaned like the texts: clean_text drops non-ASCII letters, e.g. every letter of an Arabic keyword
+    keyword = keyword.strip().lower()
+    if not keyword:
+        raise ValueError("The keyword to filter posts by is empty")
+    if data_df.empty:
+        return data_df
+    
+    matches = data_df.apply(
+        lambda row: keyword in row['post_text'].lower() or any(keyword in comment.lower() for comment in row['comments']),
+        axis=1
+    )
+    logger.info(f"{int(matches.sum())} of {len(data_df)} posts mention '{keyword}'")
+    return data_df[matches].reset_index(drop=True)
+
 class RedditDataPreprocessor:
     """
-    Class to preprocess Reddit data for NLP tasks.
-    Handles cleaning, filtering, and transforming data into suitable formats.
+    Class to preprocess Reddit and news data for NLP tasks.
+    Handles cleaning, filtering, and transforming data from every source into one document schema.
     """
 
     def __init__(self, processed_dir=None, company_name=None):
@@ -77,7 +249,10 @@ class RedditDataPreprocessor:
                 data = json.load(f)
             
             logger.info(f"Successfully loaded data from: {data_path}")
-            logger.info(f"Number of posts loaded: {len(data)}")
+            if isinstance(data, dict) and 'articles' in data:
+                logger.info(f"Number of articles loaded: {len(data['articles'])}")
+            else:
+                logger.info(f"Number of posts loaded: {len(data)}")
             return data
         
         except Exception as e:
@@ -94,33 +269,16 @@ class RedditDataPreprocessor:
         Returns:
             Cleaned text
         """
-        if not text or not isinstance(text, str):
-            return ""
-        
-        # Remove URLs
-        text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
-        
-        # Remove Reddit markdown formatting
-        text = re.sub(r'\[.*?\]\(.*?\)', '', text)  # Remove links [text](url)
-        text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)  # Remove bold **text**
-        text = re.sub(r'\*(.*?)\*', r'\1', text)  # Remove italic *text*
-        text = re.sub(r'~~(.*?)~~', r'\1', text)  # Remove strikethrough ~~text~~
-        text = re.sub(r'#+ ', '', text)  # Remove headers # text
-        
-        # Remove special characters and numbers, keep letters, spaces, and punctuation
-        text = re.sub(r'[^a-zA-Z0-9\s.,!?\'"-]', ' ', text)
-        
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text).strip()
-        
-        return text
+        return clean_text(text)
     
-    def preprocess_data(self, data):
+    def preprocess_data(self, data, source='reddit', start_id=0):
         """
         Preprocess the Reddit data.
         
         Args:
             data: List of Reddit posts
+            source: Name of the source the posts come from
+            start_id: First post_id to assign (keeps ids unique across sources)
             
         Returns:
             Preprocessed data as a DataFrame
@@ -143,10 +301,12 @@ class RedditDataPreprocessor:
                 
                 # Create the preprocessed post
                 preprocessed_post = {
-                    'post_id': i,
+                    'post_id': start_id + i,
+                    'source': source,
                     'post_text': post_text,
                     'comments': cleaned_comments,
-                    'comment_count': len(cleaned_comments)
+                    'comment_count': len(cleaned_comments),
+                    'created_at': post.get('created_utc')
                 }
                 
                 preprocessed_posts.append(preprocessed_post)
@@ -162,6 +322,76 @@ class RedditDataPreprocessor:
         
         return posts_df
     
+    def preprocess_news_data(self, data, start_id=0):
+        """
+        Preprocess news articles into the same shape as Reddit posts.
+        
+        Args:
+            data: NewsAPIFetcher result dictionary
+            start_id: First post_id to assign (keeps ids unique across sources)
+            
+        Returns:
+            Preprocessed articles as a DataFrame
+        """
+        preprocessed_articles = []
+        
+        for i, article in enumerate(data.get('articles', [])):
+            try:
+                # Combine title, description and content into the article text
+                article_text = self.clean_text(news_article_text(article))
+                
+                # Skip empty articles
+                if not article_text:
+                    continue
+                
+                preprocessed_articles.append({
+                    'post_id': start_id + i,
+                    'source': 'news',
+                    'post_text': article_text,
+                    'comments': [],
+                    'comment_count': 0,
+                    'created_at': article.get('publishedAt')
+                })
+            
+            except Exception as e:
+                logger.warning(f"Error preprocessing article {i}: {str(e)}")
+                continue
+        
+        logger.info(f"Successfully preprocessed {len(preprocessed_articles)} news articles")
+        
+        return pd.DataFrame(preprocessed_articles)
+    
+    def preprocess_sources(self, datasets):
+        """
+        Preprocess raw data from any number of sources into one DataFrame.
+        
+        Args:
+            datasets: List of raw data objects, as returned by load_data
+            
+        Returns:
+            Preprocessed posts and articles as a single DataFrame
+        """
+        frames = []
+        next_id = 0
+        
+        for data in merge_news_datasets(datasets):
+            source = detect_source(data)
+            
+            if source == 'news':
+                frame = self.preprocess_news_data(data, start_id=next_id)
+                next_id += len(data.get('articles', []))
+            else:
+                frame = self.preprocess_data(data, source=source, start_id=next_id)
+                next_id += len(data)
+            
+            if not frame.empty:
+                frames.append(frame)
+        
+        if not frames:
+            return pd.DataFrame(columns=['post_id', 'source', 'post_text', 'comments', 'comment_count', 'created_at'])
+        
+        return pd.concat(frames, ignore_index=True)
+    
     def save_processed_data(self, data_df, output_filename):
         """
         Save processed data to a CSV file.
@@ -198,58 +428,99 @@ class RedditDataPreprocessor:
             data_df: DataFrame with posts and comments
             
         Returns:
-            DataFrame with post_id and text (all text from posts and comments)
+            DataFrame in the unified document schema (one row per post, comment or article)
         """
-        # Create a new DataFrame with post_id and combined text
-        nlp_data = []
-        
-        for _, row in data_df.iterrows():
-            # Add the post text
-            nlp_data.append({
-                'post_id': row['post_id'],
-                'text_type': 'post',
-                'text': row['post_text']
-            })
-            
-            # Add each comment
-            for i, comment in enumerate(row['comments']):
-                nlp_data.append({
-                    'post_id': row['post_id'],
-                    'text_type': 'comment',
-                    'comment_id': i,
-                    'text': comment
-                })
+        if data_df.empty:
+            return pd.DataFrame(columns=DOCUMENT_COLUMNS)
+        
+        # One row per post or article
+        posts = data_df[['post_id', 'source', 'post_text', 'created_at']].rename(columns={'post_text': 'text'})
+        posts['text_type'] = posts['source'].map(lambda source: 'article' if source == 'news' else 'post')
+        posts['comment_id'] = None
+        
+        # One row per comment, numbered within its post
+        comments = data_df[['post_id', 'source', 'comments', 'created_at']].explode('comments')
+        comments = comments.dropna(subset=['comments']).rename(columns={'comments': 'text'})
+        comments['text_type'] = 'comment'
+        comments['comment_id'] = comments.groupby(level=0).cumcount()
+        
+        # Keep each comment right after its post, as the analyzers expect
+        posts['_order'] = 0
+        comments['_order'] = comments['comment_id'] + 1
+        nlp_df = pd.concat([posts, comments], ignore_index=True)
+        nlp_df = nlp_df.sort_values(['post_id', '_order'], kind='stable').reset_index(drop=True)
+        nlp_df = nlp_df[DOCUMENT_COLUMNS]
         
-        nlp_df = pd.DataFrame(nlp_data)
         logger.info(f"Extracted {len(nlp_df)} text entries for NLP processing")
         
         return nlp_df
     
-    def process_data(self, data_path, save_intermediate=True):
+    def save_source_summary(self, nlp_df, filename='data_sources.json'):
+        """
+        Save the number of documents per source, for the API's company info.
+        
+        Args:
+            nlp_df: DataFrame in the unified document schema
+            filename: Name for the output file
+            
+        Returns:
+            Path to the saved file
+        """
+        output_path = self.company_processed_dir / filename
+        
+        summary = []
+        for source, group in nlp_df.groupby('source'):
+            summary.append({
+                'source': source,
+                'name': SOURCE_LABELS.get(source, source),
+                'post_count': int((group['text_type'] != 'comment').sum()),
+                'comment_count': int((group['text_type'] == 'comment').sum())
+            })
+        
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        
+        logger.info(f"Successfully saved source summary to: {output_path}")
+        return output_path
+    
+    def process_data(self, data_path, save_intermediate=True, keyword=None):
         """
         Process the data from end to end.
         
         Args:
-            data_path: Path to the data file
+            data_path: Path to the data file, or a list of paths from any supported sources
             save_intermediate: Whether to save intermediate results
+            keyword: Keep only the posts and articles mentioning this keyword
             
         Returns:
             DataFrame ready for NLP tasks
         """
-        # Load the data
-        data = self.load_data(data_path)
+        data_paths = data_path if isinstance(data_path, (list, tuple)) else [data_path]
+        
+        # Load the data from every source
+        with instrumentation.timer('load'):
+            datasets = [self.load_data(path) for path in data_paths]
         
-        # Preprocess the data
-        processed_df = self.preprocess_data(data)
+        # Preprocess all sources into one DataFrame
+        with instrumentation.timer('clean'):
+            processed_df = filter_by_keyword(self.preprocess_sources(datasets), keyword)
         
         if save_intermediate:
-            self.save_processed_data(processed_df, 'processed_posts.json')
+            with instrumentation.timer('save'):
+                self.save_processed_data(processed_df, 'processed_posts.json')
         
         # Extract text for NLP
-        nlp_df = self.extract_text_for_nlp(processed_df)
+        with instrumentation.timer('extract'):
+            nlp_df = self.extract_text_for_nlp(processed_df)
+        instrumentation.count('posts', len(processed_df))
+        instrumentation.count('documents', len(nlp_df))
+        if instrumentation.enabled():
+            instrumentation.count('words', int(nlp_df['text'].str.split().str.len().sum()))
         
         # Save NLP data
-        output_path = self.save_processed_data(nlp_df, 'nlp_ready_data.json')
+        with instrumentation.timer('save'):
+            output_path = self.save_processed_data(nlp_df, 'nlp_ready_data.json')
+            self.save_source_summary(nlp_df)
         
         return nlp_df, output_path
 
@@ -0,0 +1,300 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import unicodedata
+from pathlib import Path
+from typing import Dict, Any
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Query parameters that only track where a click came from and never change the article
+TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid", "ref", "ref_src", "cmpid", "ocid", "smid"}
+
+# Number of bits the title fingerprint is split into for candidate lookup
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 4
+
+# Seen articles not met again within this many days are dropped from the persistent seen-set
+DEFAULT_MAX_AGE_DAYS = 90
+
+def normalize_url(url):
+    """
+    Normalize a URL so that trivially different links to the same article compare equal.
+
+    Args:
+        url: URL to normalize
+
+    Returns:
+        Normalized URL string (empty string if the URL is missing)
+    """
+    if not url or not isinstance(url, str):
+        return ""
+
+    parts = urlsplit(url.strip())
+
+    # Lowercase the host, drop "www." and default ports
+    netloc = parts.netloc.lower()
+    if netloc.startswith("www."):
+        netloc = netloc[4:]
+    netloc = re.sub(r':(80|443)$', '', netloc)
+
+    # Drop tracking parameters and sort the rest so parameter order doesn't matter
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    ]
+    query.sort()
+
+    # Remove trailing slashes and AMP suffixes from the path
+    path = re.sub(r'/(amp/?)?$', '', parts.path) or "/"
+
+    return urlunsplit(("https", netloc, path, urlencode(query), ""))
+
+def url_hash(url):
+    """
+    Hash a URL after normalization.
+
+    Args:
+        url: URL to hash
+
+    Returns:
+        Hex digest of the normalized URL (empty string if the URL is missing)
+    """
+    normalized = normalize_url(url)
+    if not normalized:
+        return ""
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+def normalize_title(title):
+    """
+    Normalize an article title for near-duplicate comparison.
+
+    Syndicated copies usually differ only in the publisher suffix ("... - Reuters"),
+    casing and punctuation, so those are stripped.
+
+    Args:
+        title: Article title
+
+    Returns:
+        Normalized title string
+    """
+    if not title or not isinstance(title, str):
+        return ""
+
+    # Remove a trailing " - Publisher" or " | Publisher" suffix
+    title = re.sub(r'\s+[-|–—]\s+[^-|–—]{1,60}$', '', title)
+
+    # Fold compatibility forms (ligatures, full-width and Arabic presentation forms),
+    # then lowercase, strip punctuation and collapse whitespace, keeping letters of any script
+    title = unicodedata.normalize('NFKC', title)
+    title = re.sub(r'[^\w\s]|_', ' ', title.lower())
+    return re.sub(r'\s+', ' ', title).strip()
+
+def title_simhash(title):
+    """
+    Compute a 64-bit SimHash of a normalized title over word unigrams and bigrams.
+
+    Args:
+        title: Normalized article title
+
+    Returns:
+        Integer fingerprint (0 if the title is empty)
+    """
+    words = title.split()
+    if not words:
+        return 0
+
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    weights = [0] * SIMHASH_BITS
+    for feature in features:
+        digest = int.from_bytes(hashlib.md5(feature.encode('utf-8')).digest()[:8], 'big')
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if digest >> bit & 1 else -1
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+
+    return fingerprint
+
+class ArticleDeduplicator:
+    """
+    Class to drop duplicate news articles across API endpoints and across runs.
+    Exact duplicates are detected by normalized-URL hash, syndicated copies by title SimHash.
+    The seen-set is persisted per company so later runs skip articles that were already stored,
+    and entries not seen again within max_age_days are dropped when it is saved.
+    """
+
+    def __init__(self, state_path=None, max_title_distance=3, max_age_days=DEFAULT_MAX_AGE_DAYS):
+        """
+        Initialize the deduplicator.
+
+        Args:
+            state_path: Path of the JSON file holding the persistent seen-set (None keeps it in memory only)
+            max_title_distance: Maximum Hamming distance between title fingerprints to count as a duplicate
+            max_age_days: Days after which an entry not seen again is forgotten (None keeps entries forever)
+        """
+        self.state_path = Path(state_path) if state_path else None
+        self.max_title_distance = max_title_distance
+        self.max_age_days = max_age_days
+
+        # Seen URL hashes and title fingerprints, mapped to when they were last seen (Unix time)
+        self.seen_urls = {}
+        self.seen_titles = {}
+
+        # Band index: (band number, band value) -> fingerprints sharing that band.
+        # With 4 bands of 16 bits, any two fingerprints within distance 3 share at least one band.
+        self.title_bands = {}
+
+        if self.state_path and self.state_path.exists():
+            self.load_state()
+
+    def load_state(self):
+        """
+        Load the persistent seen-set from disk.
+        """
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+
+            # State files written before entries were timestamped hold plain lists;
+            # their entries are treated as seen now so they age out like the others
+            now = time.time()
+            urls = state.get('urls', {})
+            titles = state.get('titles', {})
+            if isinstance(urls, list):
+                urls = dict.fromkeys(urls, now)
+            if isinstance(titles, list):
+                titles = dict.fromkeys(titles, now)
+
+            self.seen_urls = dict(urls)
+            for fingerprint, last_seen in titles.items():
+                self._add_title(int(fingerprint, 16), last_seen)
+
+            logger.info(f"Loaded {len(self.seen_urls)} seen URLs and {len(self.seen_titles)} title fingerprints from {self.state_path}")
+
+        except Exception as e:
+            logger.warning(f"Could not load deduplication state from {self.state_path}: {str(e)}")
+
+    def prune(self, now=None):
+        """
+        Forget URLs and titles that were not seen within max_age_days.
+
+        Args:
+            now: Current Unix time (defaults to the clock)
+
+        Returns:
+            Number of entries removed
+        """
+        if self.max_age_days is None:
+            return 0
+
+        cutoff = (now or time.time()) - self.max_age_days * 86400
+        stale_urls = [key for key, last_seen in self.seen_urls.items() if last_seen < cutoff]
+        stale_titles = [key for key, last_seen in self.seen_titles.items() if last_seen < cutoff]
+
+        for key in stale_urls:
+            del self.seen_urls[key]
+        for fingerprint in stale_titles:
+            del self.seen_titles[fingerprint]
+            for band in self._bands(fingerprint):
+                candidates = self.title_bands[band]
+                candidates.discard(fingerprint)
+                if not candidates:
+                    del self.title_bands[band]
+
+        return len(stale_urls) + len(stale_titles)
+
+    def save_state(self):
+        """
+        Prune stale entries and save the seen-set to disk.
+
+        Returns:
+            Path to the state file, or None if the deduplicator is in-memory only
+        """
+        if self.state_path is None:
+            return None
+
+        removed = self.prune()
+        if removed:
+            logger.info(f"Dropped {removed} deduplication entries not seen in {self.max_age_days} days")
+
+        os.makedirs(self.state_path.parent, exist_ok=True)
+
+        state = {
+            'urls': dict(sorted(self.seen_urls.items())),
+            'titles': {format(fingerprint, '016x'): last_seen for fingerprint, last_seen in sorted(self.seen_titles.items())}
+        }
+
+        # Write to a temporary file first so an interrupted run can't corrupt the seen-set
+        tmp_path = self.state_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+        logger.info(f"Saved deduplication state to: {self.state_path}")
+        return self.state_path
+
+    def _bands(self, fingerprint):
+        band_bits = SIMHASH_BITS // SIMHASH_BANDS
+        mask = (1 << band_bits) - 1
+        return [(band, fingerprint >> (band * band_bits) & mask) for band in range(SIMHASH_BANDS)]
+
+    def _add_title(self, fingerprint, last_seen):
+        self.seen_titles[fingerprint] = last_seen
+        for band in self._bands(fingerprint):
+            self.title_bands.setdefault(band, set()).add(fingerprint)
+
+    def _similar_title(self, fingerprint):
+        if fingerprint in self.seen_titles:
+            return fingerprint
+
+        for band in self._bands(fingerprint):
+            for candidate in self.title_bands.get(band, ()):
+                if bin(candidate ^ fingerprint).count('1') <= self.max_title_distance:
+                    return candidate
+
+        return None
+
+    def is_duplicate(self, article: Dict[str, Any]) -> bool:
+        """
+        Check whether an article was already seen, and record it if not.
+
+        Args:
+            article: NewsAPI article dictionary
+
+        Returns:
+            True if the article duplicates one seen before
+        """
+        # Every sighting refreshes the entry, so articles that keep coming back don't age out
+        now = time.time()
+
+        article_url_hash = url_hash(article.get('url'))
+        if article_url_hash and article_url_hash in self.seen_urls:
+            self.seen_urls[article_url_hash] = now
+            return True
+
+        # Titles that are too short (e.g. "Breaking news") collide too easily to be used
+        title = normalize_title(article.get('title'))
+        fingerprint = title_simhash(title) if len(title.split()) >= 4 else 0
+        similar = self._similar_title(fingerprint) if fingerprint else None
+        if similar is not None:
+            self.seen_titles[similar] = now
+            if article_url_hash:
+                self.seen_urls[article_url_hash] = now
+            return True
+
+        if article_url_hash:
+            self.seen_urls[article_url_hash] = now
+        if fingerprint:
+            self._add_title(fingerprint, now)
+
+        return False
@@ -11,6 +11,11 @@ from typing import Optional, List, Dict, Any
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from nlp_pipeline.data_processing.deduplication import ArticleDeduplicator
+
 class NewsAPIFetcher:
     """
     Class to fetch news articles using the NewsAPI and store them in a designated location.
@@ -160,7 +165,8 @@ class NewsAPIFetcher:
                             search_everything: bool = True,
                             search_headlines: bool = True,
                             country: Optional[str] = None,
-                            category: Optional[str] = None):
+                            category: Optional[str] = None,
+                            skip_seen: bool = True):
         """
         Fetch news data and store it in the storage directory.
         
@@ -172,6 +178,7 @@ class NewsAPIFetcher:
             search_headlines: Whether to search the /top-headlines endpoint
             country: Country code for headlines search
             category: Category for headlines search
+            skip_seen: Whether to drop articles already stored by a previous run
             
         Returns:
             Path to the stored data file
@@ -194,6 +201,11 @@ class NewsAPIFetcher:
             "articles": []
         }
         
+        # Deduplicate across endpoints, and across runs through the persistent seen-set
+        state_path = self.company_storage_dir / "seen_articles.json" if skip_seen else None
+        deduplicator = ArticleDeduplicator(state_path=state_path)
+        duplicates = 0
+        
         try:
             # Fetch from /everything endpoint if enabled
             if search_everything:
@@ -206,6 +218,9 @@ class NewsAPIFetcher:
                 if "articles" in everything_data:
                     for article in everything_data["articles"]:
                         article["source_endpoint"] = "everything"
+                        if deduplicator.is_duplicate(article):
+                            duplicates += 1
+                            continue
                         results["articles"].append(article)
                 
                 logger.info(f"Found {len(everything_data.get('articles', []))} articles from /everything endpoint")
@@ -221,15 +236,16 @@ class NewsAPIFetcher:
                 if "articles" in headlines_data:
                     for article in headlines_data["articles"]:
                         article["source_endpoint"] = "top-headlines"
-                        # Avoid duplicates (simple check on URL)
-                        if not any(existing["url"] == article["url"] for existing in results["articles"]):
-                            results["articles"].append(article)
+                        if deduplicator.is_duplicate(article):
+                            duplicates += 1
+                            continue
+                        results["articles"].append(article)
                 
                 logger.info(f"Found {len(headlines_data.get('articles', []))} articles from /top-headlines endpoint")
             
             # Calculate total unique articles
             total_articles = len(results["articles"])
-            logger.info(f"Total unique articles: {total_articles}")
+            logger.info(f"Total unique articles: {total_articles} ({duplicates} duplicates dropped)")
             
             # Add article count to the results
             results["total_articles"] = total_articles
@@ -238,6 +254,9 @@ class NewsAPIFetcher:
             with open(output_path, 'w', encoding='utf-8') as f:
                 json.dump(results, f, ensure_ascii=False, indent=2)
             
+            # Only remember the articles once they are safely stored
+            deduplicator.save_state()
+            
             logger.info(f"Successfully fetched and stored news data at: {output_path}")
             return output_path
             
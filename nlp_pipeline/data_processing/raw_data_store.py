@@ -0,0 +1,248 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import datetime
+import tempfile
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class RawDataStore:
+    """
+    Content-addressed store for raw scrape files.
+    Each file is stored once as a blob named after its SHA-256 hash, and a manifest records
+    which blobs belong to which run, so re-running on unchanged inputs costs no extra space.
+    """
+
+    def __init__(self, store_dir):
+        """
+        Initialize the store.
+
+        Args:
+            store_dir: Directory holding the blobs and the manifest
+        """
+        self.store_dir = Path(store_dir)
+        self.blobs_dir = self.store_dir / "blobs"
+        self.manifest_path = self.store_dir / "manifest.json"
+        self.lock_path = self.store_dir / "store.lock"
+
+        os.makedirs(self.blobs_dir, exist_ok=True)
+
+    @contextmanager
+    def _locked(self):
+        """
+        Hold an exclusive lock on the store, so runs for the same company in other processes
+        (e.g. two analysis workers) don't overwrite each other's manifest entries, and garbage
+        collection doesn't delete a blob a run is adding.
+        """
+        if fcntl is None:
+            yield
+            return
+
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def hash_file(file_path, chunk_size=1024 * 1024):
+        """
+        Compute the SHA-256 hash of a file without loading it into memory.
+
+        Args:
+            file_path: Path to the file
+            chunk_size: Number of bytes read at a time
+
+        Returns:
+            Hex digest of the file content
+        """
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def blob_path(self, digest, suffix=".json"):
+        """
+        Get the path of the blob with a given hash.
+
+        Args:
+            digest: SHA-256 hex digest of the blob
+            suffix: File extension of the blob
+
+        Returns:
+            Path to the blob
+        """
+        return self.blobs_dir / digest[:2] / f"{digest}{suffix}"
+
+    def new_temp_path(self, suffix=".json"):
+        """
+        Get a temporary path inside the store, for writers that need a destination file.
+        Files written there can be added with put_file(move=True) without copying.
+
+        Args:
+            suffix: File extension of the temporary file
+
+        Returns:
+            Path to a new, empty temporary file
+        """
+        tmp_dir = self.store_dir / "tmp"
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix=suffix, dir=tmp_dir)
+        os.close(fd)
+        return Path(tmp_path)
+
+    def load_manifest(self) -> Dict[str, Any]:
+        """
+        Load the manifest of runs.
+
+        Returns:
+            Manifest dictionary with a "runs" mapping of run id to run record
+        """
+        if not self.manifest_path.exists():
+            return {"runs": {}}
+
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_manifest(self, manifest):
+        # Write to a temporary file first so an interrupted run can't corrupt the manifest
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def put_file(self, source_path, run_id, name=None, link=True, move=False):
+        """
+        Add a file to the store and record it as part of a run.
+
+        Args:
+            source_path: Path to the file to add
+            run_id: Identifier of the run the file belongs to
+            name: Logical name of the file within the run (defaults to the file name)
+            link: Whether to hardlink the file instead of copying it when possible
+            move: Whether to move the file into the store (for temporary files)
+
+        Returns:
+            Path to the stored blob
+        """
+        source_path = Path(source_path)
+        name = name or source_path.name
+
+        digest = self.hash_file(source_path)
+        blob_path = self.blob_path(digest, suffix=source_path.suffix)
+
+        with self._locked():
+            if blob_path.exists():
+                logger.info(f"Content of {source_path} already stored as {digest[:12]}, not copying")
+                if move:
+                    source_path.unlink()
+            else:
+                os.makedirs(blob_path.parent, exist_ok=True)
+
+                if move:
+                    os.replace(source_path, blob_path)
+                else:
+                    try:
+                        if not link:
+                            raise OSError("hardlinking disabled")
+                        os.link(source_path, blob_path)
+                    except OSError:
+                        # Different filesystem or no hardlink support: copy atomically. The copy is made
+                        # outside blobs/, so garbage collection never sees it as an unreferenced blob
+                        tmp_path = self.new_temp_path(suffix=source_path.suffix)
+                        shutil.copyfile(source_path, tmp_path)
+                        os.replace(tmp_path, blob_path)
+
+                logger.info(f"Stored {source_path} as blob {digest[:12]}")
+
+            # Record the blob in the run's manifest entry
+            manifest = self.load_manifest()
+            run = manifest["runs"].setdefault(run_id, {
+                "created_at": datetime.datetime.now().isoformat(),
+                "files": {}
+            })
+            run["files"][name] = blob_path.relative_to(self.store_dir).as_posix()
+            self._save_manifest(manifest)
+
+        return blob_path
+
+    def get_run_files(self, run_id) -> Dict[str, Path]:
+        """
+        Get the files recorded for a run.
+
+        Args:
+            run_id: Identifier of the run
+
+        Returns:
+            Dictionary of logical file name to blob path
+        """
+        run = self.load_manifest()["runs"].get(run_id)
+        if run is None:
+            raise KeyError(f"Run not found in store: {run_id}")
+        return {name: self.store_dir / blob for name, blob in run["files"].items()}
+
+    def latest_run(self) -> Optional[str]:
+        """
+        Get the identifier of the most recently created run.
+
+        Returns:
+            Run id, or None if the store is empty
+        """
+        runs = self.load_manifest()["runs"]
+        if not runs:
+            return None
+        return max(runs, key=lambda run_id: runs[run_id]["created_at"])
+
+    def collect_garbage(self, keep_runs=None):
+        """
+        Drop old runs from the manifest and delete blobs no run references.
+
+        Args:
+            keep_runs: Number of most recent runs to keep (None keeps every run)
+
+        Returns:
+            Number of blobs deleted
+        """
+        with self._locked():
+            manifest = self.load_manifest()
+
+            if keep_runs is not None:
+                ordered = sorted(manifest["runs"], key=lambda run_id: manifest["runs"][run_id]["created_at"], reverse=True)
+                for run_id in ordered[keep_runs:]:
+                    del manifest["runs"][run_id]
+                self._save_manifest(manifest)
+
+            referenced = {
+                (self.store_dir / blob).resolve()
+                for run in manifest["runs"].values()
+                for blob in run["files"].values()
+            }
+
+            deleted = 0
+            for blob_path in self.blobs_dir.glob("*/*"):
+                if blob_path.resolve() not in referenced:
+                    blob_path.unlink()
+                    deleted += 1
+
+            # Leftovers from interrupted writes are never referenced; recent ones may still be in use
+            cutoff = datetime.datetime.now().timestamp() - 24 * 3600
+            for tmp_path in (self.store_dir / "tmp").glob("*"):
+                if tmp_path.stat().st_mtime < cutoff:
+                    tmp_path.unlink()
+
+        logger.info(f"Garbage collection removed {deleted} unreferenced blobs from {self.store_dir}")
+        return deleted
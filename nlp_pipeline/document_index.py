@@ -0,0 +1,206 @@
+import os
+import json
+import bisect
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Per-document result files of a company, relative to its results directory
+DOCUMENT_FILES = {
+    'topics': Path("topics") / "documents_with_topics.json",
+    'sentiment': Path("sentiment") / "documents_with_sentiment.json",
+    'keywords': Path("keywords") / "documents_with_keywords.json"
+}
+
+# Index written next to each per-document result file
+DOCUMENT_INDEX_FILE = "documents_index.json"
+
+# Fields with an exact-match filter, and the numeric field with a range filter
+FILTER_FIELDS = ('text_type', 'source', 'sentiment', 'topic')
+SCORE_FIELD = 'sentiment_score'
+
+class DocumentIndex:
+    """
+    Inverted index over a per-document result file.
+    Maps every value of the filterable fields to the sorted positions of the documents that have
+    it, and keeps the positions ordered by score, so filtered pages are served without scanning
+    the documents.
+    """
+
+    def __init__(self, document_count, postings, score_order=None, score_values=None, documents_digest=None):
+        """
+        Initialize the index.
+
+        Args:
+            document_count: Number of documents in the indexed file
+            postings: Field name -> value (as a string) -> sorted document positions
+            score_order: Document positions sorted by score
+            score_values: Scores matching score_order
+            documents_digest: SHA-256 digest of the indexed file, to detect an out of date index
+        """
+        self.document_count = document_count
+        self.documents_digest = documents_digest
+        self.postings = postings
+        self.score_order = score_order or []
+        self.score_values = score_values or []
+
+        # Posting lists converted to sets, built on first use
+        self._sets = {}
+
+    @classmethod
+    def build(cls, documents: Sequence[Dict[str, Any]], documents_digest=None):
+        """
+        Build the index of a list of documents.
+
+        Args:
+            documents: Documents of a documents_with_*.json file
+            documents_digest: SHA-256 digest of the file the documents were read from
+
+        Returns:
+            DocumentIndex
+        """
+        postings = {}
+        scored = []
+
+        for position, document in enumerate(documents):
+            for field in FILTER_FIELDS:
+                if field in document and document[field] is not None:
+                    postings.setdefault(field, {}).setdefault(str(document[field]), []).append(position)
+
+            if document.get(SCORE_FIELD) is not None:
+                scored.append((document[SCORE_FIELD], position))
+
+        scored.sort()
+        return cls(
+            document_count=len(documents),
+            postings=postings,
+            score_order=[position for _, position in scored],
+            score_values=[score for score, _ in scored],
+            documents_digest=documents_digest
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]):
+        """Create an index from its serialized form."""
+        return cls(
+            data['document_count'], data['postings'], data.get('score_order'), data.get('score_values'),
+            data.get('documents_digest')
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the serializable form of the index."""
+        return {
+            'document_count': self.document_count,
+            'postings': self.postings,
+            'score_order': self.score_order,
+            'score_values': self.score_values,
+            'documents_digest': self.documents_digest
+        }
+
+    def supports(self, field):
+        """Check whether documents can be filtered on a field."""
+        if field == SCORE_FIELD:
+            return bool(self.score_order)
+        return field in self.postings
+
+    def _posting_set(self, field, value):
+        key = (field, value)
+        if key not in self._sets:
+            self._sets[key] = set(self.postings[field].get(value, []))
+        return self._sets[key]
+
+    def query(self, filters: Optional[Dict[str, Any]] = None, min_score=None, max_score=None) -> Sequence[int]:
+        """
+        Get the positions of the documents matching every filter.
+
+        Args:
+            filters: Field name -> required value, for fields in FILTER_FIELDS
+            min_score: Minimum score (inclusive)
+            max_score: Maximum score (inclusive)
+
+        Returns:
+            Matching document positions, in file order
+        """
+        filters = {field: str(value) for field, value in (filters or {}).items() if value is not None}
+
+        if not filters and min_score is None and max_score is None:
+            return range(self.document_count)
+
+        candidates = [(field, self.postings[field].get(value, [])) for field, value in filters.items()]
+
+        if min_score is not None or max_score is not None:
+            start = bisect.bisect_left(self.score_values, min_score) if min_score is not None else 0
+            end = bisect.bisect_right(self.score_values, max_score) if max_score is not None else len(self.score_values)
+            candidates.append((SCORE_FIELD, sorted(self.score_order[start:end])))
+
+        # Walk the shortest list and check membership in the others
+        candidates.sort(key=lambda candidate: len(candidate[1]))
+        shortest = candidates[0][1]
+        others = [
+            set(positions) if field == SCORE_FIELD else self._posting_set(field, filters[field])
+            for field, positions in candidates[1:]
+        ]
+
+        return [position for position in shortest if all(position in other for other in others)]
+
+def paginate(positions: Sequence[int], offset=0, limit=100, cursor=None):
+    """
+    Select one page of matching positions.
+
+    Args:
+        positions: Sorted document positions
+        offset: Number of matches to skip (ignored when a cursor is given)
+        limit: Maximum number of positions in the page
+        cursor: Position of the last document of the previous page
+
+    Returns:
+        Tuple of (page positions, cursor of the next page or None)
+    """
+    start = bisect.bisect_right(positions, cursor) if cursor is not None else offset
+    page = positions[start:start + limit]
+    next_cursor = page[-1] if start + limit < len(positions) else None
+    return list(page), next_cursor
+
+def project(document: Dict[str, Any], fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Keep only the requested fields of a document (all of them when fields is empty)."""
+    if not fields:
+        return document
+    return {field: document[field] for field in fields if field in document}
+
+def publish_document_indexes(company_results_dir):
+    """
+    Build and save the index of every per-document result file of a company.
+
+    Args:
+        company_results_dir: Path to data/nlp_results/<company>
+
+    Returns:
+        List of written index paths
+    """
+    written = []
+
+    for relative_path in DOCUMENT_FILES.values():
+        documents_path = Path(company_results_dir) / relative_path
+        if not documents_path.exists():
+            continue
+
+        with open(documents_path, 'rb') as f:
+            content = f.read()
+        documents = json.loads(content.decode('utf-8'))
+        index = DocumentIndex.build(documents, documents_digest=hashlib.sha256(content).hexdigest())
+
+        index_path = documents_path.parent / DOCUMENT_INDEX_FILE
+        tmp_path = index_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index.to_dict(), f)
+        os.replace(tmp_path, index_path)
+
+        logger.info(f"Indexed {len(documents)} documents of {documents_path}")
+        written.append(index_path)
+
+    return written
@@ -0,0 +1,270 @@
+import os
+import sys
+import time
+import shutil
+import signal
+import logging
+import subprocess
+import contextvars
+from pathlib import Path
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Instrumentation of pipeline stages: named timers around the phases of a stage (load, tokenize,
+# infer, save...), counters (documents, tokens) and memory snapshots, plus optional cProfile or
+# py-spy profiles. Stages record into the recorder of the stage being run, held in a context
+# variable, so the analyzers don't pass it around. Without one (instrumentation off, or analyzers
+# used on their own) every call below does nothing.
+
+# Profilers supported per stage
+PROFILERS = ['cprofile', 'py-spy']
+
+# Functions listed in the report for each cProfile profile
+PROFILE_TOP_FUNCTIONS = 25
+
+_recorder = contextvars.ContextVar('stage_recorder', default=None)
+
+def current_rss_mb():
+    """Get the resident set size of the current process in MB, if the platform exposes it."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def peak_rss_mb():
+    """Get the peak resident set size of the current process in MB, if the platform exposes it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _round(value, digits=1):
+    return round(value, digits) if value is not None else None
+
+class StageRecorder:
+    """
+    Timers, counters and memory snapshots of one stage run.
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.start = time.perf_counter()
+        self.timers = {}
+        self.counters = {}
+        self.memory = []
+        self.profile = None
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timer = self.timers.setdefault(name, {'seconds': 0.0, 'calls': 0})
+            timer['seconds'] += time.perf_counter() - start
+            timer['calls'] += 1
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self, label):
+        self.memory.append({
+            'label': label,
+            'at_seconds': round(time.perf_counter() - self.start, 3),
+            'rss_mb': _round(current_rss_mb()),
+            'peak_rss_mb': _round(peak_rss_mb())
+        })
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'timers': {
+                name: {'seconds': round(timer['seconds'], 4), 'calls': timer['calls']}
+                for name, timer in sorted(self.timers.items(), key=lambda item: item[1]['seconds'], reverse=True)
+            },
+            'counters': dict(self.counters),
+            'memory': list(self.memory),
+            'profile': self.profile
+        }
+
+def enabled() -> bool:
+    """Whether the current stage is instrumented (to skip counters that cost something to compute)."""
+    return _recorder.get() is not None
+
+def timer(name):
+    """
+    Time a block of code as phase `name` of the current stage. Repeated blocks add up.
+
+    Example:
+        with instrumentation.timer('infer'):
+            outputs = model(**inputs)
+    """
+    recorder = _recorder.get()
+    return recorder.timer(name) if recorder is not None else nullcontext()
+
+def count(name, value=1):
+    """Add `value` to counter `name` of the current stage (e.g. documents, tokens)."""
+    recorder = _recorder.get()
+    if recorder is not None:
+        recorder.count(name, value)
+
+def snapshot(label):
+    """Record the memory use of the current process, labelled (e.g. 'model_loaded')."""
+    recorder = _recorder.get()
+    if recorder is not None:
+        recorder.snapshot(label)
+
+def _cprofile_summary(profiler, path):
+    """Save a cProfile profile and list its functions with the highest cumulative time."""
+    import pstats
+
+    profiler.dump_stats(str(path))
+    stats = pstats.Stats(profiler)
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:PROFILE_TOP_FUNCTIONS]
+    return {
+        'profiler': 'cprofile',
+        'path': str(path),
+        'top_functions': [
+            {
+                'function': f"{file_name}:{line}({function})",
+                'calls': calls,
+                'self_seconds': round(self_time, 4),
+                'cumulative_seconds': round(cumulative_time, 4)
+            }
+            for (file_name, line, function), (_, calls, self_time, cumulative_time, _) in rows
+        ]
+    }
+
+def _start_py_spy(path):
+    """Sample the current process with py-spy, writing a speedscope profile to path."""
+    executable = shutil.which('py-spy')
+    if executable is None:
+        logger.warning("py-spy is not installed, the stage is not profiled. Install it with 'pip install py-spy'.")
+        return None
+    return subprocess.Popen(
+        [executable, 'record', '--pid', str(os.getpid()), '--format', 'speedscope', '--output', str(path), '--nonblocking'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+def _stop_py_spy(sampler, path):
+    # py-spy writes its profile when interrupted
+    sampler.send_signal(signal.SIGINT)
+    try:
+        sampler.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        sampler.kill()
+    return {'profiler': 'py-spy', 'path': str(path) if Path(path).exists() else None}
+
+@contextmanager
+def instrument_stage(stage: str, settings: Optional[Dict[str, Any]]):
+    """
+    Record the instrumentation of a stage run, and profile it if requested.
+
+    Args:
+        stage: Stage name
+        settings: None to leave the stage uninstrumented, or a dictionary with 'profile'
+            (None, 'cprofile' or 'py-spy') and 'profile_dir' (directory of the profile files)
+
+    Yields:
+        The stage's StageRecorder, or None if the stage is not instrumented
+    """
+    if not settings:
+        yield None
+        return
+
+    recorder = StageRecorder(stage)
+    token = _recorder.set(recorder)
+    logger.info(f"Instrumenting stage {stage} in process {os.getpid()}")
+
+    profiler_name = settings.get('profile')
+    profile_path = None
+    profiler = None
+    sampler = None
+    if profiler_name in PROFILERS:
+        profile_dir = Path(settings.get('profile_dir') or '.')
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        if profiler_name == 'cprofile':
+            import cProfile
+
+            profile_path = profile_dir / f"{stage}.prof"
+            profiler = cProfile.Profile()
+        else:
+            profile_path = profile_dir / f"{stage}.speedscope.json"
+            sampler = _start_py_spy(profile_path)
+
+    recorder.snapshot('start')
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield recorder
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            recorder.profile = _cprofile_summary(profiler, profile_path)
+        elif sampler is not None:
+            recorder.profile = _stop_py_spy(sampler, profile_path)
+        recorder.snapshot('end')
+        _recorder.reset(token)
+
+        phases = ", ".join(f"{name} {timer['seconds']:.2f}s" for name, timer in recorder.to_dict()['timers'].items())
+        logger.info(f"Stage {stage} phases: {phases or 'none recorded'}; counters: {recorder.counters}")
+
+def build_run_report(company, stage_metrics: Dict[str, Any], settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Build the run report: per-stage timings, memory and instrumentation, and the phases that
+    took the most time across the run.
+
+    Args:
+        company: Company name
+        stage_metrics: Metrics of every stage, by stage name (as returned by StageGraph.run)
+        settings: Instrumentation settings of the run
+
+    Returns:
+        Dictionary saved as run_report.json
+    """
+    stages = {}
+    hot_spots = []
+
+    for name, metrics in stage_metrics.items():
+        if name.startswith('_'):
+            continue
+
+        instrumentation = metrics.get('instrumentation') or {}
+        stage = {key: value for key, value in metrics.items() if key != 'instrumentation'}
+        stage.update(instrumentation)
+
+        wall_time = metrics.get('wall_time_seconds') or 0
+        documents = instrumentation.get('counters', {}).get('documents')
+        if documents and wall_time:
+            stage['documents_per_second'] = round(documents / wall_time, 1)
+
+        for timer_name, timer in instrumentation.get('timers', {}).items():
+            hot_spots.append({
+                'stage': name,
+                'phase': timer_name,
+                'seconds': timer['seconds'],
+                'share_of_stage': round(timer['seconds'] / wall_time, 3) if wall_time else None
+            })
+
+        stages[name] = stage
+
+    return {
+        'company': company,
+        'generated_at': datetime.now().isoformat(),
+        'settings': settings or {},
+        'wall_time_seconds': stage_metrics.get('_total', {}).get('wall_time_seconds'),
+        'stages': stages,
+        'hot_spots': sorted(hot_spots, key=lambda item: item['seconds'], reverse=True)[:20]
+    }
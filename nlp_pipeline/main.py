@@ -10,14 +10,41 @@ import sys
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from nlp_pipeline.stage_executor import StageGraph
+from nlp_pipeline.stage_cache import StageCache
+from nlp_pipeline.document_index import publish_document_indexes
+from nlp_pipeline.results_store import ResultsStore, join_document_results
+from nlp_pipeline.rollups import publish_rollups
+from nlp_pipeline.storage import get_storage
+from nlp_pipeline.instrumentation import PROFILERS, build_run_report
+from nlp_pipeline import pipeline_stages
+
+# Analysis stages that only depend on preprocessing and can run side by side
+ANALYSIS_STAGES = ['sentiment', 'keywords', 'topics', 'engagement']
+
 class NLPPipeline:
-    def __init__(self, base_dir=None, company_name=None):
+    def __init__(self, base_dir=None, company_name=None, backend="pandas", max_workers=None,
+                 use_cache=True, force_stages=None, use_s3=False, s3_bucket=None, storage=None,
+                 instrument=None, profile=None):
         """
         Initialize the NLP pipeline.
         
         Args:
             base_dir: Base directory for data
             company_name: Name of the company to analyze
+            backend: Execution backend for preprocessing, sentiment and keywords ("pandas" or "spark")
+            max_workers: Maximum number of stages running at once
+            use_cache: Whether to reuse cached stage outputs when a stage's inputs are unchanged
+            force_stages: Names of stages to recompute even when cached outputs exist
+            use_s3: Whether to keep stage outputs and results in S3 (same as storage.backend "s3" in config.json)
+            s3_bucket: S3 bucket, overriding s3.bucket in config.json
+            storage: Storage to use instead of the configured one (see nlp_pipeline.storage)
+            instrument: Whether to record per-stage timers, counters and memory in a run report
+                (default pipeline.instrumentation in config.json)
+            profile: Profiler run around each stage ("cprofile" or "py-spy"), turns instrumentation on
         """
         # Set up directories
         self.base_dir = Path(base_dir) if base_dir else Path(__file__).parent.parent
@@ -33,11 +60,34 @@ class NLPPipeline:
         # Load configuration
         self.config = self._load_config()
         
+        if s3_bucket:
+            self.config = {**self.config, 's3': {**self.config.get('s3', {}), 'bucket': s3_bucket}}
+        
+        # Where stage outputs and results are kept; the data directory is the local working copy
+        self.storage = storage or get_storage(self.config, self.data_dir, backend='s3' if use_s3 else None)
+        
+        self.backend = backend
+        self.max_workers = max_workers or self.config.get('pipeline', {}).get('max_workers')
+        
+        # Stage output memoization
+        self.force_stages = list(force_stages or [])
+        self.stage_cache = None
+        if use_cache and self.config.get('pipeline', {}).get('stage_cache', True):
+            self.stage_cache = StageCache(self.data_dir / "stage_cache")
+        
+        # Stage instrumentation, saved as run_report.json next to the results
+        pipeline_config = self.config.get('pipeline', {})
+        self.profile = profile or pipeline_config.get('profile')
+        if instrument is None:
+            instrument = pipeline_config.get('instrumentation', False)
+        self.instrument = bool(instrument or self.profile)
+        self.run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        
         # Initialize results dictionary
         self.results = {
             'company': self.company_name,
             'timestamp': datetime.now().isoformat(),
-            'data_sources': ['Reddit']
+            'data_sources': []
         }
     
     def _load_config(self):
@@ -56,28 +106,229 @@ class NLPPipeline:
         logger.warning("No configuration file found, using defaults")
         return {}
     
-    def process_data(self, start_date=None, end_date=None, keyword=None):
-        """Process the data and generate NLP results."""
+    def build_stage_graph(self, skip_stages=None, progress=None, keyword=None):
+        """
+        Build the stage graph: fetch -> preprocess -> {sentiment, keywords, topics, engagement}.
+        
+        Args:
+            skip_stages: Names of analysis stages to leave out
+            progress: ProgressReporter receiving stage and document progress
+            keyword: Keyword the preprocessing filters the posts by
+            
+        Returns:
+            StageGraph
+        """
+        skip_stages = set(skip_stages or [])
+        graph = StageGraph(
+            max_workers=self.max_workers, cache=self.stage_cache, force_stages=self.force_stages, progress=progress
+        )
+        
+        # Fetching talks to the outside world, so it always runs
+        graph.add_stage('fetch', pipeline_stages.fetch_stage, cacheable=False)
+        
+        if self.backend == "spark":
+            # The Spark backend preprocesses and scores sentiment and keywords in one job
+            if keyword:
+                logger.warning("The Spark backend does not filter posts by keyword, every post is analyzed")
+            graph.add_stage(
+                'preprocess', pipeline_stages.spark_stage, depends_on=['fetch'],
+                model=pipeline_stages.STAGE_MODELS['spark'],
+                code_paths=pipeline_stages.STAGE_CODE_PATHS['spark'],
+                cache_params={'skip_stages': sorted(skip_stages & {'sentiment', 'keywords'})}
+            )
+            analysis_stages = ['topics', 'engagement']
+        else:
+            graph.add_stage(
+                'preprocess', pipeline_stages.preprocess_stage, depends_on=['fetch'],
+                code_paths=pipeline_stages.STAGE_CODE_PATHS['preprocess'],
+                cache_params={'keyword': keyword} if keyword else None
+            )
+            analysis_stages = ANALYSIS_STAGES
+        
+        for name in analysis_stages:
+            if name not in skip_stages:
+                graph.add_stage(
+                    name, getattr(pipeline_stages, f"{name}_stage"), depends_on=['preprocess'],
+                    model=pipeline_stages.STAGE_MODELS[name],
+                    code_paths=pipeline_stages.STAGE_CODE_PATHS[name],
+                    # Topic embeddings come from Azure when it is configured
+                    cache_params={'azure': self.config.get('azure', {}).get('model_name')} if name == 'topics' else None
+                )
+        
+        return graph
+    
+    def process_data(self, start_date=None, end_date=None, keyword=None,
+                     use_existing=False, existing_file=None, skip_stages=None, progress=None):
+        """
+        Process the data and generate NLP results.
+        
+        Args:
+            start_date: Start date for fetching (YYYY-MM-DD)
+            end_date: End date for fetching (YYYY-MM-DD)
+            keyword: Keyword to filter data
+            use_existing: Whether to use the latest stored data instead of fetching
+            existing_file: Path to an existing data file to use instead of fetching
+            skip_stages: Names of analysis stages to skip
+            progress: ProgressReporter receiving stage and document progress (see nlp_pipeline.progress)
+            
+        Returns:
+            Dictionary with the output paths of every stage and per-stage metrics
+        """
         try:
-            # Your existing processing code here
-            # ...
+            context = self.build_context(
+                start_date=start_date, end_date=end_date, keyword=keyword, use_existing=use_existing,
+                existing_file=existing_file, skip_stages=skip_stages, progress=progress
+            )
             
-            # Save results locally
-            self._save_results()
+            # Run the stage graph
+            graph = self.build_stage_graph(skip_stages=skip_stages, progress=progress, keyword=keyword)
+            outputs, metrics = graph.run(context)
             
-            return self.results
+            return self.publish(outputs, metrics)
             
         except Exception as e:
             logger.error(f"Error processing data: {str(e)}")
             raise
     
+    def build_context(self, start_date=None, end_date=None, keyword=None,
+                      use_existing=False, existing_file=None, skip_stages=None, progress=None):
+        """
+        Build the context passed to every stage function (arguments as in process_data).
+        
+        Returns:
+            Picklable dictionary
+        """
+        if not self.company_name:
+            raise ValueError("No company name provided")
+        
+        return {
+            'company': self.company_name,
+            # Stages read and write under the pipeline's data directory
+            'data_dir': str(self.data_dir),
+            'start_date': start_date,
+            'end_date': end_date,
+            'keyword': keyword,
+            'use_existing': use_existing,
+            'existing_file': str(existing_file) if existing_file else None,
+            'skip_stages': list(skip_stages or []),
+            'config': self.config,
+            # Passed to the stage processes for document-level progress
+            'progress': progress,
+            'instrumentation': self.instrumentation_settings()
+        }
+    
+    def instrumentation_settings(self):
+        """
+        Get the instrumentation settings passed to the stages.
+        
+        Returns:
+            Dictionary with the profiler and the directory of the profiles, or None if instrumentation is off
+        """
+        if not self.instrument:
+            return None
+        
+        return {
+            'profile': self.profile,
+            'profile_dir': str(self.data_dir / "profiles" / self.company_name / self.run_id)
+        }
+    
+    def _data_keys(self, output):
+        """Get the storage keys of the files (or directories) named in a stage output."""
+        values = output.values() if isinstance(output, dict) else [output]
+        keys = []
+        for value in values:
+            if isinstance(value, (list, tuple)):
+                keys.extend(self._data_keys(list(value)))
+            elif isinstance(value, (str, Path)):
+                key = self.storage.key_for(value)
+                if key is not None:
+                    keys.append(key)
+        return keys
+    
+    def materialize_inputs(self, inputs):
+        """
+        Make the files named in the outputs of a stage's dependencies available locally.
+        Needed when stages run on different machines (see airflow/repusense_dag.py).
+        
+        Args:
+            inputs: Outputs of the stage's dependencies, by stage name
+        """
+        if not self.storage.is_remote:
+            return
+        for output in inputs.values():
+            for key in self._data_keys(output):
+                self.storage.local_path(key)
+    
+    def persist_outputs(self, output):
+        """
+        Store the files named in a stage output, so stages on other machines can read them.
+        
+        Args:
+            output: Stage output
+        """
+        if not self.storage.is_remote:
+            return
+        for key in self._data_keys(output):
+            path = self.data_dir / key
+            if path.is_dir():
+                self.storage.upload_directory(path, f"{key}/")
+            elif path.is_file():
+                self.storage.upload_file(key, path)
+    
+    def publish(self, outputs, metrics=None):
+        """
+        Save a run's results and publish them to the API (indexes, rollups, results store, results version).
+        
+        Args:
+            outputs: Output of every stage, by stage name
+            metrics: Metrics of every stage, by stage name
+            
+        Returns:
+            Dictionary with the output paths of every stage and per-stage metrics
+        """
+        self.results.update(outputs)
+        self.results['stage_metrics'] = metrics or {}
+        self.results['data_sources'] = self._load_data_sources(outputs['preprocess'].get('data_sources'))
+        
+        # Charts are rendered on demand by the API, unless configured to be rendered with every run
+        if self.config.get('pipeline', {}).get('visualizations', 'deferred') == 'eager':
+            from nlp_pipeline.visualizations import render_all
+            self.results['visualizations'] = render_all(self.nlp_results_dir / self.company_name)
+        
+        # Save results locally
+        self._save_results()
+        
+        if self.storage.is_remote:
+            # The version file goes last, so readers never see a new version with missing files
+            self.storage.upload_directory(
+                self.nlp_results_dir / self.company_name, f"nlp_results/{self.company_name}/",
+                last=["results_version.json"]
+            )
+        
+        return self.results
+    
+    def run_pipeline(self, start_date=None, end_date=None, **kwargs):
+        """
+        Run the full pipeline (alias of process_data used by the API and the Airflow DAG).
+        """
+        return self.process_data(start_date=start_date, end_date=end_date, **kwargs)
+    
+    def _load_data_sources(self, summary_path):
+        """Get the display names of the sources found by preprocessing."""
+        if not summary_path or not Path(summary_path).exists():
+            return []
+        
+        with open(summary_path, 'r', encoding='utf-8') as f:
+            return [source['name'] for source in json.load(f)]
+    
     def _save_results(self):
         """Save NLP results to local storage."""
         if not self.company_name:
             logger.error("No company name provided")
             return
         
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Name the run directory after the run ID, so it lines up with the profiles and run report of the same run
+        timestamp = self.run_id
         company_dir = self.nlp_results_dir / self.company_name
         
         # Create timestamp directory
@@ -96,7 +347,35 @@ class NLPPipeline:
         with open(combined_path, 'w', encoding='utf-8') as f:
             json.dump(self.results, f, indent=2)
         
+        if self.instrument:
+            report = build_run_report(self.company_name, self.results.get('stage_metrics', {}), self.instrumentation_settings())
+            with open(timestamp_dir / "run_report.json", 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+        
         logger.info(f"Results saved to {timestamp_dir}")
+        
+        # Index the per-document results before announcing the new version to the API
+        publish_document_indexes(company_dir)
+        documents = join_document_results(company_dir)
+        publish_rollups(self.company_name, timestamp, company_dir, documents, run_dir=timestamp_dir)
+        try:
+            ResultsStore(self.data_dir / "results.db").publish(
+                self.company_name, timestamp, company_dir,
+                keep_runs=self.config.get('pipeline', {}).get('results_store_keep_runs', 3),
+                rows=documents
+            )
+        except Exception as e:
+            # The API falls back to the result files
+            logger.error(f"Error publishing results to the results store: {str(e)}")
+        self._publish_results_version(company_dir, timestamp)
+    
+    def _publish_results_version(self, company_dir, version):
+        """Record the latest results version, so API caches drop entries from earlier runs."""
+        version_path = company_dir / "results_version.json"
+        tmp_path = version_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': version, 'published_at': datetime.now().isoformat()}, f, indent=2)
+        os.replace(tmp_path, version_path)
 
 def main():
     parser = argparse.ArgumentParser(description='Run NLP pipeline')
@@ -108,24 +387,64 @@ def main():
     parser.add_argument('--start-date', type=str, help='Start date for analysis (YYYY-MM-DD)')
     parser.add_argument('--end-date', type=str, help='End date for analysis (YYYY-MM-DD)')
     parser.add_argument('--keyword', type=str, help='Keyword to filter data')
-    parser.add_argument('--output-dir', type=str, help='Output directory for results')
+    parser.add_argument('--output-dir', type=str,
+                        help='Base directory whose data/ directory holds the raw data, stage outputs and results')
+    
+    # Input data
+    parser.add_argument('--use-existing', action='store_true', help='Use the latest stored data instead of fetching')
+    parser.add_argument('--existing-file', type=str, help='Path to an existing data file')
+    
+    # Execution
+    parser.add_argument('--backend', type=str, choices=['pandas', 'spark'], default='pandas',
+                        help='Backend for preprocessing, sentiment and keywords')
+    parser.add_argument('--max-workers', type=int, help='Maximum number of stages running at once')
+    # Same flags as run_pipeline.py
+    parser.add_argument('--skip-topic', dest='skip_topics', action='store_true', help='Skip topic modeling')
+    parser.add_argument('--skip-sentiment', dest='skip_sentiment', action='store_true', help='Skip sentiment analysis')
+    parser.add_argument('--skip-keyword', dest='skip_keywords', action='store_true', help='Skip keyword extraction')
+    parser.add_argument('--skip-engagement', dest='skip_engagement', action='store_true', help='Skip engagement analysis')
+    
+    # Stage cache
+    parser.add_argument('--no-cache', action='store_true', help='Recompute every stage and do not cache outputs')
+    parser.add_argument('--force-stage', type=str, action='append', default=[],
+                        help='Recompute a stage even if a cached output exists (repeatable)')
+    parser.add_argument('--invalidate-stage', type=str, action='append', default=[],
+                        help='Delete the cached outputs of a stage before running (repeatable, "all" for every stage)')
+    
+    # Instrumentation
+    parser.add_argument('--instrument', action='store_true',
+                        help='Record per-stage timers, counters and memory in run_report.json')
+    parser.add_argument('--profile', type=str, choices=PROFILERS,
+                        help='Profile each stage that runs (implies --instrument)')
     
     args = parser.parse_args()
     
     # Initialize pipeline
     pipeline = NLPPipeline(
         base_dir=args.output_dir,
-        company_name=args.company
+        company_name=args.company,
+        backend=args.backend,
+        max_workers=args.max_workers,
+        use_cache=not args.no_cache,
+        force_stages=args.force_stage,
+        instrument=args.instrument or None,
+        profile=args.profile
     )
     
+    if args.invalidate_stage and pipeline.stage_cache:
+        pipeline.stage_cache.invalidate(None if 'all' in args.invalidate_stage else args.invalidate_stage)
+    
     # Process data
-    results = pipeline.process_data(
+    pipeline.process_data(
         start_date=args.start_date,
         end_date=args.end_date,
-        keyword=args.keyword
+        keyword=args.keyword,
+        use_existing=args.use_existing,
+        existing_file=args.existing_file,
+        skip_stages=[name for name in ANALYSIS_STAGES if getattr(args, f'skip_{name}')]
     )
     
     logger.info("Pipeline completed successfully")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
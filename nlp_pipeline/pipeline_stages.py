@@ -0,0 +1,147 @@
+import logging
+from pathlib import Path
+from typing import Dict, Any
+
+from nlp_pipeline.progress import stage_progress
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Stage functions for NLPPipeline's stage graph.
+# Each one runs in its own worker process, so the heavy analyzer modules are imported
+# inside the function and only by the stage that needs them.
+
+PACKAGE_DIR = Path(__file__).parent
+
+# Model identity of each stage, part of the stage cache key
+STAGE_MODELS = {
+    'preprocess': None,
+    'spark': "cardiffnlp/twitter-roberta-base-sentiment + KeyBERT all-MiniLM-L6-v2",
+    'sentiment': "cardiffnlp/twitter-roberta-base-sentiment",
+    'keywords': "KeyBERT all-MiniLM-L6-v2",
+    'topics': "BERTopic all-MiniLM-L6-v2",
+    'engagement': None
+}
+
+# Source files implementing each stage; editing them invalidates the stage's cached outputs
+STAGE_CODE_PATHS = {
+    'preprocess': [PACKAGE_DIR / "data_processing" / "data_preprocessor.py"],
+    'spark': [PACKAGE_DIR / "spark_nlp" / "spark_backend.py", PACKAGE_DIR / "data_processing" / "data_preprocessor.py"],
+    'sentiment': [PACKAGE_DIR / "spark_nlp" / "sentiment_analysis.py"],
+    'keywords': [PACKAGE_DIR / "spark_nlp" / "keyword_extraction.py"],
+    'topics': [PACKAGE_DIR / "spark_nlp" / "topic_modeling.py"],
+    'engagement': [PACKAGE_DIR / "spark_nlp" / "engagement_analysis.py"]
+}
+
+def _company_dir(context, name):
+    """Get the company's directory under one of the run's data directories (data_storage, processed_data, nlp_results)."""
+    return Path(context['data_dir']) / name / context['company']
+
+def _as_strings(results):
+    """Convert the path values of an analyzer's results to strings, dropping DataFrames."""
+    return {key: str(value) for key, value in results.items() if isinstance(value, (str, Path))}
+
+def fetch_stage(context: Dict[str, Any], inputs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fetch (or register existing) raw data and locate the latest file of every source.
+    """
+    from nlp_pipeline.data_processing.data_fetcher import RedditDataFetcher
+    from nlp_pipeline.data_processing.data_preprocessor import find_source_files
+
+    company = context['company']
+    fetcher = RedditDataFetcher(
+        storage_dir=_company_dir(context, "data_storage"),
+        company_name=company,
+        keep_runs=context['config'].get('pipeline', {}).get('raw_data_keep_runs')
+    )
+
+    if context.get('existing_file'):
+        fetcher.copy_existing_data(context['existing_file'], company_name=company)
+    elif not context.get('use_existing'):
+        fetcher.fetch_and_store_data(
+            company_name=company,
+            start_date=context['start_date'],
+            end_date=context['end_date']
+        )
+
+    source_files = find_source_files(context['data_dir'], company)
+    if not source_files:
+        raise FileNotFoundError(f"No raw data found for company: {company}")
+
+    return {'source_files': [str(path) for path in source_files]}
+
+def preprocess_stage(context: Dict[str, Any], inputs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Preprocess every source into the unified document schema, keeping the posts mentioning the
+    requested keyword if there is one.
+    """
+    from nlp_pipeline.data_processing.data_preprocessor import RedditDataPreprocessor
+
+    preprocessor = RedditDataPreprocessor(processed_dir=_company_dir(context, "processed_data"), company_name=context['company'])
+    _, nlp_ready_path = preprocessor.process_data(inputs['fetch']['source_files'], keyword=context.get('keyword'))
+
+    return {
+        'nlp_ready_data': str(nlp_ready_path),
+        'processed_posts': str(preprocessor.company_processed_dir / 'processed_posts.json'),
+        'data_sources': str(preprocessor.company_processed_dir / 'data_sources.json')
+    }
+
+def spark_stage(context: Dict[str, Any], inputs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run preprocessing, sentiment and keyword extraction on the Spark backend.
+    """
+    from nlp_pipeline.spark_nlp.spark_backend import SparkNLPBackend
+
+    skip = context.get('skip_stages', [])
+    backend = SparkNLPBackend(config=context['config'].get('spark', {}), data_dir=context['data_dir'])
+    try:
+        results = backend.run(
+            companies=[context['company']],
+            sentiment='sentiment' not in skip,
+            keywords='keywords' not in skip
+        )
+    finally:
+        backend.stop()
+
+    return _as_strings(results.get(context['company'], {}))
+
+def sentiment_stage(context: Dict[str, Any], inputs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run sentiment analysis on the NLP-ready documents.
+    """
+    from nlp_pipeline.spark_nlp.sentiment_analysis import SentimentAnalyzer
+
+    analyzer = SentimentAnalyzer(output_dir=_company_dir(context, "nlp_results") / "sentiment", company_name=context['company'])
+    return _as_strings(analyzer.run_sentiment_analysis(
+        inputs['preprocess']['nlp_ready_data'], progress_callback=stage_progress(context, 'sentiment')
+    ))
+
+def keywords_stage(context: Dict[str, Any], inputs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run keyword extraction on the NLP-ready documents.
+    """
+    from nlp_pipeline.spark_nlp.keyword_extraction import KeywordExtractor
+
+    extractor = KeywordExtractor(output_dir=_company_dir(context, "nlp_results") / "keywords", company_name=context['company'])
+    return _as_strings(extractor.run_keyword_extraction(
+        inputs['preprocess']['nlp_ready_data'], progress_callback=stage_progress(context, 'keywords')
+    ))
+
+def topics_stage(context: Dict[str, Any], inputs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run topic modeling on the NLP-ready documents.
+    """
+    from nlp_pipeline.spark_nlp.topic_modeling import TopicModeler
+
+    modeler = TopicModeler(output_dir=_company_dir(context, "nlp_results") / "topics", company_name=context['company'])
+    return _as_strings(modeler.run_topic_modeling(inputs['preprocess']['nlp_ready_data']))
+
+def engagement_stage(context: Dict[str, Any], inputs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run engagement analysis on the preprocessed posts.
+    """
+    from nlp_pipeline.spark_nlp.engagement_analysis import EngagementAnalyzer
+
+    analyzer = EngagementAnalyzer(output_dir=_company_dir(context, "nlp_results") / "engagement", company_name=context['company'])
+    return _as_strings(analyzer.run_engagement_analysis(inputs['preprocess']['processed_posts']))
@@ -0,0 +1,67 @@
+import time
+import logging
+from typing import Any, Callable, Dict, Optional
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class ProgressReporter:
+    """
+    Receives the progress of a pipeline run: stages starting and finishing, and the number of
+    documents processed within a stage. This base class ignores every update.
+
+    Reporters travel in the stage context to the stage worker processes, so subclasses must be
+    picklable and safe to use from several processes at once.
+    """
+
+    # Minimum seconds between two document-count updates of a stage
+    min_interval = 0.5
+
+    def __init__(self):
+        self._last_update = {}
+
+    def stage_started(self, stage: str):
+        """Called when a stage starts running."""
+
+    def stage_finished(self, stage: str, status: str = 'completed'):
+        """Called when a stage ends, with status 'completed', 'cached' or 'error'."""
+
+    def update(self, stage: str, processed: int, total: Optional[int] = None, message: Optional[str] = None):
+        """Called with the number of documents a stage has processed so far."""
+
+    def throttled_update(self, stage: str, processed: int, total: Optional[int] = None, message: Optional[str] = None):
+        """
+        Forward a document-count update unless the stage reported less than min_interval ago.
+        The last update of a stage (processed == total) is always forwarded.
+        """
+        now = time.monotonic()
+        if processed != total and now - self._last_update.get(stage, 0.0) < self.min_interval:
+            return
+        self._last_update[stage] = now
+
+        try:
+            self.update(stage, processed, total, message)
+        except Exception as e:
+            # Progress is informational; never fail a stage because of it
+            logger.warning(f"Error reporting progress of stage {stage}: {str(e)}")
+
+def stage_progress(context: Dict[str, Any], stage: str) -> Optional[Callable[[int, int], None]]:
+    """
+    Get a callback reporting the documents processed by a stage, for the analyzers' batch loops.
+
+    Args:
+        context: Stage context, holding the run's reporter under 'progress' (if any)
+        stage: Stage name
+
+    Returns:
+        Function called as callback(processed, total), or None if the run has no reporter
+    """
+    reporter = context.get('progress')
+    if reporter is None:
+        return None
+
+    def callback(processed, total):
+        reporter.throttled_update(stage, processed, total)
+
+    return callback
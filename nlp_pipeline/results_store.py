@@ -0,0 +1,301 @@
+import json
+import sqlite3
+import logging
+from pathlib import Path
+from datetime import datetime
+from contextlib import closing
+from typing import Any, Dict, List, Optional
+
+from nlp_pipeline.document_index import DOCUMENT_FILES
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# comment_id stored for posts and articles, so it can be part of the primary key
+NO_COMMENT_ID = -1
+
+# Columns of the documents table, in the order they are returned
+DOCUMENT_COLUMNS = [
+    'position', 'post_id', 'comment_id', 'text_type', 'source', 'text', 'created_at',
+    'sentiment', 'sentiment_score', 'topic', 'keywords'
+]
+
+# Columns returned by default for each per-document result file (the fields of the file)
+KIND_COLUMNS = {
+    'topics': ['post_id', 'source', 'text_type', 'text', 'comment_id', 'created_at', 'topic'],
+    'sentiment': ['post_id', 'source', 'text_type', 'text', 'comment_id', 'created_at', 'sentiment', 'sentiment_score'],
+    'keywords': ['post_id', 'source', 'text_type', 'text', 'comment_id', 'created_at', 'keywords']
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    company TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    published_at TEXT NOT NULL,
+    document_count INTEGER NOT NULL,
+    PRIMARY KEY (company, run_id)
+);
+CREATE TABLE IF NOT EXISTS documents (
+    company TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    post_id INTEGER NOT NULL,
+    comment_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    text_type TEXT,
+    source TEXT,
+    text TEXT,
+    -- No type: Reddit timestamps are numbers and news timestamps ISO strings, both kept as they are
+    created_at,
+    sentiment TEXT,
+    sentiment_score REAL,
+    topic INTEGER,
+    keywords TEXT,
+    PRIMARY KEY (company, run_id, post_id, comment_id)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_documents_position ON documents (company, run_id, position);
+CREATE INDEX IF NOT EXISTS idx_documents_sentiment ON documents (company, run_id, sentiment, position);
+CREATE INDEX IF NOT EXISTS idx_documents_topic ON documents (company, run_id, topic, position);
+CREATE INDEX IF NOT EXISTS idx_documents_text_type ON documents (company, run_id, text_type, position);
+CREATE INDEX IF NOT EXISTS idx_documents_source ON documents (company, run_id, source, position);
+CREATE INDEX IF NOT EXISTS idx_documents_score ON documents (company, run_id, sentiment_score);
+"""
+
+def join_document_results(company_results_dir) -> List[Dict[str, Any]]:
+    """
+    Join a company's per-document result files into one row per document.
+
+    Args:
+        company_results_dir: Path to data/nlp_results/<company>
+
+    Returns:
+        List of documents with their position, sentiment, topic and keywords, in file order
+    """
+    rows = {}
+
+    for kind, relative_path in DOCUMENT_FILES.items():
+        documents_path = Path(company_results_dir) / relative_path
+        if not documents_path.exists():
+            continue
+
+        with open(documents_path, 'r', encoding='utf-8') as f:
+            documents = json.load(f)
+
+        for document in documents:
+            comment_id = document.get('comment_id')
+            key = (int(document['post_id']), None if comment_id is None else int(comment_id))
+
+            row = rows.get(key)
+            if row is None:
+                row = rows[key] = {
+                    'position': len(rows),
+                    'post_id': key[0],
+                    'comment_id': key[1],
+                    'text_type': document.get('text_type'),
+                    'source': document.get('source'),
+                    'text': document.get('text'),
+                    'created_at': document.get('created_at'),
+                    'sentiment': None,
+                    'sentiment_score': None,
+                    'topic': None,
+                    'keywords': None
+                }
+
+            if kind == 'sentiment':
+                row['sentiment'] = document.get('sentiment')
+                row['sentiment_score'] = document.get('sentiment_score')
+            elif kind == 'topics':
+                row['topic'] = document.get('topic')
+            elif kind == 'keywords':
+                row['keywords'] = document.get('keywords', [])
+
+    return list(rows.values())
+
+class ResultsStore:
+    """
+    SQLite store of per-document NLP results.
+    Sentiment, topic and keywords of every document are joined into one row keyed by
+    (company, run, post_id, comment_id), so cross-stage questions are answered with indexed
+    queries instead of loading several result files.
+    """
+
+    def __init__(self, db_path):
+        """
+        Initialize the store, creating the database if needed.
+
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with closing(self._connect()) as conn:
+            # WAL lets the API read while the pipeline publishes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+            # Databases created before documents had a created_at column
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(documents)")}
+            if 'created_at' not in columns:
+                conn.execute("ALTER TABLE documents ADD COLUMN created_at")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def publish(self, company, run_id, company_results_dir, keep_runs=None, rows=None):
+        """
+        Load a run's per-document result files into the store.
+
+        Args:
+            company: Company name
+            run_id: Identifier of the run
+            company_results_dir: Path to data/nlp_results/<company>
+            keep_runs: Number of most recent runs of the company to keep (None keeps every run)
+            rows: Documents already joined with join_document_results (joined from the files otherwise)
+
+        Returns:
+            Number of documents stored
+        """
+        if rows is None:
+            rows = join_document_results(company_results_dir)
+
+        if not rows:
+            logger.warning(f"No per-document results to publish for {company}")
+            return 0
+
+        values = [
+            (company, run_id, row['post_id'], NO_COMMENT_ID if row['comment_id'] is None else row['comment_id'],
+             row['position'], row['text_type'], row['source'], row['text'], row.get('created_at'),
+             row['sentiment'], row['sentiment_score'],
+             row['topic'], json.dumps(row['keywords'], ensure_ascii=False) if row['keywords'] is not None else None)
+            for row in rows
+        ]
+
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute("DELETE FROM documents WHERE company = ? AND run_id = ?", (company, run_id))
+                conn.executemany(
+                    "INSERT INTO documents (company, run_id, post_id, comment_id, position, text_type, source, text, "
+                    "created_at, sentiment, sentiment_score, topic, keywords) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    values
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO runs (company, run_id, published_at, document_count) VALUES (?, ?, ?, ?)",
+                    (company, run_id, datetime.now().isoformat(), len(values))
+                )
+
+                if keep_runs is not None:
+                    old_runs = conn.execute(
+                        "SELECT run_id FROM runs WHERE company = ? ORDER BY published_at DESC LIMIT -1 OFFSET ?",
+                        (company, keep_runs)
+                    ).fetchall()
+                    for old_run in old_runs:
+                        conn.execute("DELETE FROM documents WHERE company = ? AND run_id = ?", (company, old_run['run_id']))
+                        conn.execute("DELETE FROM runs WHERE company = ? AND run_id = ?", (company, old_run['run_id']))
+
+        logger.info(f"Published {len(values)} documents of {company} run {run_id} to {self.db_path}")
+        return len(values)
+
+    def latest_run(self, company) -> Optional[str]:
+        """
+        Get the most recently published run of a company.
+
+        Args:
+            company: Company name
+
+        Returns:
+            Run id, or None if the company has no published run
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT run_id FROM runs WHERE company = ? ORDER BY published_at DESC LIMIT 1", (company,)
+            ).fetchone()
+        return row['run_id'] if row else None
+
+    def query_documents(self, company, run_id=None, filters: Optional[Dict[str, Any]] = None,
+                        min_score=None, max_score=None, offset=0, limit=100, cursor=None,
+                        fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get one page of a company's documents matching the filters.
+
+        Args:
+            company: Company name
+            run_id: Run to query (defaults to the latest run)
+            filters: Column name -> required value, for text_type, source, sentiment and topic
+            min_score: Minimum sentiment score (inclusive)
+            max_score: Maximum sentiment score (inclusive)
+            offset: Number of matches to skip (ignored when a cursor is given)
+            limit: Maximum number of documents returned
+            cursor: Position of the last document of the previous page
+            fields: Columns to return (defaults to every column but position)
+
+        Returns:
+            Dictionary with total, next_cursor and documents, or None if the company has no published run
+
+        Raises:
+            ValueError: If a filter or field is not a column of the documents
+        """
+        unknown = [column for column in (fields or []) if column not in DOCUMENT_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unsupported fields: {', '.join(unknown)}")
+
+        run_id = run_id or self.latest_run(company)
+        if run_id is None:
+            return None
+
+        conditions = ["company = ?", "run_id = ?"]
+        params = [company, run_id]
+
+        for column, value in (filters or {}).items():
+            if value is None:
+                continue
+            if column not in ('text_type', 'source', 'sentiment', 'topic'):
+                raise ValueError(f"Unsupported filter: {column}")
+            conditions.append(f"{column} = ?")
+            params.append(value)
+
+        if min_score is not None:
+            conditions.append("sentiment_score >= ?")
+            params.append(min_score)
+        if max_score is not None:
+            conditions.append("sentiment_score <= ?")
+            params.append(max_score)
+
+        where = " AND ".join(conditions)
+        columns = list(fields or DOCUMENT_COLUMNS[1:])
+        # position is always read, for the cursor
+        selected = ', '.join(['position'] + [column for column in columns if column != 'position'])
+
+        with closing(self._connect()) as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM documents WHERE {where}", params).fetchone()[0]
+
+            # One extra row tells whether another page follows
+            if cursor is not None:
+                page_sql = f"SELECT {selected} FROM documents WHERE {where} AND position > ? ORDER BY position LIMIT ?"
+                page_params = params + [cursor, limit + 1]
+            else:
+                page_sql = f"SELECT {selected} FROM documents WHERE {where} ORDER BY position LIMIT ? OFFSET ?"
+                page_params = params + [limit + 1, offset]
+
+            rows = conn.execute(page_sql, page_params).fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        documents = []
+        for row in rows:
+            document = {column: row[column] for column in columns}
+            if document.get('comment_id') == NO_COMMENT_ID:
+                document['comment_id'] = None
+            if document.get('keywords') is not None:
+                document['keywords'] = json.loads(document['keywords'])
+            documents.append(document)
+
+        return {
+            'run_id': run_id,
+            'total': total,
+            'next_cursor': rows[-1]['position'] if has_more else None,
+            'documents': documents
+        }
@@ -0,0 +1,139 @@
+import os
+import json
+import logging
+from pathlib import Path
+from datetime import datetime
+from typing import Any, Dict, List
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# File written in a company's results directory (and in each run directory)
+ROLLUPS_FILE = "rollups.json"
+
+SENTIMENT_LABELS = ['positive', 'neutral', 'negative']
+
+def _percentages(counts: 'pd.Series') -> Dict[str, int]:
+    """Get whole-number percentages of every sentiment label."""
+    total = int(counts.sum())
+    return {label: round(100 * int(counts.get(label, 0)) / total) if total else 0 for label in SENTIMENT_LABELS}
+
+def _parse_dates(documents_df: 'pd.DataFrame') -> 'pd.Series':
+    """Parse created_at per source, since every source uses its own timestamp format."""
+    import pandas as pd
+
+    dates = pd.Series(pd.NaT, index=documents_df.index, dtype='datetime64[ns, UTC]')
+    for _, group in documents_df.groupby('source', dropna=False):
+        dates.loc[group.index] = pd.to_datetime(group['created_at'], utc=True, errors='coerce')
+    return dates
+
+def compute_rollups(documents: List[Dict[str, Any]], company, run_id) -> Dict[str, Any]:
+    """
+    Compute the aggregates shown by the dashboard from a run's joined documents.
+
+    Args:
+        documents: Joined documents (see results_store.join_document_results)
+        company: Company name
+        run_id: Identifier of the run
+
+    Returns:
+        Dictionary of rollup tables
+    """
+    # Imported here so the API, which only needs ROLLUPS_FILE, doesn't load pandas
+    import pandas as pd
+    from nlp_pipeline.data_processing.data_preprocessor import SOURCE_LABELS
+
+    documents_df = pd.DataFrame(documents, columns=[
+        'post_id', 'comment_id', 'text_type', 'source', 'created_at', 'sentiment', 'sentiment_score', 'topic'
+    ])
+    # Results produced before news ingestion only contain Reddit data
+    documents_df['source'] = documents_df['source'].fillna('reddit')
+    documents_df['created_at'] = _parse_dates(documents_df)
+
+    by_text_type = documents_df['text_type'].value_counts()
+
+    rollups = {
+        'company': company,
+        'run_id': run_id,
+        'generated_at': datetime.now().isoformat(),
+        'totals': {
+            'documents': len(documents_df),
+            'posts': int(by_text_type.get('post', 0)),
+            'comments': int(by_text_type.get('comment', 0)),
+            'articles': int(by_text_type.get('article', 0))
+        },
+        'by_text_type': {text_type: int(count) for text_type, count in by_text_type.items()},
+        'by_sentiment': {label: int(count) for label, count in documents_df['sentiment'].value_counts().items()},
+        'by_topic': [],
+        'by_source': [],
+        'weekly': []
+    }
+
+    # Topic sizes with their sentiment mix
+    for topic, group in documents_df.dropna(subset=['topic']).groupby('topic'):
+        sentiment_counts = group['sentiment'].value_counts()
+        rollups['by_topic'].append({
+            'topic': int(topic),
+            'count': len(group),
+            'sentiment': {label: int(sentiment_counts.get(label, 0)) for label in SENTIMENT_LABELS}
+        })
+    rollups['by_topic'].sort(key=lambda item: item['count'], reverse=True)
+
+    # Per-source counts in the format of the data-sources endpoint
+    for source, group in documents_df.groupby('source'):
+        last_updated = group['created_at'].max()
+        rollups['by_source'].append({
+            'source': source,
+            'name': SOURCE_LABELS.get(source, source),
+            'post_count': int((group['text_type'] != 'comment').sum()),
+            'comment_count': int((group['text_type'] == 'comment').sum()),
+            'sentiment_distribution': _percentages(group['sentiment'].value_counts()),
+            'last_updated': last_updated.isoformat() if pd.notna(last_updated) else None
+        })
+
+    # Weekly volume and sentiment of dated documents
+    dated = documents_df.dropna(subset=['created_at'])
+    if not dated.empty:
+        week_start = dated['created_at'].dt.tz_localize(None).dt.to_period('W-SUN').dt.start_time
+        for week, group in dated.groupby(week_start):
+            sentiment_counts = group['sentiment'].value_counts()
+            mean_score = group['sentiment_score'].mean()
+            rollups['weekly'].append({
+                'week_start': week.date().isoformat(),
+                'documents': len(group),
+                'comments': int((group['text_type'] == 'comment').sum()),
+                **{label: int(sentiment_counts.get(label, 0)) for label in SENTIMENT_LABELS},
+                'mean_sentiment_score': round(float(mean_score), 4) if pd.notna(mean_score) else None
+            })
+
+    return rollups
+
+def publish_rollups(company, run_id, company_results_dir, documents, run_dir=None):
+    """
+    Save a run's rollups in the company's results directory.
+
+    Args:
+        company: Company name
+        run_id: Identifier of the run
+        company_results_dir: Path to data/nlp_results/<company>
+        documents: Joined documents of the run
+        run_dir: Directory of the run's saved results, to keep a copy with them
+
+    Returns:
+        Path to the published rollups file
+    """
+    rollups = compute_rollups(documents, company, run_id)
+
+    if run_dir is not None:
+        with open(Path(run_dir) / ROLLUPS_FILE, 'w', encoding='utf-8') as f:
+            json.dump(rollups, f, indent=2)
+
+    output_path = Path(company_results_dir) / ROLLUPS_FILE
+    tmp_path = output_path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(rollups, f, indent=2)
+    os.replace(tmp_path, output_path)
+
+    logger.info(f"Saved rollups of {len(documents)} documents to {output_path}")
+    return output_path
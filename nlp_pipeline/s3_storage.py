@@ -0,0 +1,272 @@
+import os
+import math
+import hashlib
+import logging
+import argparse
+import mimetypes
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# Key prefix of the per-company result folders in the bucket
+RESULTS_PREFIX = 'data/nlp_results/'
+
+def s3_etag(file_path, multipart_threshold=8 * MB, multipart_chunksize=8 * MB) -> str:
+    """
+    Compute the ETag S3 gives a file uploaded with the given transfer settings, without uploading it.
+    Single-part uploads get the MD5 of the file; multipart uploads get the MD5 of the parts' MD5s
+    followed by the number of parts. (Objects encrypted with SSE-KMS get other ETags, and are always
+    uploaded again.)
+
+    Args:
+        file_path: Path to the file
+        multipart_threshold: Size from which the file is uploaded in parts
+        multipart_chunksize: Size of each part
+
+    Returns:
+        ETag, quoted as S3 returns it
+    """
+    size = os.path.getsize(file_path)
+
+    with open(file_path, 'rb') as f:
+        if size < multipart_threshold:
+            md5 = hashlib.md5()
+            for chunk in iter(lambda: f.read(MB), b''):
+                md5.update(chunk)
+            return f'"{md5.hexdigest()}"'
+
+        part_digests = []
+        for _ in range(math.ceil(size / multipart_chunksize)):
+            md5 = hashlib.md5()
+            remaining = multipart_chunksize
+            while remaining > 0:
+                chunk = f.read(min(MB, remaining))
+                if not chunk:
+                    break
+                md5.update(chunk)
+                remaining -= len(chunk)
+            part_digests.append(md5.digest())
+
+    return f'"{hashlib.md5(b"".join(part_digests)).hexdigest()}-{len(part_digests)}"'
+
+class S3Storage:
+    """
+    Result storage in an S3 bucket (or any S3-compatible service, such as MinIO).
+    Listings follow continuation tokens, and directories are uploaded file by file in parallel,
+    with multipart uploads for large files. A file whose ETag in the bucket matches its local
+    content is skipped, so publishing a company again only sends the files that changed.
+    """
+
+    def __init__(self, bucket, region=None, endpoint_url=None, client=None, max_workers=8,
+                 multipart_threshold=8 * MB, multipart_chunksize=8 * MB):
+        """
+        Initialize the storage.
+
+        Args:
+            bucket: Bucket name
+            region: AWS region of the bucket
+            endpoint_url: URL of an S3-compatible service (e.g. http://localhost:9000 for MinIO)
+            client: boto3 S3 client to use instead of creating one (e.g. from Airflow's S3Hook)
+            max_workers: Number of files uploaded at once
+            multipart_threshold: Size in bytes from which files are uploaded in parts
+            multipart_chunksize: Size in bytes of each part
+        """
+        # boto3 takes a noticeable part of process startup, so it is only imported once S3 is used
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+        except ImportError:
+            boto3 = None
+            TransferConfig = None
+
+        if client is None:
+            if boto3 is None:
+                raise ImportError("boto3 is required for S3 storage. Install it with 'pip install boto3'.")
+            client = boto3.client('s3', region_name=region, endpoint_url=endpoint_url)
+
+        self.bucket = bucket
+        self.client = client
+        self.max_workers = max_workers
+        self.multipart_threshold = multipart_threshold
+        self.multipart_chunksize = multipart_chunksize
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_chunksize,
+            max_concurrency=max(1, max_workers // 2)
+        ) if TransferConfig is not None else None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], client=None):
+        """
+        Create the storage from the 's3' section of config.json.
+
+        Args:
+            config: Configuration dictionary
+            client: boto3 S3 client to use instead of creating one
+
+        Returns:
+            S3Storage
+        """
+        s3_config = config.get('s3', {})
+        return cls(
+            s3_config.get('bucket', 'repusense-results'),
+            region=s3_config.get('region'),
+            endpoint_url=s3_config.get('endpoint_url'),
+            client=client,
+            max_workers=s3_config.get('upload_workers', 8),
+            multipart_threshold=int(s3_config.get('multipart_threshold_mb', 8) * MB),
+            multipart_chunksize=int(s3_config.get('multipart_chunksize_mb', 8) * MB)
+        )
+
+    def list_prefixes(self, prefix) -> List[str]:
+        """
+        List the "folders" directly under a prefix.
+
+        Args:
+            prefix: Key prefix ending with '/'
+
+        Returns:
+            Folder names, without the prefix or the trailing '/'
+        """
+        names = []
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix, Delimiter='/'):
+            for common_prefix in page.get('CommonPrefixes', []):
+                name = common_prefix['Prefix'][len(prefix):].rstrip('/')
+                if name:
+                    names.append(name)
+        return names
+
+    def list_companies(self) -> List[str]:
+        """List the companies that have results in the bucket."""
+        return self.list_prefixes(RESULTS_PREFIX)
+
+    def list_objects(self, prefix) -> Dict[str, str]:
+        """
+        List every object under a prefix.
+
+        Args:
+            prefix: Key prefix
+
+        Returns:
+            Dictionary mapping object keys to their ETags
+        """
+        objects = {}
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for item in page.get('Contents', []):
+                objects[item['Key']] = item['ETag']
+        return objects
+
+    def _upload_file(self, file_path: Path, key, remote_etag):
+        if remote_etag is not None and remote_etag == s3_etag(file_path, self.multipart_threshold, self.multipart_chunksize):
+            return False
+
+        extra_args = {}
+        content_type, _ = mimetypes.guess_type(file_path.name)
+        if content_type:
+            extra_args['ContentType'] = content_type
+
+        self.client.upload_file(str(file_path), self.bucket, key, ExtraArgs=extra_args, Config=self.transfer_config)
+        return True
+
+    def upload_directory(self, local_dir, prefix, exclude=None) -> Dict[str, Any]:
+        """
+        Upload every file of a directory under a key prefix, skipping unchanged files.
+
+        Args:
+            local_dir: Directory to upload
+            prefix: Key prefix of the uploaded files (e.g. 'data/nlp_results/inwi/')
+            exclude: Names of files (relative to local_dir) not to upload
+
+        Returns:
+            Dictionary with the number of files uploaded and skipped, and the bytes uploaded
+
+        Raises:
+            RuntimeError: If some files could not be uploaded (after the others finished)
+        """
+        local_dir = Path(local_dir)
+        prefix = prefix if prefix.endswith('/') else f"{prefix}/"
+
+        remote = self.list_objects(prefix)
+        exclude = set(exclude or [])
+        files = [
+            path for path in sorted(local_dir.rglob('*'))
+            if path.is_file() and path.relative_to(local_dir).as_posix() not in exclude
+        ]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {}
+            for path in files:
+                key = prefix + path.relative_to(local_dir).as_posix()
+                futures[executor.submit(self._upload_file, path, key, remote.get(key))] = (path, key)
+
+            summary = {'uploaded': 0, 'skipped': 0, 'bytes': 0}
+            failed = []
+            for future, (path, key) in futures.items():
+                try:
+                    uploaded = future.result()
+                except Exception as e:
+                    logger.error(f"Error uploading {path} to s3://{self.bucket}/{key}: {str(e)}")
+                    failed.append(key)
+                    continue
+
+                if uploaded:
+                    summary['uploaded'] += 1
+                    summary['bytes'] += path.stat().st_size
+                else:
+                    summary['skipped'] += 1
+
+        if failed:
+            raise RuntimeError(f"Failed to upload {len(failed)} of {len(files)} files to s3://{self.bucket}/{prefix}")
+
+        logger.info(
+            f"Uploaded {local_dir} to s3://{self.bucket}/{prefix}: {summary['uploaded']} files uploaded "
+            f"({summary['bytes'] / MB:.1f} MB), {summary['skipped']} unchanged"
+        )
+        return summary
+
+    def upload_company_results(self, company, company_results_dir) -> Dict[str, Any]:
+        """
+        Upload the results folder of a company to data/nlp_results/<company>/.
+
+        Args:
+            company: Company name
+            company_results_dir: Local results folder of the company
+
+        Returns:
+            Upload summary (see upload_directory)
+        """
+        return self.upload_directory(company_results_dir, f"{RESULTS_PREFIX}{company}/")
+
+def main():
+    parser = argparse.ArgumentParser(description='List and upload RepuSense results in S3')
+    parser.add_argument('--bucket', type=str, default='repusense-results', help='Bucket name')
+    parser.add_argument('--region', type=str, help='AWS region of the bucket')
+    parser.add_argument('--endpoint-url', type=str, help='URL of an S3-compatible service such as MinIO')
+    parser.add_argument('--workers', type=int, default=8, help='Number of files uploaded at once')
+    parser.add_argument('--company', type=str, action='append',
+                        help='Company whose results are uploaded (repeatable); lists the companies in the bucket if omitted')
+    parser.add_argument('--results-dir', type=str, default=str(Path(__file__).parent.parent / "data" / "nlp_results"),
+                        help='Local results directory')
+    args = parser.parse_args()
+
+    storage = S3Storage(args.bucket, region=args.region, endpoint_url=args.endpoint_url, max_workers=args.workers)
+
+    if not args.company:
+        for company in storage.list_companies():
+            print(company)
+        return
+
+    for company in args.company:
+        summary = storage.upload_company_results(company, Path(args.results_dir) / company)
+        print(f"{company}: {summary['uploaded']} uploaded, {summary['skipped']} unchanged, {summary['bytes']} bytes")
+
+if __name__ == "__main__":
+    main()
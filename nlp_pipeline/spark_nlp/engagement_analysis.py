@@ -5,7 +5,11 @@ import logging
 import pandas as pd
 from pathlib import Path
 from typing import List, Dict, Optional, Union, Any
-import plotly.express as px
+
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from nlp_pipeline import instrumentation
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -13,7 +17,7 @@ logger = logging.getLogger(__name__)
 
 class EngagementAnalyzer:
     """
-    Class to analyze comment engagement for Reddit posts.
+    Class to analyze comment engagement for Reddit posts and news articles.
     """
     
     def __init__(self, output_dir=None, company_name=None):
@@ -104,7 +108,10 @@ class EngagementAnalyzer:
             DataFrame with engagement analysis
         """
         # Create a copy of the input DataFrame with relevant columns
-        result_df = data_df[['post_id', 'post_text', 'comment_count']].copy()
+        columns = ['post_id', 'post_text', 'comment_count']
+        if 'source' in data_df.columns:
+            columns.append('source')
+        result_df = data_df[columns].copy()
         
         # Sort by comment count in descending order
         result_df = result_df.sort_values('comment_count', ascending=False).reset_index(drop=True)
@@ -131,10 +138,13 @@ class EngagementAnalyzer:
         # Create a list of dictionaries for the API format
         api_format = []
         for _, row in data_df.iterrows():
-            api_format.append({
+            item = {
                 "post_id": int(row['post_id']),
                 "comment_count": int(row['comment_count'])
-            })
+            }
+            if 'source' in row:
+                item["source"] = row['source']
+            api_format.append(item)
         
         # Save to file
         with open(output_path, 'w', encoding='utf-8') as f:
@@ -155,6 +165,8 @@ class EngagementAnalyzer:
         Returns:
             Path to the saved file
         """
+        import plotly.express as px
+        
         output_path = self.output_dir / filename
         
         try:
@@ -198,6 +210,8 @@ class EngagementAnalyzer:
         Returns:
             Path to the saved file
         """
+        import plotly.express as px
+        
         output_path = self.output_dir / filename
         
         try:
@@ -221,32 +235,39 @@ class EngagementAnalyzer:
             logger.error(f"Error creating engagement distribution visualization: {str(e)}")
             raise
     
-    def run_engagement_analysis(self, data_path):
+    def run_engagement_analysis(self, data_path, visualize=False):
         """
         Run the complete engagement analysis pipeline.
         
         Args:
             data_path: Path to the preprocessed posts data
+            visualize: Also render the engagement charts (otherwise they are rendered on demand, see nlp_pipeline.visualizations)
             
         Returns:
             Dictionary with paths to all output files
         """
         # Load the data
-        data_df = self.load_data(data_path)
+        with instrumentation.timer('load'):
+            data_df = self.load_data(data_path)
+        instrumentation.count('documents', len(data_df))
         
         # Analyze engagement
-        result_df = self.analyze_engagement(data_df)
+        with instrumentation.timer('analyze'):
+            result_df = self.analyze_engagement(data_df)
         
         # Save the results
         results = {}
-        results['engagement_results'] = self.save_engagement_results(result_df)
-        results['top_engaged_posts'] = self.visualize_top_engaged_posts(result_df)
-        results['engagement_distribution'] = self.visualize_engagement_distribution(result_df)
+        with instrumentation.timer('save'):
+            results['engagement_results'] = self.save_engagement_results(result_df)
+            
+            # Save the full results
+            output_path = self.output_dir / "engagement_analysis.json"
+            result_df.to_json(output_path, orient='records', indent=2)
+            results['engagement_analysis'] = output_path
         
-        # Save the full results
-        output_path = self.output_dir / "engagement_analysis.json"
-        result_df.to_json(output_path, orient='records', indent=2)
-        results['engagement_analysis'] = output_path
+        if visualize:
+            results['top_engaged_posts'] = self.visualize_top_engaged_posts(result_df)
+            results['engagement_distribution'] = self.visualize_engagement_distribution(result_df)
         
         logger.info("Engagement analysis complete")
         return results
@@ -1,4 +1,3 @@
-from io import BytesIO
 import os
 import sys
 import json
@@ -7,11 +6,12 @@ import numpy as np
 import pandas as pd
 from pathlib import Path
 from typing import List, Dict, Optional, Union, Any
-from keybert import KeyBERT
-from sentence_transformers import SentenceTransformer
-import matplotlib.pyplot as plt
 from collections import Counter
-from wordcloud import WordCloud
+
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from nlp_pipeline import instrumentation
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -22,6 +22,8 @@ class KeywordExtractor:
     Class to extract keywords from Reddit data using KeyBERT.
     """
     
+    MODEL_NAME = "all-MiniLM-L6-v2"
+    
     def __init__(self, output_dir=None, company_name=None):
         """
         Initialize the keyword extractor.
@@ -106,9 +108,11 @@ class KeywordExtractor:
         """
         Initialize the KeyBERT model.
         """
+        from keybert import KeyBERT
+        
         try:
             # Initialize KeyBERT with a sentence transformer model
-            self.model = KeyBERT(model="all-MiniLM-L6-v2")
+            self.model = KeyBERT(model=self.MODEL_NAME)
             
             logger.info("Successfully initialized KeyBERT model")
         
@@ -138,13 +142,15 @@ class KeywordExtractor:
         
         try:
             # Extract keywords
-            keywords = self.model.extract_keywords(
-                text,
-                keyphrase_ngram_range=ngram_range,
-                stop_words='english',
-                top_n=top_n,
-                min_df=min_df
-            )
+            with instrumentation.timer('infer'):
+                keywords = self.model.extract_keywords(
+                    text,
+                    keyphrase_ngram_range=ngram_range,
+                    stop_words='english',
+                    top_n=top_n,
+                    min_df=min_df
+                )
+            instrumentation.count('documents')
             
             # Return just the keywords (not scores)
             return [keyword for keyword, _ in keywords]
@@ -153,13 +159,14 @@ class KeywordExtractor:
             logger.warning(f"Error extracting keywords from text: {str(e)}")
             return []
     
-    def extract_keywords_batch(self, data_df, top_n=5):
+    def extract_keywords_batch(self, data_df, top_n=5, progress_callback=None):
         """
         Extract keywords for all texts in the data.
         
         Args:
             data_df: DataFrame with texts to analyze
             top_n: Number of top keywords to extract per text
+            progress_callback: Function called as progress_callback(processed, total) after each text
             
         Returns:
             DataFrame with keyword extraction results
@@ -194,6 +201,9 @@ class KeywordExtractor:
             except Exception as e:
                 logger.warning(f"Error extracting keywords for text {i}: {str(e)}")
                 keywords_list.append([])
+            
+            if progress_callback is not None:
+                progress_callback(len(keywords_list), len(result_df))
         
         # Add keywords to the DataFrame
         result_df['keywords'] = keywords_list
@@ -220,10 +230,13 @@ class KeywordExtractor:
             if not row['keywords'] or len(row['keywords']) == 0:
                 continue
                 
-            api_format.append({
+            item = {
                 "post_id": int(row['post_id']),
                 "keywords": row['keywords']
-            })
+            }
+            if 'source' in row:
+                item["source"] = row['source']
+            api_format.append(item)
         
         # Save to file
         with open(output_path, 'w', encoding='utf-8') as f:
@@ -279,20 +292,25 @@ class KeywordExtractor:
         logger.info(f"Successfully saved word cloud data to: {output_path}")
         return output_path
     
-    def create_word_cloud(self, data_df, max_words=100):
+    def create_word_cloud(self, data_df=None, max_words=100, filename="wordcloud.png", word_cloud_data=None):
         """
         Create a word cloud visualization of keywords.
         
         Args:
             data_df: DataFrame with keyword extraction results
             max_words: Maximum number of words to include in the word cloud
+            filename: Name for the output file
+            word_cloud_data: Keyword frequencies saved by save_word_cloud_data, used instead of data_df
             
         Returns:
             Path to the saved image file
         """
+        from wordcloud import WordCloud
+        
         try:
             # Get word cloud data (keyword frequencies)
-            word_cloud_data = self.prepare_word_cloud_data(data_df)
+            if word_cloud_data is None:
+                word_cloud_data = self.prepare_word_cloud_data(data_df)
             
             # Create a dictionary of word:frequency for WordCloud
             word_freq = {item["word"]: item["frequency"] for item in word_cloud_data}
@@ -311,65 +329,60 @@ class KeywordExtractor:
             # Generate the word cloud
             wc.generate_from_frequencies(word_freq)
             
-            # Save as image first
-            img_path = self.output_dir / "wordcloud.png"
+            # Save as image
+            img_path = self.output_dir / filename
             wc.to_file(str(img_path))
-            logger.info(f"Saved word cloud image to: {img_path}")
-            
-            # Create a plotly figure with the word cloud image
-            plt.figure(figsize=(10, 5))
-            plt.imshow(wc, interpolation="bilinear")
-            plt.axis("off")
             
-            # Save to a BytesIO object
-            img_buf = BytesIO()
-            plt.savefig(img_buf, format='png', bbox_inches='tight', pad_inches=0)
-            img_buf.seek(0)
-            plt.close()
-            
-            logger.info(f"Successfully saved word cloud visualization to: {self.output_dir}")
+            logger.info(f"Successfully saved word cloud visualization to: {img_path}")
             return img_path
         
         except Exception as e:
             logger.error(f"Error creating word cloud visualization: {str(e)}")
             raise
     
-    def run_keyword_extraction(self, data_path, top_n=5):
+    def run_keyword_extraction(self, data_path, top_n=5, progress_callback=None, visualize=False):
         """
         Run the complete keyword extraction pipeline.
         
         Args:
             data_path: Path to the preprocessed data
             top_n: Number of top keywords to extract per text
+            progress_callback: Function called as progress_callback(processed, total) while texts are processed
+            visualize: Also render the word cloud (otherwise it is rendered on demand, see nlp_pipeline.visualizations)
             
         Returns:
             Dictionary with paths to all output files
         """
         # Load the data
-        data_df = self.load_data(data_path)
+        with instrumentation.timer('load'):
+            data_df = self.load_data(data_path)
         
         # Initialize the model
-        self.initialize_model()
+        with instrumentation.timer('load_model'):
+            self.initialize_model()
+        instrumentation.snapshot('model_loaded')
         
         # Extract keywords
-        result_df = self.extract_keywords_batch(data_df, top_n=top_n)
-        
-        # Save keyword extraction results
-        keyword_results_path = self.save_keyword_results(result_df)
-        
-        # Save word cloud data
-        word_cloud_data_path = self.save_word_cloud_data(result_df)
+        result_df = self.extract_keywords_batch(data_df, top_n=top_n, progress_callback=progress_callback)
+        instrumentation.snapshot('analyzed')
         
-        # Create word cloud visualization
-        wordcloud_image_path = self.create_word_cloud(result_df)
+        with instrumentation.timer('save'):
+            # Save keyword extraction results
+            keyword_results_path = self.save_keyword_results(result_df)
+            
+            # Save word cloud data
+            word_cloud_data_path = self.save_word_cloud_data(result_df)
         
         results = {
             'keyword_df': result_df,
             'keyword_results': keyword_results_path,
-            'word_cloud_data': word_cloud_data_path,
-            'wordcloud_image': wordcloud_image_path
+            'word_cloud_data': word_cloud_data_path
         }
         
+        # Create word cloud visualization
+        if visualize:
+            results['wordcloud_image'] = self.create_word_cloud(result_df)
+        
         logger.info("Keyword extraction completed successfully")
         return results
 
@@ -381,7 +394,7 @@ if __name__ == "__main__":
     nlp_data_path = Path(__file__).parent.parent.parent / "data" / "processed_data" / "inwi" / "nlp_ready_data.json"
     
     if nlp_data_path.exists():
-        results = keyword_extractor.run_keyword_extraction(nlp_data_path)
+        results = keyword_extractor.run_keyword_extraction(nlp_data_path, visualize=True)
         print("Keyword extraction results:")
         for key, path in results.items():
             print(f"- {key}: {path}")
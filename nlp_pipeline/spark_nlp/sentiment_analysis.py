@@ -4,12 +4,13 @@ import json
 import logging
 import numpy as np
 import pandas as pd
-import torch
 from pathlib import Path
 from typing import List, Dict, Optional, Union, Any
-from transformers import AutoModelForSequenceClassification, AutoTokenizer
-import matplotlib.pyplot as plt
-import plotly.express as px
+
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from nlp_pipeline import instrumentation
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -20,6 +21,9 @@ class SentimentAnalyzer:
     Class to perform sentiment analysis on Reddit data using the CardiffNLP twitter-roberta-base-sentiment model.
     """
     
+    MODEL_NAME = "cardiffnlp/twitter-roberta-base-sentiment"
+    SENTIMENT_LABELS = {0: "negative", 1: "neutral", 2: "positive"}
+    
     def __init__(self, output_dir=None, company_name=None):
         """
         Initialize the sentiment analyzer.
@@ -61,8 +65,9 @@ class SentimentAnalyzer:
         # Initialize model
         self.model = None
         self.tokenizer = None
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.sentiment_labels = {0: "negative", 1: "neutral", 2: "positive"}
+        # Set when the model is loaded, so torch is only imported by processes that score texts
+        self.device = None
+        self.sentiment_labels = dict(self.SENTIMENT_LABELS)
     
     def load_data(self, data_path):
         """
@@ -107,9 +112,13 @@ class SentimentAnalyzer:
         """
         Initialize the sentiment analysis model.
         """
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+        
         try:
             # Load model and tokenizer
-            model_name = "cardiffnlp/twitter-roberta-base-sentiment"
+            self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+            model_name = self.MODEL_NAME
             self.tokenizer = AutoTokenizer.from_pretrained(model_name)
             self.model = AutoModelForSequenceClassification.from_pretrained(model_name)
             self.model.to(self.device)
@@ -137,6 +146,8 @@ class SentimentAnalyzer:
             logger.info("Model not initialized. Initializing...")
             self.initialize_model()
         
+        import torch
+        
         try:
             # Truncate text if too long (to avoid exceeding model max length)
             max_length = 512
@@ -144,13 +155,16 @@ class SentimentAnalyzer:
                 text = text[:max_length * 4]
             
             # Tokenize and get sentiment
-            inputs = self.tokenizer(text, return_tensors="pt", truncation=True, max_length=max_length).to(self.device)
-            with torch.no_grad():
-                outputs = self.model(**inputs)
+            with instrumentation.timer('tokenize'):
+                inputs = self.tokenizer(text, return_tensors="pt", truncation=True, max_length=max_length).to(self.device)
+            instrumentation.count('tokens', inputs['input_ids'].shape[-1])
             
-            # Get probabilities
-            probs = torch.nn.functional.softmax(outputs.logits, dim=-1)
-            probs = probs.cpu().numpy()[0]
+            with instrumentation.timer('infer'), torch.no_grad():
+                outputs = self.model(**inputs)
+                
+                # Get probabilities
+                probs = torch.nn.functional.softmax(outputs.logits, dim=-1)
+                probs = probs.cpu().numpy()[0]
             
             # Get predicted sentiment
             sentiment_idx = np.argmax(probs)
@@ -163,13 +177,14 @@ class SentimentAnalyzer:
             logger.warning(f"Error analyzing sentiment for text: {str(e)}")
             return {"sentiment": "neutral", "score": 0.5}
     
-    def analyze_batch(self, texts, batch_size=16):
+    def analyze_batch(self, texts, batch_size=16, progress_callback=None):
         """
         Analyze sentiment for a batch of texts.
         
         Args:
             texts: List of texts to analyze
             batch_size: Size of batches for processing
+            progress_callback: Function called as progress_callback(processed, total) after each batch
             
         Returns:
             List of sentiment results (dictionaries with sentiment and score)
@@ -184,18 +199,23 @@ class SentimentAnalyzer:
             batch_texts = texts[i:i+batch_size]
             batch_results = [self.analyze_sentiment(text) for text in batch_texts]
             results.extend(batch_results)
+            instrumentation.count('documents', len(batch_texts))
             
             if (i + batch_size) % 100 == 0 or i + batch_size >= len(texts):
                 logger.info(f"Processed {min(i + batch_size, len(texts))}/{len(texts)} texts")
+            
+            if progress_callback is not None:
+                progress_callback(min(i + batch_size, len(texts)), len(texts))
         
         return results
     
-    def analyze_data(self, data_df):
+    def analyze_data(self, data_df, progress_callback=None):
         """
         Analyze sentiment for all texts in the data.
         
         Args:
             data_df: DataFrame with texts to analyze
+            progress_callback: See analyze_batch
             
         Returns:
             DataFrame with sentiment analysis results
@@ -208,7 +228,7 @@ class SentimentAnalyzer:
         
         # Analyze sentiment
         logger.info(f"Analyzing sentiment for {len(texts)} texts")
-        sentiment_results = self.analyze_batch(texts)
+        sentiment_results = self.analyze_batch(texts, progress_callback=progress_callback)
         
         # Add sentiment results to the DataFrame
         result_df['sentiment'] = [result['sentiment'] for result in sentiment_results]
@@ -246,16 +266,22 @@ class SentimentAnalyzer:
         output_path = self.output_dir / filename
         
         # Select relevant columns
-        result_df = data_df[['post_id', 'text_type', 'sentiment', 'sentiment_score']]
+        columns = ['post_id', 'text_type', 'sentiment', 'sentiment_score']
+        if 'source' in data_df.columns:
+            columns.append('source')
+        result_df = data_df[columns]
         
         # Create a list of dictionaries for the API format
         api_format = []
         for _, row in result_df.iterrows():
-            api_format.append({
+            item = {
                 "post_id": int(row['post_id']),
                 "sentiment": row['sentiment'],
                 "score": float(row['sentiment_score'])
-            })
+            }
+            if 'source' in row:
+                item["source"] = row['source']
+            api_format.append(item)
         
         # Save to file
         with open(output_path, 'w', encoding='utf-8') as f:
@@ -275,6 +301,8 @@ class SentimentAnalyzer:
         Returns:
             Path to the saved file
         """
+        import plotly.express as px
+        
         output_path = self.output_dir / filename
         
         try:
@@ -303,34 +331,43 @@ class SentimentAnalyzer:
             logger.error(f"Error creating sentiment distribution visualization: {str(e)}")
             raise
     
-    def run_sentiment_analysis(self, data_path):
+    def run_sentiment_analysis(self, data_path, progress_callback=None, visualize=False):
         """
         Run the complete sentiment analysis pipeline.
         
         Args:
             data_path: Path to the preprocessed data
+            progress_callback: Function called as progress_callback(processed, total) while texts are analyzed
+            visualize: Also render the sentiment chart (otherwise it is rendered on demand, see nlp_pipeline.visualizations)
             
         Returns:
             Dictionary with paths to all output files
         """
         # Load the data
-        data_df = self.load_data(data_path)
+        with instrumentation.timer('load'):
+            data_df = self.load_data(data_path)
         
         # Initialize the model
-        self.initialize_model()
+        with instrumentation.timer('load_model'):
+            self.initialize_model()
+        instrumentation.snapshot('model_loaded')
         
         # Analyze sentiment
-        result_df = self.analyze_data(data_df)
+        result_df = self.analyze_data(data_df, progress_callback=progress_callback)
+        instrumentation.snapshot('analyzed')
         
         # Save the results
         results = {}
-        results['sentiment_results'] = self.save_sentiment_results(result_df)
-        results['sentiment_visualization'] = self.visualize_sentiment_distribution(result_df)
+        with instrumentation.timer('save'):
+            results['sentiment_results'] = self.save_sentiment_results(result_df)
+            
+            # Save the full results
+            output_path = self.output_dir / "documents_with_sentiment.json"
+            result_df.to_json(output_path, orient='records', indent=2)
+            results['documents_with_sentiment'] = output_path
         
-        # Save the full results
-        output_path = self.output_dir / "documents_with_sentiment.json"
-        result_df.to_json(output_path, orient='records', indent=2)
-        results['documents_with_sentiment'] = output_path
+        if visualize:
+            results['sentiment_visualization'] = self.visualize_sentiment_distribution(result_df)
         
         logger.info("Sentiment analysis complete")
         return results
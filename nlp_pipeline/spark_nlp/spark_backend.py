@@ -0,0 +1,472 @@
+import os
+import sys
+import json
+import logging
+import argparse
+import pandas as pd
+from pathlib import Path
+from typing import Dict, List, Iterator, Optional, Any
+from pyspark.sql import SparkSession, DataFrame, Window
+from pyspark.sql import functions as F
+from pyspark.sql import types as T
+from pyspark.sql.functions import pandas_udf
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from nlp_pipeline.data_processing.data_preprocessor import (
+    DOCUMENT_COLUMNS, RedditDataPreprocessor, clean_text, detect_source, news_article_text, find_source_files,
+    merge_news_datasets
+)
+
+# Schema of the flattened raw rows, before cleaning
+RAW_SCHEMA = T.StructType([
+    T.StructField("company", T.StringType(), False),
+    T.StructField("file_idx", T.IntegerType(), False),
+    T.StructField("post_index", T.IntegerType(), False),
+    T.StructField("source", T.StringType(), False),
+    T.StructField("text_type", T.StringType(), False),
+    T.StructField("comment_index", T.IntegerType(), True),
+    T.StructField("raw_text", T.StringType(), True),
+    T.StructField("created_at", T.StringType(), True),
+])
+
+# Texts scored per model call inside a pandas UDF batch
+SENTIMENT_BATCH_SIZE = 32
+
+# Models loaded once per Python worker and reused by every task it runs
+_MODEL_CACHE = {}
+
+def _get_sentiment_model():
+    """Load the sentiment model on first use in this worker."""
+    if 'sentiment' not in _MODEL_CACHE:
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+        from nlp_pipeline.spark_nlp.sentiment_analysis import SentimentAnalyzer
+
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        tokenizer = AutoTokenizer.from_pretrained(SentimentAnalyzer.MODEL_NAME)
+        model = AutoModelForSequenceClassification.from_pretrained(SentimentAnalyzer.MODEL_NAME)
+        model.to(device)
+        model.eval()
+
+        _MODEL_CACHE['sentiment'] = (tokenizer, model, device, SentimentAnalyzer.SENTIMENT_LABELS)
+        logger.info(f"Loaded sentiment model in worker {os.getpid()} on {device}")
+
+    return _MODEL_CACHE['sentiment']
+
+def _get_keyword_model():
+    """Load the KeyBERT model on first use in this worker."""
+    if 'keywords' not in _MODEL_CACHE:
+        from keybert import KeyBERT
+        from nlp_pipeline.spark_nlp.keyword_extraction import KeywordExtractor
+
+        _MODEL_CACHE['keywords'] = KeyBERT(model=KeywordExtractor.MODEL_NAME)
+        logger.info(f"Loaded KeyBERT model in worker {os.getpid()}")
+
+    return _MODEL_CACHE['keywords']
+
+def _score_sentiment(texts: pd.Series) -> pd.DataFrame:
+    """Score a batch of texts with the cached sentiment model."""
+    import torch
+
+    tokenizer, model, device, labels = _get_sentiment_model()
+    sentiments = ["neutral"] * len(texts)
+    scores = [0.5] * len(texts)
+
+    # Empty texts keep the neutral default, as in SentimentAnalyzer.analyze_sentiment
+    valid = [(i, text[:512 * 4]) for i, text in enumerate(texts) if isinstance(text, str) and text]
+
+    for start in range(0, len(valid), SENTIMENT_BATCH_SIZE):
+        chunk = valid[start:start + SENTIMENT_BATCH_SIZE]
+        try:
+            inputs = tokenizer(
+                [text for _, text in chunk],
+                return_tensors="pt",
+                truncation=True,
+                max_length=512,
+                padding=True
+            ).to(device)
+            with torch.no_grad():
+                probs = torch.nn.functional.softmax(model(**inputs).logits, dim=-1).cpu().numpy()
+
+            for (i, _), row in zip(chunk, probs):
+                sentiments[i] = labels[int(row.argmax())]
+                scores[i] = float(row.max())
+
+        except Exception as e:
+            logger.warning(f"Error analyzing sentiment for batch: {str(e)}")
+
+    return pd.DataFrame({"sentiment": sentiments, "sentiment_score": scores})
+
+def _extract_keywords(texts: pd.Series, top_n=5) -> pd.Series:
+    """Extract keywords for a batch of texts with the cached KeyBERT model."""
+    model = _get_keyword_model()
+    results = []
+
+    for text in texts:
+        if not text or not isinstance(text, str):
+            results.append([])
+            continue
+        try:
+            keywords = model.extract_keywords(
+                text,
+                keyphrase_ngram_range=(1, 2),
+                stop_words='english',
+                top_n=top_n,
+                min_df=1
+            )
+            results.append([keyword for keyword, _ in keywords])
+        except Exception as e:
+            logger.warning(f"Error extracting keywords from text: {str(e)}")
+            results.append([])
+
+    return pd.Series(results)
+
+@pandas_udf(T.StringType())
+def clean_text_udf(texts: pd.Series) -> pd.Series:
+    return texts.map(clean_text)
+
+@pandas_udf("sentiment string, sentiment_score double")
+def sentiment_udf(batches: Iterator[pd.Series]) -> Iterator[pd.DataFrame]:
+    for texts in batches:
+        yield _score_sentiment(texts)
+
+@pandas_udf(T.ArrayType(T.StringType()))
+def keywords_udf(batches: Iterator[pd.Series]) -> Iterator[pd.Series]:
+    for texts in batches:
+        yield _extract_keywords(texts)
+
+def _file_tasks(company, paths):
+    """
+    Get the flattening tasks of a company's raw files, in file order. Several news files are
+    merged on the driver first, dropping repeated articles as RedditDataPreprocessor does, so
+    both backends see the same articles and assign the same post ids.
+    """
+    news_paths = [Path(path) for path in paths if Path(path).name.startswith("news_")]
+    sources = [str(path) for path in paths if not Path(path).name.startswith("news_")]
+
+    if len(news_paths) > 1:
+        datasets = []
+        for path in news_paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                datasets.append(json.load(f))
+        sources.extend(merge_news_datasets(datasets))
+    else:
+        sources.extend(str(path) for path in news_paths)
+
+    return [(company, file_idx, source) for file_idx, source in enumerate(sources)]
+
+def _flatten_raw_file(task):
+    """
+    Flatten one raw data file (or the data of merged news files) into raw rows, one per post,
+    article or comment. Runs on the executors, so every file is read where it is processed.
+    """
+    company, file_idx, source_data = task
+
+    if isinstance(source_data, str):
+        with open(source_data, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    else:
+        data = source_data
+
+    source = detect_source(data)
+
+    if source == 'news':
+        for i, article in enumerate(data.get('articles', [])):
+            yield (company, file_idx, i, 'news', 'article', None, news_article_text(article), article.get('publishedAt'))
+        return
+
+    for i, post in enumerate(data):
+        created_at = post.get('created_utc')
+        yield (company, file_idx, i, source, 'post', None, post.get('post_text', ''), created_at)
+        for j, comment in enumerate(post.get('comments', [])):
+            if comment:
+                yield (company, file_idx, i, source, 'comment', j, comment, created_at)
+
+class SparkNLPBackend:
+    """
+    Class to run preprocessing, sentiment scoring and keyword extraction with PySpark.
+    Runs in local[*] mode on one machine or against a cluster master, and processes
+    every requested company in one job so a weekly run shares a single set of loaded models.
+    """
+
+    def __init__(self, master=None, app_name="RepuSense", config=None, data_dir=None):
+        """
+        Initialize the Spark backend.
+
+        Args:
+            master: Spark master URL (defaults to the config value or local[*])
+            app_name: Name of the Spark application
+            config: The "spark" section of config.json
+            data_dir: Data directory holding the raw data and receiving the results (defaults to the repository's)
+        """
+        self.base_dir = Path(__file__).parent.parent.parent
+        self.data_dir = Path(data_dir) if data_dir else self.base_dir / "data"
+
+        self.config = config or {}
+        self.master = master or self.config.get('master', "local[*]")
+        self.app_name = self.config.get('app_name', app_name)
+        self.spark = None
+
+    def get_session(self):
+        """
+        Get or create the Spark session.
+
+        Returns:
+            SparkSession
+        """
+        if self.spark is None:
+            builder = (
+                SparkSession.builder
+                .master(self.master)
+                .appName(self.app_name)
+                .config("spark.sql.execution.arrow.pyspark.enabled", "true")
+                .config("spark.sql.execution.arrow.maxRecordsPerBatch", str(self.config.get('arrow_batch_size', 256)))
+                .config("spark.sql.shuffle.partitions", str(self.config.get('shuffle_partitions', 16)))
+                .config("spark.python.worker.reuse", "true")
+            )
+
+            for key, value in self.config.get('options', {}).items():
+                builder = builder.config(key, value)
+
+            self.spark = builder.getOrCreate()
+
+            # In cluster mode the executors need the nlp_pipeline package
+            for py_file in self.config.get('py_files', []):
+                self.spark.sparkContext.addPyFile(py_file)
+
+            logger.info(f"Started Spark session on {self.master}")
+
+        return self.spark
+
+    def load_documents(self, company_files: Dict[str, List[Path]]) -> DataFrame:
+        """
+        Load and preprocess raw files into the unified document schema.
+
+        Args:
+            company_files: Dictionary of company name to raw data files
+
+        Returns:
+            Spark DataFrame with a company column plus the document schema columns
+        """
+        spark = self.get_session()
+
+        tasks = [task for company, paths in company_files.items() for task in _file_tasks(company, paths)]
+
+        raw_rdd = spark.sparkContext.parallelize(tasks, numSlices=max(len(tasks), 1)).flatMap(_flatten_raw_file)
+        raw_df = spark.createDataFrame(raw_rdd, schema=RAW_SCHEMA)
+
+        # Clean texts in parallel
+        cleaned_df = raw_df.withColumn("text", clean_text_udf("raw_text")).drop("raw_text")
+
+        # Post ids follow file order and count skipped posts, like RedditDataPreprocessor
+        post_window = Window.partitionBy("company").orderBy("file_idx", "post_index")
+        posts_df = (
+            cleaned_df.filter(F.col("text_type") != "comment")
+            .withColumn("post_id", F.dense_rank().over(post_window) - 1)
+            .filter(F.col("text") != "")
+        )
+
+        # Comments of skipped posts are dropped along with the post
+        comment_window = Window.partitionBy("company", "post_id").orderBy("comment_index")
+        comments_df = (
+            cleaned_df.filter((F.col("text_type") == "comment") & (F.col("text") != ""))
+            .join(posts_df.select("company", "file_idx", "post_index", "post_id"), ["company", "file_idx", "post_index"])
+            .withColumn("comment_id", F.row_number().over(comment_window) - 1)
+        )
+
+        columns = ["company"] + DOCUMENT_COLUMNS
+        documents_df = (
+            posts_df.withColumn("comment_id", F.lit(None).cast(T.IntegerType())).select(*columns)
+            .unionByName(comments_df.select(*columns))
+        )
+
+        return documents_df
+
+    def score_documents(self, documents_df: DataFrame, sentiment=True, keywords=True) -> DataFrame:
+        """
+        Add sentiment and keyword columns to the documents.
+
+        Args:
+            documents_df: Spark DataFrame in the document schema
+            sentiment: Whether to score sentiment
+            keywords: Whether to extract keywords
+
+        Returns:
+            Spark DataFrame with the requested result columns
+        """
+        spark = self.get_session()
+
+        # Spread documents evenly so every executor core gets model work
+        scored_df = documents_df.repartition(spark.sparkContext.defaultParallelism * 2)
+
+        if sentiment:
+            scored_df = (
+                scored_df.withColumn("_sentiment", sentiment_udf("text"))
+                .withColumn("sentiment", F.col("_sentiment.sentiment"))
+                .withColumn("sentiment_score", F.col("_sentiment.sentiment_score"))
+                .drop("_sentiment")
+            )
+
+        if keywords:
+            scored_df = scored_df.withColumn("keywords", keywords_udf("text"))
+
+        return scored_df
+
+    def save_company_results(self, company_df: pd.DataFrame, company, sentiment=True, keywords=True) -> Dict[str, Any]:
+        """
+        Write one company's results in the same files the pandas analyzers produce.
+
+        Args:
+            company_df: Collected pandas DataFrame of the company's scored documents
+            company: Name of the company
+            sentiment: Whether sentiment results are present
+            keywords: Whether keyword results are present
+
+        Returns:
+            Dictionary with paths to all output files
+        """
+        # Restore document order: each post followed by its comments
+        company_df = company_df.assign(_order=company_df['comment_id'].fillna(-1))
+        company_df = company_df.sort_values(['post_id', '_order']).drop(columns=['_order', 'company']).reset_index(drop=True)
+
+        results = {}
+
+        # Processed data, for the stages that still run on pandas (topics, engagement)
+        preprocessor = RedditDataPreprocessor(processed_dir=self.data_dir / "processed_data" / company, company_name=company)
+        nlp_df = company_df[DOCUMENT_COLUMNS]
+        results['nlp_ready_data'] = preprocessor.save_processed_data(nlp_df, 'nlp_ready_data.json')
+        results['data_sources'] = preprocessor.save_source_summary(nlp_df)
+
+        posts_df = nlp_df[nlp_df['text_type'] != 'comment'][['post_id', 'source', 'text', 'created_at']]
+        comments = nlp_df[nlp_df['text_type'] == 'comment'].groupby('post_id')['text'].apply(list)
+        posts_df = posts_df.rename(columns={'text': 'post_text'})
+        posts_df['comments'] = posts_df['post_id'].map(comments).apply(lambda value: value if isinstance(value, list) else [])
+        posts_df['comment_count'] = posts_df['comments'].apply(len)
+        results['processed_posts'] = preprocessor.save_processed_data(
+            posts_df[['post_id', 'source', 'post_text', 'comments', 'comment_count', 'created_at']], 'processed_posts.json'
+        )
+
+        if sentiment:
+            from nlp_pipeline.spark_nlp.sentiment_analysis import SentimentAnalyzer
+
+            analyzer = SentimentAnalyzer(output_dir=self.data_dir / "nlp_results" / company / "sentiment", company_name=company)
+            sentiment_df = company_df.drop(columns=['keywords'], errors='ignore')
+            results['sentiment_results'] = analyzer.save_sentiment_results(sentiment_df)
+
+            output_path = analyzer.output_dir / "documents_with_sentiment.json"
+            sentiment_df.to_json(output_path, orient='records', indent=2)
+            results['documents_with_sentiment'] = output_path
+
+        if keywords:
+            from nlp_pipeline.spark_nlp.keyword_extraction import KeywordExtractor
+
+            extractor = KeywordExtractor(output_dir=self.data_dir / "nlp_results" / company / "keywords", company_name=company)
+            keyword_df = company_df.drop(columns=['sentiment', 'sentiment_score'], errors='ignore')
+            keyword_df['keywords'] = keyword_df['keywords'].apply(list)
+            results['keyword_results'] = extractor.save_keyword_results(keyword_df)
+            results['word_cloud_data'] = extractor.save_word_cloud_data(keyword_df)
+
+            output_path = extractor.output_dir / "documents_with_keywords.json"
+            keyword_df.to_json(output_path, orient='records', indent=2)
+            results['documents_with_keywords'] = output_path
+
+        logger.info(f"Saved Spark results for {company}")
+        return results
+
+    def run(self, companies: Optional[List[str]] = None, sentiment=True, keywords=True) -> Dict[str, Dict[str, Any]]:
+        """
+        Run preprocessing, sentiment and keyword extraction for several companies in one job.
+
+        Args:
+            companies: Companies to process (defaults to every company with raw data)
+            sentiment: Whether to score sentiment
+            keywords: Whether to extract keywords
+
+        Returns:
+            Dictionary of company name to output file paths
+        """
+        if not companies:
+            storage_dir = self.data_dir / "data_storage"
+            companies = sorted(path.name for path in storage_dir.iterdir() if path.is_dir()) if storage_dir.exists() else []
+
+        company_files = {}
+        for company in companies:
+            files = find_source_files(self.data_dir, company)
+            if files:
+                company_files[company] = files
+            else:
+                logger.warning(f"No raw data found for company: {company}")
+
+        if not company_files:
+            logger.warning("No companies to process")
+            return {}
+
+        logger.info(f"Processing {len(company_files)} companies with Spark: {', '.join(company_files)}")
+
+        documents_df = self.load_documents(company_files)
+        scored_df = self.score_documents(documents_df, sentiment=sentiment, keywords=keywords).cache()
+
+        all_results = {}
+        try:
+            for company in company_files:
+                company_df = scored_df.filter(F.col("company") == company).toPandas()
+                all_results[company] = self.save_company_results(company_df, company, sentiment=sentiment, keywords=keywords)
+        finally:
+            scored_df.unpersist()
+
+        return all_results
+
+    def stop(self):
+        """
+        Stop the Spark session.
+        """
+        if self.spark is not None:
+            self.spark.stop()
+            self.spark = None
+
+def load_spark_config():
+    """Load the "spark" section of config.json."""
+    config_path = Path(__file__).parent.parent.parent / "config.json"
+
+    if config_path.exists():
+        try:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('spark', {})
+        except Exception as e:
+            logger.error(f"Error loading configuration: {str(e)}")
+
+    return {}
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the Spark NLP stages for one or more companies')
+
+    parser.add_argument('--company', type=str, action='append', help='Company to process (repeatable, defaults to all)')
+    parser.add_argument('--master', type=str, help='Spark master URL (default: local[*])')
+    parser.add_argument('--skip-sentiment', action='store_true', help='Skip sentiment analysis')
+    parser.add_argument('--skip-keyword', action='store_true', help='Skip keyword extraction')
+
+    args = parser.parse_args()
+
+    backend = SparkNLPBackend(master=args.master, config=load_spark_config())
+    try:
+        results = backend.run(
+            companies=args.company,
+            sentiment=not args.skip_sentiment,
+            keywords=not args.skip_keyword
+        )
+    finally:
+        backend.stop()
+
+    for company, company_results in results.items():
+        print(f"{company}:")
+        for key, path in company_results.items():
+            print(f"- {key}: {path}")
+
+if __name__ == "__main__":
+    main()
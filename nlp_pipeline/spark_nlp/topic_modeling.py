@@ -6,14 +6,11 @@ import numpy as np
 import pandas as pd
 from pathlib import Path
 from typing import List, Dict, Optional, Union, Any
-from bertopic import BERTopic
-from sklearn.feature_extraction.text import CountVectorizer
-from sentence_transformers import SentenceTransformer
-import matplotlib.pyplot as plt
-import plotly.express as px
-from azure.ai.inference import EmbeddingsClient
-from azure.core.credentials import AzureKeyCredential
-from transformers import pipeline
+
+# Add the parent directory to sys.path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from nlp_pipeline import instrumentation
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -27,6 +24,9 @@ class AzureEmbeddingsBackend:
     
     def __init__(self):
         """Initialize the Azure embeddings backend"""
+        from azure.ai.inference import EmbeddingsClient
+        from azure.core.credentials import AzureKeyCredential
+        
         try:
             # Load config
             config_path = Path(__file__).parent.parent.parent / "config.json"
@@ -198,6 +198,9 @@ class TopicModeler:
             min_topic_size: Minimum size of topics
             nr_topics: Number of topics to reduce to after the initial modeling
         """
+        from bertopic import BERTopic
+        from sklearn.feature_extraction.text import CountVectorizer
+        
         try:
             # Check if we should use Azure embeddings
             use_azure = False
@@ -209,8 +212,7 @@ class TopicModeler:
             
             if use_azure:
                 logger.info("Using Azure embeddings for topic modeling")
-                # Use a fallback SentenceTransformer with the custom Azure embeddings
-                embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
+                # Embeddings come from Azure in fit_transform, so no local embedding model is loaded
                 embeddings_backend = AzureEmbeddingsBackend()
                 
                 # Initialize vectorizer
@@ -231,6 +233,8 @@ class TopicModeler:
                 self.use_custom_embeddings = True
             else:
                 logger.info("Using standard SentenceTransformer for topic modeling")
+                from sentence_transformers import SentenceTransformer
+                
                 # Use standard SentenceTransformer
                 embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
                 
@@ -271,14 +275,17 @@ class TopicModeler:
             if hasattr(self, 'use_custom_embeddings') and self.use_custom_embeddings:
                 # Calculate embeddings using Azure
                 logger.info("Calculating embeddings using Azure...")
-                embeddings = self.embeddings_backend.embed(documents, verbose=True)
+                with instrumentation.timer('embed'):
+                    embeddings = self.embeddings_backend.embed(documents, verbose=True)
                 
                 # Fit the model with pre-calculated embeddings
-                topics, probs = self.model.fit_transform(documents, embeddings=embeddings)
+                with instrumentation.timer('fit'):
+                    topics, probs = self.model.fit_transform(documents, embeddings=embeddings)
                 logger.info(f"Successfully fit BERTopic model on {len(documents)} documents with custom embeddings")
             else:
-                # Use the standard BERTopic approach
-                topics, probs = self.model.fit_transform(documents)
+                # Use the standard BERTopic approach (embedding included)
+                with instrumentation.timer('fit'):
+                    topics, probs = self.model.fit_transform(documents)
                 logger.info(f"Successfully fit BERTopic model on {len(documents)} documents")
             
             return topics, probs
@@ -398,6 +405,39 @@ class TopicModeler:
         logger.info(f"Successfully saved topic distribution to: {output_path}")
         return output_path
     
+    def save_model(self, filename="topic_model.pkl"):
+        """
+        Save the fitted model, so the topic map can be rendered later without fitting it again.
+        The embedding model is left out: the topic map only needs the topic embeddings.
+        
+        Args:
+            filename: Name for the output file
+            
+        Returns:
+            Path to the saved file
+        """
+        if self.model is None:
+            logger.error("Model not initialized or fit. Call initialize_model() and fit_transform() first.")
+            raise ValueError("Model not initialized or fit")
+        
+        output_path = self.output_dir / filename
+        self.model.save(str(output_path), serialization="pickle", save_embedding_model=False)
+        
+        logger.info(f"Successfully saved topic model to: {output_path}")
+        return output_path
+    
+    def load_model(self, model_path):
+        """
+        Load a model saved by save_model.
+        
+        Args:
+            model_path: Path to the saved model
+        """
+        from bertopic import BERTopic
+        
+        self.model = BERTopic.load(str(model_path))
+        logger.info(f"Loaded topic model from: {model_path}")
+    
     def visualize_topics(self, filename="topic_visualization.html"):
         """
         Create an interactive visualization of the topics.
@@ -426,25 +466,29 @@ class TopicModeler:
             logger.error(f"Error creating topic visualization: {str(e)}")
             raise
     
-    def visualize_barchart(self, filename="topic_barchart.html"):
+    def visualize_barchart(self, filename="topic_barchart.html", topic_distribution=None):
         """
         Create a bar chart of topic counts.
         
         Args:
             filename: Name for the output file
+            topic_distribution: Topic counts saved by save_topic_distribution, used instead of the model
             
         Returns:
             Path to the saved file
         """
-        if self.model is None:
+        if topic_distribution is None and self.model is None:
             logger.error("Model not initialized or fit. Call initialize_model() and fit_transform() first.")
             raise ValueError("Model not initialized or fit")
         
+        import plotly.express as px
+        
         output_path = self.output_dir / filename
         
         try:
             # Get topic distribution
-            topic_distribution = self.prepare_topic_distribution()
+            if topic_distribution is None:
+                topic_distribution = self.prepare_topic_distribution()
             
             # Sort by count in descending order
             topic_distribution.sort(key=lambda x: x['count'], reverse=True)
@@ -472,41 +516,52 @@ class TopicModeler:
             logger.error(f"Error creating topic bar chart: {str(e)}")
             raise
     
-    def run_topic_modeling(self, data_path):
+    def run_topic_modeling(self, data_path, visualize=False):
         """
         Run the complete topic modeling pipeline.
         
         Args:
             data_path: Path to the preprocessed data
+            visualize: Also render the topic charts (otherwise they are rendered on demand from the
+                saved model, see nlp_pipeline.visualizations)
             
         Returns:
             Dictionary with paths to all output files
         """
         # Load the data
-        data_df = self.load_data(data_path)
+        with instrumentation.timer('load'):
+            data_df = self.load_data(data_path)
         
         # Extract the documents
         documents = data_df['text'].tolist()
+        instrumentation.count('documents', len(documents))
         
         # Initialize and fit the model
-        self.initialize_model()
+        with instrumentation.timer('load_model'):
+            self.initialize_model()
+        instrumentation.snapshot('model_loaded')
         topics, _ = self.fit_transform(documents)
+        instrumentation.snapshot('fitted')
         
         # Add topic assignments to the data
         data_df['topic'] = topics
         
         # Save the results
         results = {}
-        results['topic_info'] = self.save_topic_info()
-        results['topic_keywords'] = self.save_topic_keywords()
-        results['topic_distribution'] = self.save_topic_distribution()
-        results['topic_visualization'] = self.visualize_topics()
-        results['topic_barchart'] = self.visualize_barchart()
-        
-        # Save the data with topic assignments
-        output_path = self.output_dir / "documents_with_topics.json"
-        data_df.to_json(output_path, orient='records', indent=2)
-        results['documents_with_topics'] = output_path
+        with instrumentation.timer('save'):
+            results['topic_info'] = self.save_topic_info()
+            results['topic_keywords'] = self.save_topic_keywords()
+            results['topic_distribution'] = self.save_topic_distribution()
+            results['topic_model'] = self.save_model()
+            
+            # Save the data with topic assignments
+            output_path = self.output_dir / "documents_with_topics.json"
+            data_df.to_json(output_path, orient='records', indent=2)
+            results['documents_with_topics'] = output_path
+        
+        if visualize:
+            results['topic_visualization'] = self.visualize_topics()
+            results['topic_barchart'] = self.visualize_barchart()
         
         logger.info("Topic modeling complete")
         return results
@@ -0,0 +1,180 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class StageCache:
+    """
+    Content-hash memoization of pipeline stage outputs.
+    A stage's output files are stored under a key derived from the content of its inputs,
+    its model identity, its code and its parameters, so a re-run with identical inputs
+    restores the cached files instead of recomputing them.
+    """
+
+    def __init__(self, cache_dir):
+        """
+        Initialize the stage cache.
+
+        Args:
+            cache_dir: Directory holding the cached stage outputs
+        """
+        self.cache_dir = Path(cache_dir)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # File digests keyed by (path, mtime, size), so a file shared by several stages is hashed once
+        self._digests = {}
+
+    def file_digest(self, file_path):
+        """
+        Compute the SHA-256 hash of a file's content.
+
+        Args:
+            file_path: Path to the file
+
+        Returns:
+            Hex digest
+        """
+        stat = os.stat(file_path)
+        cache_key = (str(file_path), stat.st_mtime_ns, stat.st_size)
+
+        if cache_key not in self._digests:
+            digest = hashlib.sha256()
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            self._digests[cache_key] = digest.hexdigest()
+
+        return self._digests[cache_key]
+
+    def _describe(self, value):
+        """Replace file paths in a value by their content digests, recursively."""
+        if isinstance(value, dict):
+            return {key: self._describe(item) for key, item in sorted(value.items())}
+        if isinstance(value, (list, tuple)):
+            return [self._describe(item) for item in value]
+        if isinstance(value, str) and os.path.isfile(value):
+            return {'sha256': self.file_digest(value)}
+        return value
+
+    def compute_key(self, stage_name, inputs, model=None, params=None, code_paths=None, company=None):
+        """
+        Compute the cache key of a stage run.
+
+        Args:
+            stage_name: Name of the stage
+            inputs: Outputs of the stage's dependencies (file paths are hashed by content)
+            model: Model identity (name and version) used by the stage
+            params: Parameters of the stage
+            code_paths: Source files whose changes should invalidate the cache
+            company: Company the stage runs for (outputs are written in the company's folders)
+
+        Returns:
+            Hex digest identifying the stage run
+        """
+        description = {
+            'stage': stage_name,
+            'company': company,
+            'inputs': self._describe(inputs),
+            'model': model,
+            'params': params or {},
+            'code': {Path(path).name: self.file_digest(path) for path in (code_paths or []) if os.path.isfile(path)}
+        }
+        encoded = json.dumps(description, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _entry_dir(self, stage_name, key):
+        return self.cache_dir / stage_name / key
+
+    def lookup(self, stage_name, key) -> Optional[Dict[str, Any]]:
+        """
+        Restore a cached stage output, if there is one.
+
+        Args:
+            stage_name: Name of the stage
+            key: Cache key from compute_key
+
+        Returns:
+            The stage output, with its files restored in place, or None on a cache miss
+        """
+        manifest_path = self._entry_dir(stage_name, key) / "manifest.json"
+        if not manifest_path.exists():
+            return None
+
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+
+            # Put every cached file back where the stage originally wrote it
+            for output_key, cached_name in manifest['files'].items():
+                target = Path(manifest['output'][output_key])
+                cached_file = manifest_path.parent / cached_name
+
+                if target.exists() and self.file_digest(target) == self.file_digest(cached_file):
+                    continue
+
+                os.makedirs(target.parent, exist_ok=True)
+                tmp_path = target.with_name(target.name + '.tmp')
+                shutil.copyfile(cached_file, tmp_path)
+                os.replace(tmp_path, target)
+
+            logger.info(f"Cache hit for stage {stage_name} ({key[:12]})")
+            return manifest['output']
+
+        except Exception as e:
+            logger.warning(f"Ignoring unusable cache entry for stage {stage_name}: {str(e)}")
+            return None
+
+    def store(self, stage_name, key, output: Dict[str, Any]):
+        """
+        Store a stage output in the cache.
+
+        Args:
+            stage_name: Name of the stage
+            key: Cache key from compute_key
+            output: Stage output (a dictionary whose string values may be file paths)
+        """
+        entry_dir = self._entry_dir(stage_name, key)
+        tmp_dir = entry_dir.with_name(entry_dir.name + '.tmp')
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        files = {}
+        for output_key, value in output.items():
+            if isinstance(value, str) and os.path.isfile(value):
+                # Copy rather than hardlink: analyzers rewrite their output files in place
+                cached_name = f"{output_key}{Path(value).suffix}"
+                shutil.copyfile(value, tmp_dir / cached_name)
+                files[output_key] = cached_name
+
+        with open(tmp_dir / "manifest.json", 'w', encoding='utf-8') as f:
+            json.dump({'output': output, 'files': files}, f, indent=2)
+
+        # Publish the entry atomically
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(tmp_dir, entry_dir)
+
+        logger.info(f"Cached output of stage {stage_name} ({key[:12]})")
+
+    def invalidate(self, stage_names: Optional[List[str]] = None):
+        """
+        Delete cached outputs.
+
+        Args:
+            stage_names: Stages to invalidate (None invalidates every stage)
+        """
+        if stage_names is None:
+            targets = [path for path in self.cache_dir.iterdir() if path.is_dir()]
+        else:
+            targets = [self.cache_dir / name for name in stage_names]
+
+        for target in targets:
+            if target.exists():
+                shutil.rmtree(target)
+                logger.info(f"Invalidated cached outputs of stage {target.name}")
@@ -0,0 +1,303 @@
+import os
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, List, Optional, Any
+
+from nlp_pipeline.instrumentation import current_rss_mb, peak_rss_mb, instrument_stage
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def _run_stage(func, context, inputs, params, name=None):
+    """
+    Run a stage function and measure it. Executed inside the stage's worker.
+    If the context has instrumentation settings, the stage's timers, counters, memory snapshots
+    and profile are added to the metrics under 'instrumentation'.
+
+    Returns:
+        Tuple of (stage output, stage metrics)
+    """
+    rss_start = current_rss_mb()
+    start = time.perf_counter()
+
+    with instrument_stage(name or func.__name__, context.get('instrumentation')) as recorder:
+        output = func(context, inputs, **params)
+
+    peak_rss = peak_rss_mb()
+    metrics = {
+        'wall_time_seconds': round(time.perf_counter() - start, 3),
+        'rss_start_mb': round(rss_start, 1) if rss_start is not None else None,
+        'rss_end_mb': round(current_rss_mb(), 1) if rss_start is not None else None,
+        'peak_rss_mb': round(peak_rss, 1) if peak_rss is not None else None,
+        'pid': os.getpid()
+    }
+    if recorder is not None:
+        metrics['instrumentation'] = recorder.to_dict()
+    return output, metrics
+
+class Stage:
+    """
+    A named unit of pipeline work and the stages it depends on.
+    """
+
+    def __init__(self, name: str, func: Callable, depends_on: Optional[List[str]] = None, params: Optional[Dict[str, Any]] = None,
+                 cacheable=True, model=None, code_paths=None, cache_params=None):
+        """
+        Initialize the stage.
+
+        Args:
+            name: Unique stage name
+            func: Module-level function called as func(context, inputs, **params), where inputs
+                  maps each dependency's name to its output; must return a picklable output
+            depends_on: Names of the stages whose outputs this stage needs
+            params: Extra keyword arguments for func
+            cacheable: Whether the stage output can be memoized (False for stages with outside effects)
+            model: Model identity, part of the cache key
+            code_paths: Source files whose changes invalidate cached outputs
+            cache_params: Other settings that change the output, part of the cache key
+        """
+        self.name = name
+        self.func = func
+        self.depends_on = list(depends_on or [])
+        self.params = dict(params or {})
+        self.cacheable = cacheable
+        self.model = model
+        self.code_paths = list(code_paths or [])
+        self.cache_params = dict(cache_params or {})
+
+class StageGraph:
+    """
+    Dependency graph of pipeline stages.
+    Stages whose dependencies are done run concurrently, each in its own worker process,
+    so the runtime of independent stages is close to the slowest one rather than their sum.
+    """
+
+    def __init__(self, max_workers=None, use_processes=True, cache=None, force_stages=None, progress=None):
+        """
+        Initialize the stage graph.
+
+        Args:
+            max_workers: Maximum number of stages running at once (defaults to the CPU count)
+            use_processes: Whether to run each stage in a separate process (threads otherwise)
+            cache: StageCache used to memoize stage outputs (None disables memoization)
+            force_stages: Names of stages to recompute even when a cached output exists
+            progress: ProgressReporter told when stages start and finish
+        """
+        self.stages: Dict[str, Stage] = {}
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.use_processes = use_processes
+        self.cache = cache
+        self.force_stages = set(force_stages or [])
+        self.progress = progress
+
+    def add_stage(self, name, func, depends_on=None, params=None, **options):
+        """
+        Add a stage to the graph.
+
+        Args:
+            name: Unique stage name
+            func: Stage function (see Stage)
+            depends_on: Names of the stages this stage depends on
+            params: Extra keyword arguments for the stage function
+            **options: Caching options (see Stage)
+
+        Returns:
+            The created Stage
+        """
+        if name in self.stages:
+            raise ValueError(f"Stage already defined: {name}")
+
+        stage = Stage(name, func, depends_on=depends_on, params=params, **options)
+        self.stages[name] = stage
+        return stage
+
+    def topological_order(self) -> List[str]:
+        """
+        Get the stage names in an order that respects dependencies.
+
+        Returns:
+            List of stage names
+        """
+        order = []
+        state = {}
+
+        def visit(name, path):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f"Cycle in stage graph: {' -> '.join(path + [name])}")
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage dependency: {name}")
+
+            state[name] = 'visiting'
+            for dependency in self.stages[name].depends_on:
+                visit(dependency, path + [name])
+            state[name] = 'done'
+            order.append(name)
+
+        for name in self.stages:
+            visit(name, [])
+
+        return order
+
+    def _cache_key(self, stage, context, inputs):
+        return self.cache.compute_key(
+            stage.name, inputs, model=stage.model,
+            params={**stage.params, **stage.cache_params}, code_paths=stage.code_paths,
+            company=context.get('company')
+        )
+
+    def run_stage(self, name, context: Dict[str, Any], inputs: Dict[str, Any]):
+        """
+        Run a single stage in the current process, reusing its cached output when possible.
+        Used by schedulers that run each stage as a separate task (see airflow/repusense_dag.py).
+
+        Args:
+            name: Stage name
+            context: Picklable dictionary passed to the stage function
+            inputs: Outputs of the stage's dependencies, by stage name
+
+        Returns:
+            Tuple of (stage output, stage metrics)
+        """
+        stage = self.stages[name]
+        missing = [dependency for dependency in stage.depends_on if dependency not in inputs]
+        if missing:
+            raise ValueError(f"Missing inputs for stage {name}: {', '.join(missing)}")
+        inputs = {dependency: inputs[dependency] for dependency in stage.depends_on}
+
+        key = None
+        if self.cache is not None and stage.cacheable:
+            lookup_start = time.perf_counter()
+            key = self._cache_key(stage, context, inputs)
+            cached = None if name in self.force_stages else self.cache.lookup(name, key)
+            if cached is not None:
+                if self.progress is not None:
+                    self.progress.stage_finished(name, 'cached')
+                return cached, {'cache': 'hit', 'wall_time_seconds': round(time.perf_counter() - lookup_start, 3)}
+
+        if self.progress is not None:
+            self.progress.stage_started(name)
+        try:
+            output, metrics = _run_stage(stage.func, context, inputs, stage.params, name)
+        except Exception:
+            if self.progress is not None:
+                self.progress.stage_finished(name, 'error')
+            raise
+
+        metrics['cache'] = 'miss' if key is not None else 'disabled'
+        if key is not None:
+            self.cache.store(name, key, output)
+        if self.progress is not None:
+            self.progress.stage_finished(name, 'completed')
+
+        return output, metrics
+
+    def _new_executor(self):
+        if self.use_processes:
+            # A fresh spawned process per stage isolates model memory and makes peak RSS per-stage
+            return ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+        return ThreadPoolExecutor(max_workers=1)
+
+    def run(self, context: Dict[str, Any]):
+        """
+        Run every stage of the graph.
+
+        Args:
+            context: Picklable dictionary passed to every stage function
+
+        Returns:
+            Tuple of (outputs by stage name, metrics by stage name)
+        """
+        order = self.topological_order()
+        outputs = {}
+        metrics = {}
+        cache_keys = {}
+        running = {}
+        pending = list(order)
+        run_start = time.perf_counter()
+
+        try:
+            while pending or running:
+                # Start every stage whose dependencies are done, up to max_workers at once
+                for name in list(pending):
+                    if len(running) >= self.max_workers:
+                        break
+
+                    stage = self.stages[name]
+                    if not all(dependency in outputs for dependency in stage.depends_on):
+                        continue
+
+                    inputs = {dependency: outputs[dependency] for dependency in stage.depends_on}
+
+                    # Reuse the cached output when the stage's inputs, model, code and params are unchanged
+                    if self.cache is not None and stage.cacheable:
+                        lookup_start = time.perf_counter()
+                        key = self._cache_key(stage, context, inputs)
+                        cached = None if name in self.force_stages else self.cache.lookup(name, key)
+                        if cached is not None:
+                            outputs[name] = cached
+                            metrics[name] = {
+                                'cache': 'hit',
+                                'wall_time_seconds': round(time.perf_counter() - lookup_start, 3)
+                            }
+                            pending.remove(name)
+                            if self.progress is not None:
+                                self.progress.stage_finished(name, 'cached')
+                            continue
+                        cache_keys[name] = key
+
+                    executor = self._new_executor()
+                    future = executor.submit(_run_stage, stage.func, context, inputs, stage.params, name)
+                    running[future] = (name, executor, time.perf_counter() - run_start)
+                    pending.remove(name)
+                    logger.info(f"Started stage: {name}")
+                    if self.progress is not None:
+                        self.progress.stage_started(name)
+
+                if not running:
+                    continue
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    name, executor, started_at = running.pop(future)
+                    executor.shutdown(wait=False)
+
+                    try:
+                        output, stage_metrics = future.result()
+                    except Exception as e:
+                        logger.error(f"Stage {name} failed: {str(e)}")
+                        if self.progress is not None:
+                            self.progress.stage_finished(name, 'error')
+                        raise RuntimeError(f"Pipeline stage '{name}' failed: {str(e)}") from e
+
+                    stage_metrics['started_at_seconds'] = round(started_at, 3)
+                    stage_metrics['cache'] = 'miss' if name in cache_keys else 'disabled'
+                    outputs[name] = output
+                    metrics[name] = stage_metrics
+
+                    if name in cache_keys:
+                        self.cache.store(name, cache_keys[name], output)
+                    if self.progress is not None:
+                        self.progress.stage_finished(name, 'completed')
+
+                    logger.info(
+                        f"Finished stage {name} in {stage_metrics['wall_time_seconds']}s "
+                        f"(peak RSS {stage_metrics['peak_rss_mb']} MB)"
+                    )
+
+        finally:
+            # Don't leave other stages running after a failure
+            for future, (name, executor, _) in running.items():
+                future.cancel()
+                executor.shutdown(wait=False, cancel_futures=True)
+
+        total = round(time.perf_counter() - run_start, 3)
+        logger.info(f"Stage graph finished in {total}s (sum of stage times: {round(sum(m['wall_time_seconds'] for m in metrics.values()), 3)}s)")
+        metrics['_total'] = {'wall_time_seconds': total}
+
+        return outputs, metrics
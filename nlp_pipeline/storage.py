@@ -0,0 +1,390 @@
+import os
+import mmap
+import time
+import shutil
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from nlp_pipeline.s3_storage import S3Storage, s3_etag
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class Storage:
+    """
+    Where pipeline inputs and outputs live. Objects are addressed by keys: '/'-separated paths
+    relative to the data directory, such as 'nlp_results/inwi/sentiment/sentiment_results.json'.
+
+    Stages and analyzers work on files in a local working directory (the data directory).
+    local_path and download_directory make remote objects available there, and upload_file and
+    upload_directory make local files available to other machines.
+    """
+
+    # Whether objects live somewhere other than the local data directory
+    is_remote = False
+
+    def __init__(self, root):
+        """
+        Initialize the storage.
+
+        Args:
+            root: Local data directory that keys are relative to
+        """
+        self.root = Path(root)
+
+    def key_for(self, path) -> Optional[str]:
+        """
+        Get the key of a local path, or None if the path is outside the data directory.
+        """
+        try:
+            return Path(path).resolve().relative_to(self.root.resolve()).as_posix()
+        except ValueError:
+            return None
+
+    def local_path(self, key) -> Path:
+        """Get a local file holding the object (downloaded first by remote storages)."""
+        raise NotImplementedError
+
+    def read_bytes(self, key):
+        """Get the content of an object as a bytes-like object."""
+        raise NotImplementedError
+
+    def write_bytes(self, key, data):
+        """Create or replace an object."""
+        raise NotImplementedError
+
+    def exists(self, key) -> bool:
+        """Check whether an object exists."""
+        raise NotImplementedError
+
+    def list_dirs(self, prefix) -> List[str]:
+        """List the names of the folders directly under a prefix ending with '/'."""
+        raise NotImplementedError
+
+    def upload_file(self, key, path):
+        """Store a local file as an object."""
+        raise NotImplementedError
+
+    def upload_directory(self, local_dir, prefix, last=None) -> Dict[str, Any]:
+        """
+        Store every file of a local directory under a prefix.
+
+        Args:
+            local_dir: Local directory
+            prefix: Key prefix ending with '/'
+            last: Names of files (relative to local_dir) stored after all the others, such as a
+                version marker that readers use to detect complete updates
+
+        Returns:
+            Dictionary with the number of files uploaded and skipped
+        """
+        raise NotImplementedError
+
+    def download_directory(self, prefix, local_dir=None, last=None):
+        """
+        Make every object under a prefix available in a local directory (by default the
+        directory of the prefix in the data directory).
+
+        Args:
+            prefix: Key prefix ending with '/'
+            local_dir: Local directory
+            last: Names of objects (relative to the prefix) downloaded after all the others
+        """
+        raise NotImplementedError
+
+class LocalStorage(Storage):
+    """
+    Storage in the local data directory. Objects already are local files, so uploads and downloads
+    to the data directory itself do nothing.
+    """
+
+    def local_path(self, key) -> Path:
+        return self.root / key
+
+    def read_bytes(self, key):
+        return (self.root / key).read_bytes()
+
+    def write_bytes(self, key, data):
+        path = self.root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename, so readers never see a partial file
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    def exists(self, key) -> bool:
+        return (self.root / key).exists()
+
+    def list_dirs(self, prefix) -> List[str]:
+        directory = self.root / prefix
+        if not directory.is_dir():
+            return []
+        return sorted(path.name for path in directory.iterdir() if path.is_dir())
+
+    def upload_file(self, key, path):
+        target = self.root / key
+        if Path(path).resolve() != target.resolve():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(path, target)
+
+    def upload_directory(self, local_dir, prefix, last=None) -> Dict[str, Any]:
+        local_dir = Path(local_dir)
+        target = self.root / prefix
+        if local_dir.resolve() == target.resolve():
+            return {'uploaded': 0, 'skipped': 0}
+
+        last = set(last or [])
+        files = [path for path in sorted(local_dir.rglob('*')) if path.is_file()]
+        files.sort(key=lambda path: path.relative_to(local_dir).as_posix() in last)
+        for path in files:
+            self.upload_file(f"{prefix}{path.relative_to(local_dir).as_posix()}", path)
+        return {'uploaded': len(files), 'skipped': 0}
+
+    def download_directory(self, prefix, local_dir=None, last=None):
+        source = self.root / prefix
+        if local_dir is not None and Path(local_dir).resolve() != source.resolve() and source.is_dir():
+            shutil.copytree(source, local_dir, dirs_exist_ok=True)
+
+class MmapStorage(LocalStorage):
+    """
+    Local storage whose reads memory-map the file instead of copying it. Several processes reading
+    the same result file (e.g. API workers) share its pages in the OS page cache.
+    """
+
+    def read_bytes(self, key):
+        """
+        Get the content of a file as a read-only memoryview over a memory map.
+        The map is closed once the memoryview is released.
+        """
+        with open(self.root / key, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b''
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+class S3ObjectStorage(Storage):
+    """
+    Storage in an S3 bucket, under a key prefix. Objects are read and written directly in the
+    bucket; local_path needs a local copy, so wrap this storage in a CachedStorage.
+    """
+
+    is_remote = True
+
+    def __init__(self, root, s3: S3Storage, prefix='data/'):
+        """
+        Initialize the storage.
+
+        Args:
+            root: Local data directory that keys are relative to
+            s3: S3Storage of the bucket
+            prefix: Key prefix of the data directory in the bucket
+        """
+        super().__init__(root)
+        self.s3 = s3
+        self.prefix = prefix
+
+    def _s3_key(self, key):
+        return f"{self.prefix}{key}"
+
+    def local_path(self, key) -> Path:
+        raise NotImplementedError("S3 objects have no local path; use CachedStorage")
+
+    def read_bytes(self, key):
+        response = self.s3.client.get_object(Bucket=self.s3.bucket, Key=self._s3_key(key))
+        return response['Body'].read()
+
+    def write_bytes(self, key, data):
+        self.s3.client.put_object(Bucket=self.s3.bucket, Key=self._s3_key(key), Body=bytes(data))
+
+    def exists(self, key) -> bool:
+        return self.etag(key) is not None
+
+    def etag(self, key) -> Optional[str]:
+        """Get the ETag of an object, or None if it doesn't exist."""
+        try:
+            return self.s3.client.head_object(Bucket=self.s3.bucket, Key=self._s3_key(key))['ETag']
+        except self.s3.client.exceptions.ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+
+    def list_objects(self, prefix) -> Dict[str, str]:
+        """List the objects under a prefix, as a dictionary mapping keys to ETags."""
+        return {
+            s3_key[len(self.prefix):]: etag
+            for s3_key, etag in self.s3.list_objects(self._s3_key(prefix)).items()
+        }
+
+    def list_dirs(self, prefix) -> List[str]:
+        return sorted(self.s3.list_prefixes(self._s3_key(prefix)))
+
+    def download_file(self, key, path):
+        """Download an object to a local file, replacing it only once complete."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Concurrent downloads of the same object each use their own temporary file
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.download")
+        self.s3.client.download_file(self.s3.bucket, self._s3_key(key), str(tmp_path), Config=self.s3.transfer_config)
+        os.replace(tmp_path, path)
+
+    def upload_file(self, key, path):
+        self.s3.client.upload_file(str(path), self.s3.bucket, self._s3_key(key), Config=self.s3.transfer_config)
+
+    def upload_directory(self, local_dir, prefix, last=None) -> Dict[str, Any]:
+        local_dir = Path(local_dir)
+        last = [name for name in (last or []) if (local_dir / name).is_file()]
+
+        summary = self.s3.upload_directory(local_dir, self._s3_key(prefix), exclude=last)
+        for name in last:
+            self.upload_file(f"{prefix}{name}", local_dir / name)
+            summary['uploaded'] += 1
+        return summary
+
+    def download_directory(self, prefix, local_dir=None, last=None):
+        local_dir = Path(local_dir) if local_dir is not None else self.root / prefix
+        last = {f"{prefix}{name}" for name in (last or [])}
+        for key in sorted(self.list_objects(prefix), key=lambda key: key in last):
+            self.download_file(key, local_dir / key[len(prefix):])
+
+class CachedStorage(Storage):
+    """
+    Read-through local cache in front of a remote storage. Objects are downloaded to the data
+    directory on first use, and checked against the remote ETag at most every revalidate_after
+    seconds, so the stages, analyzers and API keep working on local files.
+    """
+
+    is_remote = True
+
+    def __init__(self, remote: S3ObjectStorage, revalidate_after=30):
+        """
+        Initialize the cache.
+
+        Args:
+            remote: Remote storage; its local data directory holds the cached copies
+            revalidate_after: Seconds a cached copy is used without checking the remote ETag
+        """
+        super().__init__(remote.root)
+        self.remote = remote
+        self.revalidate_after = revalidate_after
+
+        # key -> (ETag, mtime_ns, size) of the cached copy
+        self._etags = {}
+        # key or prefix -> time of the last check against the remote
+        self._checked = {}
+        self._lock = threading.Lock()
+
+    def _local_etag(self, key, path: Path):
+        """Get the ETag of the cached copy, computing it only when the file changed."""
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+
+        with self._lock:
+            known = self._etags.get(key)
+        if known is not None and known[1:] == (stat.st_mtime_ns, stat.st_size):
+            return known[0]
+
+        etag = s3_etag(path, self.remote.s3.multipart_threshold, self.remote.s3.multipart_chunksize)
+        with self._lock:
+            self._etags[key] = (etag, stat.st_mtime_ns, stat.st_size)
+        return etag
+
+    def _is_fresh(self, key):
+        with self._lock:
+            return time.monotonic() - self._checked.get(key, float('-inf')) < self.revalidate_after
+
+    def _mark_checked(self, key):
+        with self._lock:
+            self._checked[key] = time.monotonic()
+
+    def _refresh(self, key, remote_etag):
+        """Download an object unless the cached copy already has its ETag."""
+        path = self.root / key
+        if remote_etag is None or remote_etag == self._local_etag(key, path):
+            return False
+        self.remote.download_file(key, path)
+        self._local_etag(key, path)
+        return True
+
+    def local_path(self, key) -> Path:
+        path = self.root / key
+        if not (path.exists() and self._is_fresh(key)):
+            remote_etag = self.remote.etag(key)
+            if remote_etag is None and not path.exists():
+                raise FileNotFoundError(f"{key} not found in {self.remote.s3.bucket}")
+            self._refresh(key, remote_etag)
+            self._mark_checked(key)
+        return path
+
+    def read_bytes(self, key):
+        return self.local_path(key).read_bytes()
+
+    def write_bytes(self, key, data):
+        LocalStorage(self.root).write_bytes(key, data)
+        self.upload_file(key, self.root / key)
+
+    def exists(self, key) -> bool:
+        return (self.root / key).exists() or self.remote.exists(key)
+
+    def list_dirs(self, prefix) -> List[str]:
+        return self.remote.list_dirs(prefix)
+
+    def upload_file(self, key, path):
+        self.remote.upload_file(key, path)
+        if Path(path).resolve() == (self.root / key).resolve():
+            self._mark_checked(key)
+
+    def upload_directory(self, local_dir, prefix, last=None) -> Dict[str, Any]:
+        summary = self.remote.upload_directory(local_dir, prefix, last=last)
+        if Path(local_dir).resolve() == (self.root / prefix).resolve():
+            self._mark_checked(prefix)
+        return summary
+
+    def download_directory(self, prefix, local_dir=None, last=None):
+        """
+        Bring the cached copy of a prefix up to date with one listing, downloading only changed
+        objects. Objects named in last (relative to the prefix) are downloaded after the others.
+        """
+        if local_dir is not None and Path(local_dir).resolve() != (self.root / prefix).resolve():
+            self.remote.download_directory(prefix, local_dir, last=last)
+            return
+        if self._is_fresh(prefix):
+            return
+
+        remote_objects = self.remote.list_objects(prefix)
+        last = {f"{prefix}{name}" for name in (last or [])}
+        downloaded = 0
+        for key in sorted(remote_objects, key=lambda key: key in last):
+            downloaded += self._refresh(key, remote_objects[key])
+        self._mark_checked(prefix)
+
+        if downloaded:
+            logger.info(f"Downloaded {downloaded} changed files of {prefix} from s3://{self.remote.s3.bucket}")
+
+def get_storage(config: Dict[str, Any], data_dir, backend=None) -> Storage:
+    """
+    Create the storage configured in the 'storage' section of config.json.
+
+    Args:
+        config: Configuration dictionary
+        data_dir: Local data directory
+        backend: 'local', 'mmap' or 's3', overriding storage.backend
+
+    Returns:
+        Storage
+    """
+    storage_config = config.get('storage', {})
+    backend = backend or storage_config.get('backend', 'local')
+
+    if backend == 'local':
+        return LocalStorage(data_dir)
+    if backend == 'mmap':
+        return MmapStorage(data_dir)
+    if backend == 's3':
+        remote = S3ObjectStorage(data_dir, S3Storage.from_config(config), prefix=storage_config.get('prefix', 'data/'))
+        return CachedStorage(remote, revalidate_after=storage_config.get('revalidate_seconds', 30))
+
+    raise ValueError(f"Unknown storage backend: {backend}")
@@ -0,0 +1,183 @@
+import os
+import json
+import logging
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Charts are not part of pipeline runs: runs only save the data they are drawn from, and each chart
+# is rendered from that data the first time it is requested (by the API or with this module's CLI),
+# then kept until the data changes. Plotting libraries and models are only imported by the renderers.
+
+NLP_RESULTS_DIR = Path(__file__).parent.parent / "data" / "nlp_results"
+
+def _read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _read_records(path):
+    import pandas as pd
+    return pd.DataFrame(_read_json(path))
+
+def _render_topic_map(company_dir: Path, filename):
+    from nlp_pipeline.spark_nlp.topic_modeling import TopicModeler
+
+    modeler = TopicModeler(output_dir=company_dir / "topics")
+    modeler.load_model(company_dir / "topics" / "topic_model.pkl")
+    return modeler.visualize_topics(filename)
+
+def _render_topic_barchart(company_dir: Path, filename):
+    from nlp_pipeline.spark_nlp.topic_modeling import TopicModeler
+
+    modeler = TopicModeler(output_dir=company_dir / "topics")
+    return modeler.visualize_barchart(
+        filename, topic_distribution=_read_json(company_dir / "topics" / "topic_distribution.json")
+    )
+
+def _render_sentiment_distribution(company_dir: Path, filename):
+    from nlp_pipeline.spark_nlp.sentiment_analysis import SentimentAnalyzer
+
+    analyzer = SentimentAnalyzer(output_dir=company_dir / "sentiment")
+    return analyzer.visualize_sentiment_distribution(
+        _read_records(company_dir / "sentiment" / "sentiment_results.json"), filename
+    )
+
+def _render_top_engaged_posts(company_dir: Path, filename):
+    from nlp_pipeline.spark_nlp.engagement_analysis import EngagementAnalyzer
+
+    analyzer = EngagementAnalyzer(output_dir=company_dir / "engagement")
+    return analyzer.visualize_top_engaged_posts(
+        _read_records(company_dir / "engagement" / "engagement_analysis.json"), filename=filename
+    )
+
+def _render_engagement_distribution(company_dir: Path, filename):
+    from nlp_pipeline.spark_nlp.engagement_analysis import EngagementAnalyzer
+
+    analyzer = EngagementAnalyzer(output_dir=company_dir / "engagement")
+    return analyzer.visualize_engagement_distribution(
+        _read_records(company_dir / "engagement" / "engagement_results.json"), filename
+    )
+
+def _render_word_cloud(company_dir: Path, filename):
+    from nlp_pipeline.spark_nlp.keyword_extraction import KeywordExtractor
+
+    extractor = KeywordExtractor(output_dir=company_dir / "keywords")
+    return extractor.create_word_cloud(
+        filename=filename, word_cloud_data=_read_json(company_dir / "keywords" / "word_cloud_data.json")
+    )
+
+# Chart (relative to the company's results folder) -> (files it is drawn from, renderer)
+VISUALIZATIONS = {
+    'topics/topic_visualization.html': (['topics/topic_model.pkl'], _render_topic_map),
+    'topics/topic_barchart.html': (['topics/topic_distribution.json'], _render_topic_barchart),
+    'sentiment/sentiment_distribution.html': (['sentiment/sentiment_results.json'], _render_sentiment_distribution),
+    'engagement/top_engaged_posts.html': (['engagement/engagement_analysis.json'], _render_top_engaged_posts),
+    'engagement/engagement_distribution.html': (['engagement/engagement_results.json'], _render_engagement_distribution),
+    'keywords/wordcloud.png': (['keywords/word_cloud_data.json'], _render_word_cloud)
+}
+
+def needs_render(company_dir, name) -> bool:
+    """
+    Check whether a chart has to be rendered: its data exists and it is missing or older than the data.
+    A chart whose data is missing (e.g. results of a run that predates on-demand rendering) is left as is.
+
+    Args:
+        company_dir: Results folder of the company
+        name: Chart name (a key of VISUALIZATIONS)
+
+    Returns:
+        True if the chart has to be rendered
+    """
+    company_dir = Path(company_dir)
+    sources, _ = VISUALIZATIONS[name]
+
+    try:
+        source_mtime = max(os.stat(company_dir / source).st_mtime_ns for source in sources)
+    except FileNotFoundError:
+        return False
+
+    try:
+        return os.stat(company_dir / name).st_mtime_ns < source_mtime
+    except FileNotFoundError:
+        return True
+
+def render(company_dir, name, force=False) -> Path:
+    """
+    Render a chart from the saved results of a company, unless it is up to date.
+
+    Args:
+        company_dir: Results folder of the company
+        name: Chart name (a key of VISUALIZATIONS)
+        force: Render the chart even if it is up to date
+
+    Returns:
+        Path to the chart
+
+    Raises:
+        KeyError: If the chart name is unknown
+        FileNotFoundError: If the data the chart is drawn from is missing
+    """
+    company_dir = Path(company_dir)
+    if name not in VISUALIZATIONS:
+        raise KeyError(f"Unknown visualization: {name}")
+
+    sources, renderer = VISUALIZATIONS[name]
+    missing = [source for source in sources if not (company_dir / source).exists()]
+    if missing:
+        raise FileNotFoundError(f"Cannot render {name}, missing {', '.join(missing)} in {company_dir}")
+
+    output_path = company_dir / name
+    if not force and not needs_render(company_dir, name):
+        return output_path
+
+    # Render under a temporary name (keeping the extension, which sets the output format) and
+    # swap it in, so a chart being served is never partially written
+    tmp_name = f".{os.getpid()}-{output_path.name}"
+    try:
+        renderer(company_dir, tmp_name)
+        os.replace(output_path.with_name(tmp_name), output_path)
+    finally:
+        output_path.with_name(tmp_name).unlink(missing_ok=True)
+
+    logger.info(f"Rendered {output_path}")
+    return output_path
+
+def render_all(company_dir, names: Optional[List[str]] = None, force=False) -> Dict[str, str]:
+    """
+    Render the charts of a company, skipping the ones whose data is missing.
+
+    Args:
+        company_dir: Results folder of the company
+        names: Chart names (default all)
+        force: Render the charts even if they are up to date
+
+    Returns:
+        Dictionary mapping chart names to their paths
+    """
+    rendered = {}
+    for name in names or VISUALIZATIONS:
+        try:
+            rendered[name] = str(render(company_dir, name, force=force))
+        except FileNotFoundError as e:
+            logger.warning(str(e))
+    return rendered
+
+def main():
+    parser = argparse.ArgumentParser(description='Render the charts of a company from its saved results')
+    parser.add_argument('--company', type=str, required=True, help='Company name')
+    parser.add_argument('--name', type=str, action='append', choices=list(VISUALIZATIONS),
+                        help='Chart to render (repeatable, default all)')
+    parser.add_argument('--force', action='store_true', help='Render charts even if they are up to date')
+    parser.add_argument('--results-dir', type=str, default=str(NLP_RESULTS_DIR), help='Results directory')
+    args = parser.parse_args()
+
+    rendered = render_all(Path(args.results_dir) / args.company, names=args.name, force=args.force)
+    for name, path in rendered.items():
+        print(f"{name}: {path}")
+
+if __name__ == "__main__":
+    main()
@@ -28,6 +28,29 @@ def parse_args():
                        help='Skip sentiment analysis')
     parser.add_argument('--skip-keyword', action='store_true', 
                        help='Skip keyword extraction')
+    parser.add_argument('--skip-engagement', action='store_true', 
+                       help='Skip engagement analysis')
+    
+    # Execution
+    parser.add_argument('--backend', type=str, choices=['pandas', 'spark'], default='pandas',
+                       help='Backend for preprocessing, sentiment and keywords')
+    parser.add_argument('--max-workers', type=int,
+                       help='Maximum number of pipeline stages running at once')
+    
+    # Stage cache
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Recompute every stage and do not cache outputs')
+    parser.add_argument('--force-stage', type=str, action='append', default=[],
+                       help='Recompute a stage even if a cached output exists (repeatable: '
+                            'preprocess, sentiment, keywords, topics, engagement)')
+    parser.add_argument('--invalidate-stage', type=str, action='append', default=[],
+                       help='Delete the cached outputs of a stage before running (repeatable, "all" for every stage)')
+    
+    # Instrumentation
+    parser.add_argument('--instrument', action='store_true',
+                       help='Record per-stage timers, counters and memory in run_report.json')
+    parser.add_argument('--profile', type=str, choices=['cprofile', 'py-spy'],
+                       help='Profile each stage that runs (implies --instrument)')
     
     # Initialize data directory structure
     parser.add_argument('--init-structure', action='store_true',
@@ -84,54 +107,69 @@ def run_pipeline(args):
     """Run the NLP pipeline with the specified options."""
     print("Running NLP pipeline...")
     
-    # Load configuration
-    config = load_config()
-    
-    # Construct the command
-    cmd = [
-        "python", "-m", "nlp_pipeline.main",
-        "--company", args.company,
-        "--output-dir", str(Path(__file__).parent / "data")
-    ]
-    
-    # Add date range if provided
-    if args.start_date:
-        cmd.extend(["--start-date", args.start_date])
+    # Imported here so that --init-structure works without the pipeline's dependencies
+    from nlp_pipeline.main import NLPPipeline
     
-    if args.end_date:
-        cmd.extend(["--end-date", args.end_date])
-    
-    # Add options
+    # Resolve the existing data file
+    existing_file = None
     if args.use_existing:
-        cmd.append("--use-existing")
         if args.existing_file:
-            cmd.extend(["--existing-file", args.existing_file])
+            existing_file = args.existing_file
         elif args.company:
             # Try to find company-specific data file
             default_file = f"scrapping script/reddit_nlp_{args.company}_2024-01-01_2025-12-31.json"
             if os.path.exists(default_file):
-                cmd.extend(["--existing-file", default_file])
+                existing_file = default_file
         else:
             # Default to the inwi example if no company specified
-            cmd.extend(["--existing-file", "scrapping script/reddit_nlp_inwi_2024-01-01_2025-12-31.json"])
+            existing_file = "scrapping script/reddit_nlp_inwi_2024-01-01_2025-12-31.json"
     
+    # Collect the stages to skip
+    skip_stages = []
     if args.skip_topic:
-        cmd.append("--skip-topic")
+        skip_stages.append('topics')
     
     if args.skip_sentiment:
-        cmd.append("--skip-sentiment")
+        skip_stages.append('sentiment')
     
     if args.skip_keyword:
-        cmd.append("--skip-keyword")
-    
-    # Run the pipeline
-    print(f"Executing command: {' '.join(cmd)}")
-    result = subprocess.run(cmd)
-    
-    if result.returncode != 0:
-        print("Pipeline execution failed!")
+        skip_stages.append('keywords')
+    
+    if args.skip_engagement:
+        skip_stages.append('engagement')
+    
+    # Run the pipeline in-process; independent stages run in parallel worker processes
+    pipeline = NLPPipeline(
+        company_name=args.company,
+        backend=args.backend,
+        max_workers=args.max_workers,
+        use_cache=not args.no_cache,
+        force_stages=args.force_stage,
+        instrument=args.instrument or None,
+        profile=args.profile
+    )
+    
+    # Drop cached outputs the user no longer trusts
+    if args.invalidate_stage and pipeline.stage_cache:
+        pipeline.stage_cache.invalidate(None if 'all' in args.invalidate_stage else args.invalidate_stage)
+    
+    try:
+        results = pipeline.process_data(
+            start_date=args.start_date,
+            end_date=args.end_date,
+            use_existing=args.use_existing,
+            existing_file=existing_file,
+            skip_stages=skip_stages
+        )
+    except Exception as e:
+        print(f"Pipeline execution failed: {str(e)}")
         sys.exit(1)
     
+    # Report per-stage timings
+    for stage, metrics in results.get('stage_metrics', {}).items():
+        cache_note = " (cached)" if metrics.get('cache') == 'hit' else ""
+        print(f"  {stage}: {metrics['wall_time_seconds']}s{cache_note}")
+    
     print("Pipeline execution completed successfully!")
 
 def run_api():
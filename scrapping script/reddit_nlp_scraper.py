@@ -150,6 +150,7 @@ def scrape_reddit_for_nlp(keyword, start_date, end_date, limit=None, output_file
         # Add post and comments to the NLP dataset
         nlp_entry = {
             "post_text": post["post_text"],
+            "created_utc": post["created_utc"],
             "comments": comment_texts
         }
         
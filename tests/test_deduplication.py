@@ -0,0 +1,38 @@
+import json
+
+from nlp_pipeline.data_processing.deduplication import ArticleDeduplicator, normalize_title
+
+def test_normalize_title_keeps_accented_and_arabic_letters():
+    assert normalize_title("Inwi améliore sa fibre à Rabat - Le360") == "inwi améliore sa fibre à rabat"
+    assert normalize_title("إنوي تطلق شبكة الجيل الخامس!") == "إنوي تطلق شبكة الجيل الخامس"
+
+def test_titles_in_other_scripts_are_told_apart():
+    deduplicator = ArticleDeduplicator()
+    assert not deduplicator.is_duplicate({'title': "إنوي تطلق شبكة الجيل الخامس", 'url': "https://a.example/1"})
+    assert not deduplicator.is_duplicate({'title': "انقطاع الإنترنت في الدار البيضاء اليوم", 'url': "https://a.example/2"})
+    assert deduplicator.is_duplicate({'title': "إنوي تطلق شبكة الجيل الخامس", 'url': "https://b.example/1"})
+
+def test_stale_entries_age_out_on_save(tmp_path):
+    state_path = tmp_path / "seen_articles.json"
+    article = {'title': "Inwi launches 5G network across Morocco", 'url': "https://a.example/5g"}
+
+    deduplicator = ArticleDeduplicator(state_path=state_path, max_age_days=90)
+    deduplicator.is_duplicate(article)
+    deduplicator.seen_urls = {key: 0 for key in deduplicator.seen_urls}
+    deduplicator.seen_titles = {key: 0 for key in deduplicator.seen_titles}
+    deduplicator.save_state()
+
+    assert json.loads(state_path.read_text()) == {'urls': {}, 'titles': {}}
+    assert not ArticleDeduplicator(state_path=state_path).is_duplicate(article)
+
+def test_state_in_list_format_still_loads(tmp_path):
+    state_path = tmp_path / "seen_articles.json"
+    deduplicator = ArticleDeduplicator()
+    deduplicator.is_duplicate({'title': "Inwi launches 5G network across Morocco", 'url': "https://a.example/5g"})
+    state_path.write_text(json.dumps({
+        'urls': list(deduplicator.seen_urls),
+        'titles': [format(fingerprint, '016x') for fingerprint in deduplicator.seen_titles]
+    }))
+
+    reloaded = ArticleDeduplicator(state_path=state_path)
+    assert reloaded.is_duplicate({'title': "Inwi launches 5G network across Morocco - Reuters", 'url': "https://b.example/5g"})
@@ -0,0 +1,44 @@
+import time
+from pathlib import Path
+
+from nlp_pipeline.api.job_queue import WorkerPool
+from nlp_pipeline.api.process_request import AnalysisRequestProcessor
+from nlp_pipeline.api.request_status import RequestStatusStore
+from nlp_pipeline.stage_executor import StageGraph
+
+def _count_stage(context, inputs):
+    return {'count': len(context['company'])}
+
+def _double_stage(context, inputs):
+    return {'count': inputs['count']['count'] * 2}
+
+class StageGraphProcessor(AnalysisRequestProcessor):
+    """Runs a small stage graph instead of the NLP pipeline, with stages in their own processes as the pipeline does."""
+
+    def run_analysis(self, request_id, request_data, progress=None):
+        graph = StageGraph(max_workers=2)
+        graph.add_stage('count', _count_stage, cacheable=False)
+        graph.add_stage('double', _double_stage, depends_on=['count'], cacheable=False)
+        outputs, _ = graph.run({'company': request_data['company']})
+        return {'request_id': request_id, 'status': 'completed', 'count': outputs['double']['count']}
+
+def make_processor(job_queue):
+    return StageGraphProcessor(
+        job_queue=job_queue, status_store=RequestStatusStore(Path(job_queue.db_path).parent / "requests.db")
+    )
+
+def test_worker_process_runs_queued_job(tmp_path):
+    pool = WorkerPool(tmp_path / "jobs.db", workers=1, poll_interval=0.1, processor_factory=make_processor)
+    pool.queue.enqueue("job-1", "inwi", {'company': "inwi", 'start_date': None, 'end_date': None})
+    pool.start()
+    try:
+        deadline = time.time() + 120
+        job = pool.queue.get("job-1")
+        while job['status'] in ('queued', 'processing') and time.time() < deadline:
+            time.sleep(0.2)
+            job = pool.queue.get("job-1")
+    finally:
+        pool.stop()
+
+    assert job['status'] == 'completed', job['error']
+    assert job['result']['count'] == 8
@@ -0,0 +1,39 @@
+import asyncio
+
+import httpx
+import pytest
+
+from nlp_pipeline.results_store import ResultsStore
+
+ROWS = [
+    {'position': 0, 'post_id': 0, 'comment_id': None, 'text_type': 'post', 'source': 'reddit', 'text': "Fibre is down",
+     'created_at': 1714550400.0, 'sentiment': 'negative', 'sentiment_score': 0.9, 'topic': 1, 'keywords': ['fibre']},
+    {'position': 1, 'post_id': 0, 'comment_id': 0, 'text_type': 'comment', 'source': 'reddit', 'text': "Same here",
+     'created_at': 1714550400.0, 'sentiment': 'neutral', 'sentiment_score': 0.6, 'topic': 1, 'keywords': []}
+]
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultsStore(tmp_path / "results.db")
+    store.publish("inwi", "run-1", tmp_path, rows=ROWS)
+    return store
+
+def test_query_rejects_unknown_fields(store):
+    with pytest.raises(ValueError):
+        store.query_documents("inwi", fields=['not_a_column'])
+
+def test_query_returns_requested_fields(store):
+    page = store.query_documents("inwi", fields=['position'], limit=1)
+    assert page['documents'] == [{'position': 0}]
+    assert page['next_cursor'] == 0
+
+def test_documents_route_rejects_unknown_fields():
+    from nlp_pipeline.api.main import app
+
+    async def get(path):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get(path)
+
+    response = asyncio.run(get("/api/company/inwi/documents?fields=not_a_column"))
+    assert response.status_code == 400
+    assert "not_a_column" in response.json()['detail']
@@ -0,0 +1,52 @@
+import json
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyspark")
+
+from nlp_pipeline.data_processing.data_preprocessor import RedditDataPreprocessor
+from nlp_pipeline.spark_nlp.spark_backend import SparkNLPBackend
+
+def _article(title, url):
+    return {'title': title, 'description': f"{title} in detail", 'content': None, 'url': url, 'publishedAt': "2025-05-01T10:00:00Z"}
+
+def _document_keys(documents):
+    return sorted(
+        (int(row['post_id']), row['text_type'], None if pd.isna(row['comment_id']) else int(row['comment_id']), row['text'])
+        for row in documents
+    )
+
+def test_overlapping_news_files_match_pandas(tmp_path):
+    reddit = [
+        {'post_text': "Inwi fibre is down again", 'comments': ["Same here", ""], 'created_utc': "2025-05-01"},
+        {'post_text': "", 'comments': ["Skipped with its post"], 'created_utc': "2025-05-01"}
+    ]
+    launch = "Inwi launches 5G network across Morocco"
+    first = {'articles': [
+        _article(launch, "https://a.example/5g"),
+        _article("Inwi reports quarterly subscriber growth", "https://a.example/results")
+    ]}
+    # The same story again, and a syndicated copy under another URL
+    second = {'articles': [
+        _article(launch, "https://a.example/5g"),
+        _article(launch, "https://b.example/5g"),
+        _article("Network outage hits customers in Rabat", "https://a.example/outage")
+    ]}
+
+    paths = []
+    for name, data in [("reddit.json", reddit), ("news_1.json", first), ("news_2.json", second)]:
+        path = tmp_path / name
+        path.write_text(json.dumps(data), encoding='utf-8')
+        paths.append(path)
+
+    pandas_df, _ = RedditDataPreprocessor(processed_dir=tmp_path / "processed", company_name="inwi").process_data(paths)
+
+    backend = SparkNLPBackend(master="local[2]")
+    try:
+        spark_df = backend.load_documents({'inwi': paths}).toPandas()
+    finally:
+        backend.stop()
+
+    assert _document_keys(spark_df.to_dict('records')) == _document_keys(pandas_df.to_dict('records'))
+    assert len(pandas_df[pandas_df['text_type'] == 'article']) == 3